@@ -5,12 +5,20 @@ WordPress ブログ記事にUnsplash画像をアイキャッチとして自動
 import os
 import re
 import random
-import time
 import sys
+import argparse
 
-import requests
 from dotenv import load_dotenv
 
+import wp_client
+import rate_limiter
+import retry_policy
+import run_journal
+import unsplash_cache
+import media_index
+import image_transfer
+import image_optimizer
+
 
 # --- 日本語キーワード → 英語マッピング ---
 JAPANESE_KEYWORD_MAP = {
@@ -66,6 +74,9 @@ JAPANESE_KEYWORD_MAP = {
 
 FALLBACK_KEYWORDS = ["technology", "computer", "digital", "workspace", "coding"]
 
+# Unsplash APIのベースURL（環境変数 UNSPLASH_API_URL で差し替え可能。ローカルの偽サーバー用）
+UNSPLASH_API_URL = "https://api.unsplash.com"
+
 
 def load_config():
     """環境変数から設定を読み込む"""
@@ -85,6 +96,7 @@ def load_config():
             sys.exit(1)
         config[var] = value
 
+    config["UNSPLASH_API_URL"] = os.getenv("UNSPLASH_API_URL", UNSPLASH_API_URL)
     return config
 
 
@@ -114,44 +126,35 @@ def extract_keywords(title):
 
 
 def get_all_posts(config):
-    """WordPress REST APIで全記事を取得する"""
-    url = f"{config['WORDPRESS_URL']}/wp-json/wp/v2/posts"
-    auth = (config["WORDPRESS_USERNAME"], config["WORDPRESS_APPLICATION_PASSWORD"])
-
-    all_posts = []
-    page = 1
-
-    while True:
-        params = {"per_page": 100, "page": page, "status": "publish"}
-        response = requests.get(url, params=params, auth=auth)
-
-        if response.status_code != 200:
-            if page == 1:
-                print(f"エラー: 記事の取得に失敗しました (HTTP {response.status_code})")
-                print(f"レスポンス: {response.text[:200]}")
-                sys.exit(1)
-            break
-
-        posts = response.json()
-        if not posts:
-            break
+    """公開済みの全記事を、アイキャッチの設定に必要なフィールド（featured）だけで取得する
 
-        all_posts.extend(posts)
-        total_pages = int(response.headers.get("X-WP-TotalPages", 1))
-        if page >= total_pages:
-            break
-        page += 1
-
-    return all_posts
+    本文は使わないため、ローカル記事ストアを同期せず一覧だけを取得する
+    （差分同期でも毎回取得する id の一覧と同程度の転送量で済む）。
+    """
+    try:
+        return wp_client.get_all_posts(config, {"status": "publish"}, fields="featured")
+    except wp_client.WordPressAPIError as e:
+        print(f"エラー: 記事の取得に失敗しました (HTTP {e.status_code})")
+        print(f"レスポンス: {e.text[:200]}")
+        sys.exit(1)
 
 
 def search_unsplash_image(query, config):
-    """Unsplash APIで画像を検索する。レート制限情報も返す。"""
-    url = "https://api.unsplash.com/search/photos"
+    """Unsplash APIで画像を検索する。レート制限情報も返す。
+
+    同じ検索の結果は unsplash_cache から返し、リクエストを送らない（レート残りはNone）。
+    """
+    url = f"{config.get('UNSPLASH_API_URL', UNSPLASH_API_URL)}/search/photos"
     headers = {"Authorization": f"Client-ID {config['UNSPLASH_ACCESS_KEY']}"}
     params = {"query": query, "per_page": 1, "orientation": "landscape"}
 
-    response = requests.get(url, headers=headers, params=params)
+    cached = unsplash_cache.get(query, params["per_page"], params["orientation"])
+    if cached is not None:
+        return (cached[0] if cached else None), None
+
+    rate_limiter.acquire("unsplash", on_wait=announce_wait)
+    response = wp_client.request("GET", url, headers=headers, params=params)
+    rate_limiter.update_from_headers("unsplash", response.headers)
 
     rate_remaining = int(response.headers.get("X-Ratelimit-Remaining", 50))
 
@@ -159,82 +162,47 @@ def search_unsplash_image(query, config):
         return None, rate_remaining
 
     data = response.json()
-    if data["total"] == 0 or not data["results"]:
-        return None, rate_remaining
-
-    photo = data["results"][0]
-    return {
+    images = [{
+        "id": photo["id"],
         "url": photo["urls"]["regular"],
         "download_location": photo["links"]["download_location"],
         "description": photo.get("description") or photo.get("alt_description") or query,
         "photographer": photo["user"]["name"],
-    }, rate_remaining
-
-
-def trigger_unsplash_download(download_location, config):
-    """Unsplash利用規約に従いダウンロードをトリガーする"""
-    headers = {"Authorization": f"Client-ID {config['UNSPLASH_ACCESS_KEY']}"}
-    requests.get(download_location, headers=headers)
-
-
-def download_image(image_url):
-    """画像をダウンロードしてバイトデータを返す"""
-    response = requests.get(image_url, timeout=30)
-    response.raise_for_status()
-    return response.content
-
-
-def upload_to_wordpress(image_data, filename, alt_text, config):
-    """WordPressメディアライブラリに画像をアップロードする"""
-    url = f"{config['WORDPRESS_URL']}/wp-json/wp/v2/media"
-    auth = (config["WORDPRESS_USERNAME"], config["WORDPRESS_APPLICATION_PASSWORD"])
-
-    files = {
-        "file": (filename, image_data, "image/jpeg"),
-    }
-    headers = {
-        "User-Agent": "Mozilla/5.0 (compatible; WP-Script/1.0)",
-    }
-
-    response = requests.post(url, headers=headers, files=files, auth=auth)
+    } for photo in (data["results"] if data["total"] else [])]
+    # 0件の結果もキャッシュする
+    unsplash_cache.put(query, params["per_page"], params["orientation"], images)
 
-    if response.status_code not in (200, 201):
-        raise Exception(f"メディアアップロード失敗 (HTTP {response.status_code}): {response.text[:200]}")
+    return (images[0] if images else None), rate_remaining
 
-    media = response.json()
 
-    # alt_textを設定
-    update_url = f"{url}/{media['id']}"
-    requests.post(update_url, json={"alt_text": alt_text}, auth=auth)
+def set_featured_image(post_id, media_id, writer):
+    """記事へのアイキャッチ画像の設定をキューに追加する（batch/v1 でまとめて送信）"""
+    writer.add("wp/v2/posts", post_id, {"featured_media": media_id})
 
-    return media["id"]
 
-
-def set_featured_image(post_id, media_id, config):
-    """記事にアイキャッチ画像を設定する"""
-    url = f"{config['WORDPRESS_URL']}/wp-json/wp/v2/posts/{post_id}"
-    auth = (config["WORDPRESS_USERNAME"], config["WORDPRESS_APPLICATION_PASSWORD"])
-
-    response = requests.post(url, json={"featured_media": media_id}, auth=auth)
-
-    if response.status_code != 200:
-        raise Exception(f"アイキャッチ設定失敗 (HTTP {response.status_code}): {response.text[:200]}")
-
-
-def wait_for_rate_limit(rate_remaining):
-    """レート制限に近い場合は待機する"""
-    if rate_remaining <= 5:
-        print("\n⏳ Unsplash APIレート制限に近づいています。60分待機します...")
-        print("   (Ctrl+Cで中断できます)")
-        for remaining in range(3600, 0, -60):
-            print(f"   残り {remaining // 60} 分...")
-            time.sleep(60)
-        print("   待機完了。処理を再開します。\n")
+def announce_wait(seconds):
+    """Unsplash APIのレート制限で待機する際に表示する"""
+    print(f"\n⏳ Unsplash APIレート制限のため {seconds:.0f}秒待機します... ", end="", flush=True)
 
 
 def main():
+    parser = argparse.ArgumentParser(description='Unsplash画像をアイキャッチとして自動設定')
+    parser.add_argument('--resume', action='store_true',
+                        help='中断した前回の実行を続きから再開（アップロード済みの画像は再利用）')
+    args = parser.parse_args()
+
     config = load_config()
 
+    # 実行ジャーナル（中断した実行の再開用）
+    journal = run_journal.RunJournal("add_featured_images")
+    resumed = None
+    if args.resume:
+        resumed = journal.resume()
+        if resumed is None:
+            print("エラー: 再開できる中断した実行がありません。")
+            sys.exit(1)
+        print(f"中断した実行 #{resumed['id']}（{resumed['started_at'][:19]} 開始）を再開します\n")
+
     # 全記事を取得
     print("WordPress記事を取得中...")
     all_posts = get_all_posts(config)
@@ -242,15 +210,36 @@ def main():
 
     # アイキャッチ画像がない記事をフィルタリング
     posts_without_image = [p for p in all_posts if p.get("featured_media", 0) == 0]
+    if resumed:
+        # 前回の対象のうち、アイキャッチの設定まで完了していない記事だけを処理する
+        planned = set(resumed["plan"])
+        posts_without_image = [
+            p for p in posts_without_image
+            if p["id"] in planned and not journal.completed(p["id"], "saved")
+        ]
+    else:
+        journal.start({}, [p["id"] for p in posts_without_image])
     print(f"アイキャッチ画像なし: {len(posts_without_image)}記事\n")
 
     if not posts_without_image:
         print("すべての記事にアイキャッチ画像が設定されています。")
+        journal.finish()
         return
 
+    def record_results(results):
+        """アイキャッチを設定できた記事を保存完了にする（バッチを送信するたびに呼ばれる）"""
+        for (route, object_id), (ok, body) in results.items():
+            if ok and route == "wp/v2/posts":
+                journal.checkpoint(object_id, "saved")
+            elif not ok and route == "wp/v2/media":
+                # 削除されたメディアなら、次回は再利用せずにアップロードし直す
+                media_index.forget_missing(object_id, body)
+
     success_count = 0
     fail_count = 0
     total = len(posts_without_image)
+    interrupted = False
+    writer = wp_client.BatchWriter(config, on_results=record_results)
 
     print("処理開始...")
     for i, post in enumerate(posts_without_image, 1):
@@ -261,6 +250,15 @@ def main():
         print(f"[{i}/{total}] 「{title}」... ", end="", flush=True)
 
         try:
+            # 中断した実行でアップロード済みの画像があれば使い回す
+            media = journal.find_media(post["id"], "featured")
+            if media is not None:
+                writer.add("wp/v2/media", media["id"], {"alt_text": media["alt_text"]})
+                set_featured_image(post["id"], media["id"], writer)
+                print("✅ 完了（アップロード済みの画像を再利用）")
+                success_count += 1
+                continue
+
             # キーワード抽出
             keyword = extract_keywords(title)
 
@@ -277,36 +275,37 @@ def main():
                 fail_count += 1
                 continue
 
-            # Unsplashダウンロードトリガー（利用規約準拠）
-            trigger_unsplash_download(image_info["download_location"], config)
-
-            # 画像ダウンロード
-            image_data = download_image(image_info["url"])
-
-            # WordPressにアップロード
+            # 同じ画像がアップロード済みならそのメディアを使う（なければWordPressにアップロード）
+            # alt_text の再設定はアイキャッチ設定と一緒にキューに追加する
             filename = f"unsplash-{post['id']}.jpg"
             alt_text = f"{title} - Photo by {image_info['photographer']} on Unsplash"
-            media_id = upload_to_wordpress(image_data, filename, alt_text, config)
+            media, existing = image_transfer.upload_unsplash_image(
+                config, image_info, filename, alt_text, writer, on_wait=announce_wait)
+            media_id = media["id"]
+            journal.record_media(post["id"], "featured", {"id": media_id, "alt_text": alt_text})
 
-            # アイキャッチ画像を設定
-            set_featured_image(post["id"], media_id, config)
+            # アイキャッチ画像を設定（キューがいっぱいになったらまとめて送信）
+            set_featured_image(post["id"], media_id, writer)
 
-            print("✅ 完了")
+            print("✅ 完了（アップロード済みの同じ画像を使用）" if existing else "✅ 完了")
             success_count += 1
 
-            # レート制限チェック
-            wait_for_rate_limit(rate_remaining)
-
-            # リクエスト間の待機
-            time.sleep(2)
-
         except KeyboardInterrupt:
             print("\n\n中断されました。")
+            interrupted = True
             break
         except Exception as e:
             print(f"❌ 失敗: {e}")
             fail_count += 1
-            time.sleep(2)
+
+    # キューに残った書き込みを送信し、失敗したものを表示
+    writer.flush()
+    failures = writer.failures()
+    for (route, object_id), error in sorted(failures.items()):
+        print(f"❌ {route}/{object_id} の更新に失敗: {error}")
+        if route == "wp/v2/posts":
+            success_count -= 1
+            fail_count += 1
 
     # サマリー表示
     print(f"\n{'='*40}")
@@ -314,8 +313,30 @@ def main():
     print(f"  成功: {success_count}件")
     print(f"  失敗: {fail_count}件")
     print(f"  合計: {total}件")
+    print(f"  {rate_limiter.format_wait_stats()}")
+    cache_stats = unsplash_cache.format_stats()
+    if cache_stats:
+        print(f"  {cache_stats}")
+    media_stats = media_index.format_stats()
+    if media_stats:
+        print(f"  {media_stats}")
+    optimizer_stats = image_optimizer.format_stats()
+    if optimizer_stats:
+        print(f"  {optimizer_stats}")
+    transfer_stats = image_transfer.format_stats()
+    if transfer_stats:
+        print(f"  {transfer_stats}")
+    retry_summary = retry_policy.format_summary()
+    if retry_summary:
+        print(retry_summary)
+    if interrupted:
+        print("  ※ 続きから再開するには --resume を付けて実行してください")
     print(f"{'='*40}")
 
+    if not interrupted:
+        journal.finish()
+    journal.close()
+
 
 if __name__ == "__main__":
     main()
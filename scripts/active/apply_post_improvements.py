@@ -7,16 +7,29 @@ import os
 import re
 import csv
 import sys
+import json
 import glob
-import time
 import random
+import asyncio
 import argparse
+import concurrent.futures
 from datetime import datetime
 
-import requests
 import html as html_module
+from bs4 import Comment
 from dotenv import load_dotenv
-from bs4 import BeautifulSoup
+import wp_client
+import html_backend
+import rate_limiter
+import retry_policy
+import post_store
+import post_sync
+import improvement_ledger
+import run_journal
+import unsplash_cache
+import media_index
+import image_transfer
+import image_optimizer
 
 
 # Unsplash画像検索用のキーワードマッピング
@@ -32,6 +45,55 @@ JAPANESE_KEYWORD_MAP = {
 
 FALLBACK_KEYWORDS = ["technology", "computer", "digital", "workspace", "coding"]
 
+# Unsplash APIのベースURL（環境変数 UNSPLASH_API_URL で差し替え可能。ローカルの偽サーバー用）
+UNSPLASH_API_URL = "https://api.unsplash.com"
+
+# 記事本文・メディアの書き込みキュー（記事は batch/v1 でまとめて、メディアは1件ずつ送信する）
+_batch_writer = None
+
+# ステップごとの実行台帳（指紋が一致するステップは再実行しない）
+_ledger = None
+
+# 今回の実行のジャーナル（--resume での再開用。DRY RUNでは使わない）
+_journal = None
+
+# 再開時に前回の実行から引き継ぐオプション
+RESUME_OPTIONS = ["mode", "post_id", "max_links", "max_images", "force"]
+
+# モードごとに実行するステップ（この順に実行する）
+MODE_STEPS = {
+    "meta-desc": ["meta-desc"],
+    "summary": ["summary"],
+    "links": ["links"],
+    "images": ["images"],
+    "all": ["meta-desc", "summary", "links", "images"],
+}
+
+# 非同期エンジン（--engine async）でのエンドポイント別同時実行数
+ENDPOINT_LIMITS = {
+    "posts": 4,              # WordPress 記事・メディアの更新（batch/v1 と1件ずつの送信）
+    "aioseo": 4,             # AIOSEO メタディスクリプション
+    "media": 2,              # WordPress メディアアップロード
+    "unsplash_search": 2,    # Unsplash 検索API
+    "unsplash_download": 4,  # Unsplash ダウンロード（トリガー・画像本体）
+}
+
+# 1記事の画像を並行してアップロードする数
+IMAGE_UPLOAD_WORKERS = 3
+
+# パイプラインエンジン（--engine pipeline）のステージ間キューの長さ（並列数に対する倍率）
+PIPELINE_QUEUE_FACTOR = 2
+
+# 変更計画ファイル（plan で書き出し、apply で適用する）
+PLAN_FILE_PATTERN = "reports/improvement_plan_*.json"
+
+# ブロックエディタで保存された本文の目印（ブロックの開始コメント）
+BLOCK_MARKER = "<!-- wp:"
+
+# plan で本文に入れる画像枠の目印（apply で画像の figure に置き換える）
+IMAGE_SLOT = "improvement:image-slot"
+IMAGE_SLOT_HTML = f"<!--{IMAGE_SLOT}-->"
+
 
 def load_config():
     """環境変数から設定を読み込む"""
@@ -60,56 +122,35 @@ def load_config():
         if value:
             config[var] = value
 
+    config["UNSPLASH_API_URL"] = os.getenv("UNSPLASH_API_URL", UNSPLASH_API_URL)
     return config
 
 
-def get_all_posts(config):
-    """WordPress REST APIで全記事を取得する"""
-    url = f"{config['WORDPRESS_URL']}/wp-json/wp/v2/posts"
-    auth = (config["WORDPRESS_USERNAME"], config["WORDPRESS_APPLICATION_PASSWORD"])
-
-    all_posts = []
-    page = 1
-
+def get_all_posts(config, full_sync=False):
+    """ローカル記事ストアを差分同期して全記事を取得する"""
     print("WordPress記事を取得中...")
-    while True:
-        params = {"per_page": 100, "page": page, "status": "publish"}
-        response = requests.get(url, params=params, auth=auth)
-
-        if response.status_code != 200:
-            if page == 1:
-                print(f"エラー: 記事の取得に失敗しました (HTTP {response.status_code})")
-                print(f"レスポンス: {response.text[:200]}")
-                sys.exit(1)
-            break
-
-        posts = response.json()
-        if not posts:
-            break
-
-        all_posts.extend(posts)
-        total_pages = int(response.headers.get("X-WP-TotalPages", 1))
-        if page >= total_pages:
-            break
-        page += 1
+    try:
+        with post_store.PostStore() as store:
+            all_posts, stats = post_sync.sync_posts(config, store, full=full_sync)
+    except wp_client.WordPressAPIError as e:
+        print(f"エラー: 記事の取得に失敗しました (HTTP {e.status_code})")
+        print(f"レスポンス: {e.text[:200]}")
+        sys.exit(1)
 
+    mode = "差分同期" if stats['mode'] == 'delta' else "全件同期"
+    print(f"{mode}: 取得 {stats['fetched']}記事 / 削除検出 {stats['removed']}記事")
     print(f"取得完了: {len(all_posts)}記事\n")
     return all_posts
 
 
 def get_single_post(post_id, config):
     """特定の記事を取得"""
-    url = f"{config['WORDPRESS_URL']}/wp-json/wp/v2/posts/{post_id}"
-    auth = (config["WORDPRESS_USERNAME"], config["WORDPRESS_APPLICATION_PASSWORD"])
-
-    response = requests.get(url, params={'context': 'edit'}, auth=auth)
-
-    if response.status_code != 200:
-        print(f"エラー: 記事ID {post_id} の取得に失敗しました (HTTP {response.status_code})")
+    try:
+        return wp_client.get_post(config, post_id, params={'context': 'edit'}, fields="analysis")
+    except wp_client.WordPressAPIError as e:
+        print(f"エラー: 記事ID {post_id} の取得に失敗しました (HTTP {e.status_code})")
         sys.exit(1)
 
-    return response.json()
-
 
 def clean_text(text):
     """HTMLエンティティ除去、改行・空白正規化"""
@@ -119,31 +160,154 @@ def clean_text(text):
     return text
 
 
+def get_batch_writer(config):
+    """プロセス内で共有する書き込みキューを返す"""
+    global _batch_writer
+    if _batch_writer is None:
+        _batch_writer = wp_client.BatchWriter(config, on_results=record_write_results)
+    return _batch_writer
+
+
+def get_ledger():
+    """プロセス内で共有する実行台帳を返す"""
+    global _ledger
+    if _ledger is None:
+        _ledger = improvement_ledger.Ledger()
+    return _ledger
+
+
 def update_post_content(post_id, new_content, config):
-    """WordPress記事のコンテンツを更新"""
-    url = f"{config['WORDPRESS_URL']}/wp-json/wp/v2/posts/{post_id}"
-    auth = (config["WORDPRESS_USERNAME"], config["WORDPRESS_APPLICATION_PASSWORD"])
+    """WordPress記事のコンテンツ更新をキューに追加（batch/v1 でまとめて送信）"""
+    get_batch_writer(config).add("wp/v2/posts", post_id, {"content": new_content})
+
+
+def record_write_results(results):
+    """記事の書き込み結果を実行台帳とジャーナルに記録する
+
+    BatchWriter が送信するたびに呼ばれる。書き込んだ記事はサーバーが返した本文で
+    指紋を記録し（失敗した記事は記録しない）、ジャーナルでは保存完了にする。
+    """
+    written_hashes = {}
+    for (route, object_id), (ok, body) in results.items():
+        if route == "wp/v2/media" and not ok:
+            # 削除されたメディアなら、次回は再利用せずにアップロードし直す
+            media_index.forget_missing(object_id, body)
+        if route != "wp/v2/posts":
+            continue
+        written_hashes[object_id] = improvement_ledger.content_hash(body) if ok else None
+        if ok and _journal is not None:
+            _journal.checkpoint(object_id, "saved")
+    get_ledger().commit(written_hashes)
+
+
+def flush_writes(config):
+    """キューに残った書き込みを送信し、失敗した書き込みを返す
+
+    Returns:
+        {(route, id): エラーメッセージ}
+    """
+    writer = get_batch_writer(config)
+    results = writer.flush()
+    # 送信前に書き込みが済んでいた記事の指紋も、全結果から記録する
+    record_write_results(results)
+    return writer.failures()
 
-    payload = {
-        "content": new_content
-    }
 
-    response = requests.post(url, json=payload, auth=auth)
+# =============================================================================
+# 記事ドキュメント
+# =============================================================================
 
-    if response.status_code != 200:
-        raise Exception(f"記事更新失敗 (HTTP {response.status_code}): {response.text[:200]}")
+class PostDocument:
+    """1記事分の解析済み本文
+
+    本文のHTMLは記事ごとに1回だけ解析し、各ステップは同じツリーを読み書きする。
+    文字列への変換は全ステップの後に html() で1回だけ行う。
+    メタディスクリプションも保存時まで保持し、本文と一緒に送信する。
+
+    編集するのは content.raw（context=edit で取得した保存形式の本文）。rendered は
+    ショートコードやブロックの描画結果と lazy-load 等の属性を含むため、書き戻すと
+    保存される本文が実行のたびに肥大化する。raw がない場合（ベンチマークなど）は rendered を使う。
+    ブロックエディタの記事では、追加するセクションをブロックの区切りに
+    カスタムHTMLブロック（<!-- wp:html -->）として挿入する。
+    """
+
+    def __init__(self, post):
+        self.post = post
+        content = post['content'].get('raw')
+        if content is None:
+            content = post['content']['rendered']
+        self.blocks = BLOCK_MARKER in content
+        self.soup = html_backend.parse_fragment(content)
+        self.added = []  # このドキュメントで追加したセクション
+        self.changed = False
+        self.meta_description = None
+
+    def is_added(self, tag):
+        """追加したセクション（またはその中）の要素か"""
+        return any(tag is section or any(parent is section for parent in tag.parents)
+                   for section in self.added)
+
+    def append_section(self, section):
+        """セクションを本文の最後（最後の p/div/ul/ol の後）に挿入する
+
+        追加済みのセクションの中には入れず、その後ろに続ける。
+        """
+        last_elements = self.soup.find_all(['p', 'div', 'ul', 'ol'])
+        if last_elements:
+            last = last_elements[-1]
+            for added in self.added:
+                if last is added or any(parent is added for parent in last.parents):
+                    last = added
+            self.insert_after(last, section)
+        else:
+            # 要素が見つからない場合はsoupに直接追加
+            self.soup.append(section)
+            if self.blocks:
+                section.insert_before("\n", Comment(" wp:html "), "\n")
+                section.insert_after("\n", Comment(" /wp:html "))
+        self.added.append(section)
+        self.changed = True
+
+    def insert_after(self, tag, node):
+        """要素の後ろに挿入する（ブロックエディタの記事では、その要素のブロックの後ろに挿入する）
+
+        コメント（画像枠の目印）はブロックで包まない。apply で画像に置き換えるときに包む。
+        """
+        if not self.blocks:
+            tag.insert_after(node)
+            return
+        anchor = self.block_end(tag)
+        if isinstance(node, Comment):
+            anchor.insert_after("\n", node)
+        else:
+            anchor.insert_after("\n", Comment(" wp:html "), "\n", node, "\n", Comment(" /wp:html "))
+
+    def block_end(self, tag):
+        """要素を含む最上位のブロックの終わり（閉じコメント <!-- /wp:... -->）"""
+        top = tag
+        while top.parent is not None and top.parent is not self.soup:
+            top = top.parent
+        for sibling in top.next_siblings:
+            if isinstance(sibling, Comment):
+                if sibling.strip().startswith("/wp:"):
+                    return sibling
+                break
+            if getattr(sibling, 'name', None):
+                break
+        return top
 
-    return response.json()
+    def html(self):
+        return str(self.soup)
 
 
 # =============================================================================
 # メタディスクリプション関連
 # =============================================================================
 
-def generate_meta_description(post):
+def generate_meta_description(doc):
     """記事からメタディスクリプションを生成（120-160文字）"""
-    html_content = post['content']['rendered']
-    soup = BeautifulSoup(html_content, 'html.parser')
+    post = doc.post
+    soup = doc.soup
 
     # 1. 最初の段落を抽出（pタグ）
     first_paragraphs = soup.find_all('p', limit=3)
@@ -194,16 +358,15 @@ def generate_meta_description(post):
 
 def set_meta_description(post_id, meta_desc, config):
     """All in One SEO (AIOSEO)のメタディスクリプションを設定"""
-    url = f"{config['WORDPRESS_URL']}/wp-json/aioseo/v1/post"
-    auth = (config["WORDPRESS_USERNAME"], config["WORDPRESS_APPLICATION_PASSWORD"])
-
     # AIOSEO API用のペイロード
     payload = {
         "id": post_id,
         "description": meta_desc
     }
 
-    response = requests.post(url, json=payload, auth=auth)
+    with wp_client.endpoint_slot("aioseo"):
+        # 同じ内容の再設定は結果が変わらないため、一時的なエラーは再試行する
+        response = wp_client.wp_post(config, "aioseo/v1/post", payload, idempotent=True)
 
     if response.status_code != 200:
         raise Exception(f"メタディスクリプション設定失敗 (HTTP {response.status_code}): {response.text[:200]}")
@@ -212,6 +375,10 @@ def set_meta_description(post_id, meta_desc, config):
     if not result.get('success'):
         raise Exception(f"AIOSEO API エラー: {result.get('message', 'Unknown error')}")
 
+    # ローカル記事ストアにも反映（次回以降の分析で再取得しないため）
+    with post_store.PostStore() as store:
+        store.set_meta_description(post_id, meta_desc)
+
     return result
 
 
@@ -219,13 +386,12 @@ def set_meta_description(post_id, meta_desc, config):
 # まとめセクション関連
 # =============================================================================
 
-def generate_summary_section(post):
+def generate_summary_section(doc):
     """記事の見出しから「まとめ」セクションを生成"""
-    html_content = post['content']['rendered']
-    soup = BeautifulSoup(html_content, 'html.parser')
+    soup = doc.soup
 
-    # 見出し（h2, h3）を取得
-    headings = soup.find_all(['h2', 'h3'])
+    # 見出し（h2, h3）を取得（このドキュメントで追加したセクションは除く）
+    headings = [h for h in soup.find_all(['h2', 'h3']) if not doc.is_added(h)]
 
     # 「まとめ」「結論」などのキーワードを含む見出しは除外
     summary_keywords = ['まとめ', '結論', '要約', 'ポイント', '総括']
@@ -236,7 +402,7 @@ def generate_summary_section(post):
 
     if len(content_headings) < 2:
         # 見出しが少ない場合は段落から抽出
-        paragraphs = soup.find_all('p', limit=5)
+        paragraphs = [p for p in soup.find_all('p') if not doc.is_added(p)][:5]
         summary_items = [
             p.get_text().strip()[:100] + ('...' if len(p.get_text().strip()) > 100 else '')
             for p in paragraphs if len(p.get_text().strip()) > 50
@@ -248,9 +414,9 @@ def generate_summary_section(post):
     return summary_items
 
 
-def insert_summary_section(html_content, summary_items):
+def insert_summary_section(doc, summary_items):
     """まとめセクションを本文最後に挿入"""
-    soup = BeautifulSoup(html_content, 'html.parser')
+    soup = doc.soup
 
     # まとめセクション作成
     summary_div = soup.new_tag('div', attrs={'class': 'summary-section'})
@@ -271,22 +437,13 @@ def insert_summary_section(html_content, summary_items):
     # 本文の最後に挿入（既存のまとめがない場合のみ）
     existing_summary = soup.find(['h2', 'h3'], string=lambda t: t and any(kw in t for kw in ['まとめ', '結論']))
     if not existing_summary:
-        # 最後の要素を探す
-        last_elements = soup.find_all(['p', 'div', 'ul', 'ol'])
-        if last_elements:
-            last_elements[-1].insert_after(summary_div)
-        else:
-            # 要素が見つからない場合はsoupに直接追加
-            soup.append(summary_div)
+        doc.append_section(summary_div)
 
-    return str(soup)
 
-
-def add_summary_to_post(post, config, dry_run=False):
-    """記事にまとめセクションを追加"""
+def add_summary_to_post(doc):
+    """記事にまとめセクションを追加（ドキュメントを変更する）"""
     # 既にまとめがある場合はスキップ
-    html_content = post['content']['rendered']
-    soup = BeautifulSoup(html_content, 'html.parser')
+    soup = doc.soup
     summary_keywords = ['まとめ', '結論', '要約', 'ポイント', '総括']
     existing_summary = soup.find(['h2', 'h3'], string=lambda t: t and any(kw in t for kw in summary_keywords))
 
@@ -294,17 +451,13 @@ def add_summary_to_post(post, config, dry_run=False):
         return False, "既にまとめセクションが存在します"
 
     # まとめ生成
-    summary_items = generate_summary_section(post)
+    summary_items = generate_summary_section(doc)
 
     if not summary_items:
         return False, "まとめ項目を生成できませんでした"
 
     # HTML挿入
-    new_content = insert_summary_section(html_content, summary_items)
-
-    # WordPress更新
-    if not dry_run:
-        update_post_content(post['id'], new_content, config)
+    insert_summary_section(doc, summary_items)
 
     return True, f"まとめセクション追加（{len(summary_items)}項目）"
 
@@ -335,9 +488,9 @@ def load_internal_link_suggestions(csv_path):
     return suggestions
 
 
-def insert_internal_links(html_content, link_suggestions, max_links=5):
-    """HTMLコンテンツに内部リンクを挿入"""
-    soup = BeautifulSoup(html_content, 'html.parser')
+def insert_internal_links(doc, link_suggestions, max_links=5):
+    """記事ドキュメントに内部リンクを挿入"""
+    soup = doc.soup
 
     # 類似度でソート（高い順）
     sorted_links = sorted(link_suggestions, key=lambda x: x['similarity'], reverse=True)[:max_links]
@@ -359,18 +512,12 @@ def insert_internal_links(html_content, link_suggestions, max_links=5):
     related_section.append(ul)
 
     # 本文の最後に挿入
-    last_elements = soup.find_all(['p', 'div', 'ul', 'ol'])
-    if last_elements:
-        last_elements[-1].insert_after(related_section)
-    else:
-        soup.append(related_section)
-
-    return str(soup)
+    doc.append_section(related_section)
 
 
-def add_internal_links_to_post(post, suggestions_dict, max_links, config, dry_run=False):
-    """記事に内部リンクを追加"""
-    post_id = post['id']
+def add_internal_links_to_post(doc, suggestions_dict, max_links):
+    """記事に内部リンクを追加（ドキュメントを変更する）"""
+    post_id = doc.post['id']
 
     if post_id not in suggestions_dict:
         return False, f"記事ID {post_id} の内部リンク提案がありません"
@@ -380,14 +527,8 @@ def add_internal_links_to_post(post, suggestions_dict, max_links, config, dry_ru
     if not link_suggestions:
         return False, "内部リンク候補がありません"
 
-    html_content = post['content']['rendered']
-
     # リンク挿入
-    new_content = insert_internal_links(html_content, link_suggestions, max_links)
-
-    # WordPress更新
-    if not dry_run:
-        update_post_content(post_id, new_content, config)
+    insert_internal_links(doc, link_suggestions, max_links)
 
     return True, f"内部リンク追加（{min(len(link_suggestions), max_links)}個）"
 
@@ -422,12 +563,22 @@ def extract_keywords(title):
 
 
 def search_unsplash_images(query, config, per_page=10):
-    """Unsplash APIで画像を検索する（複数枚）。レート制限情報も返す。"""
-    url = "https://api.unsplash.com/search/photos"
+    """Unsplash APIで画像を検索する（複数枚）。レート制限情報も返す。
+
+    同じ検索の結果は unsplash_cache から返し、リクエストを送らない（レート残りはNone）。
+    """
+    url = f"{config.get('UNSPLASH_API_URL', UNSPLASH_API_URL)}/search/photos"
     headers = {"Authorization": f"Client-ID {config['UNSPLASH_ACCESS_KEY']}"}
     params = {"query": query, "per_page": min(per_page, 30), "orientation": "landscape"}
 
-    response = requests.get(url, headers=headers, params=params)
+    cached = unsplash_cache.get(query, params["per_page"], params["orientation"])
+    if cached is not None:
+        return cached, None
+
+    rate_limiter.acquire("unsplash")
+    with wp_client.endpoint_slot("unsplash_search"):
+        response = wp_client.request("GET", url, headers=headers, params=params)
+    rate_limiter.update_from_headers("unsplash", response.headers)
 
     rate_remaining = int(response.headers.get("X-Ratelimit-Remaining", 50))
 
@@ -435,18 +586,18 @@ def search_unsplash_images(query, config, per_page=10):
         return [], rate_remaining
 
     data = response.json()
-    if data["total"] == 0 or not data["results"]:
-        return [], rate_remaining
 
-    # 複数の画像情報を返す
+    # 複数の画像情報を返す（0件の結果もキャッシュする）
     images = []
-    for photo in data["results"]:
+    for photo in data["results"] if data["total"] else []:
         images.append({
+            "id": photo["id"],
             "url": photo["urls"]["regular"],
             "download_location": photo["links"]["download_location"],
             "description": photo.get("description") or photo.get("alt_description") or query,
             "photographer": photo["user"]["name"],
         })
+    unsplash_cache.put(query, params["per_page"], params["orientation"], images)
 
     return images, rate_remaining
 
@@ -459,57 +610,54 @@ def search_unsplash_image(query, config):
     return images[0], rate_remaining
 
 
-def trigger_unsplash_download(download_location, config):
-    """Unsplash利用規約に従いダウンロードをトリガーする"""
-    headers = {"Authorization": f"Client-ID {config['UNSPLASH_ACCESS_KEY']}"}
-    requests.get(download_location, headers=headers)
-
+def prepare_image(post, index, image_info, title, config):
+    """記事に挿入する画像を1枚用意する（アップロード済みの同じ画像があれば使う）
 
-def download_image(image_url):
-    """画像をダウンロードしてバイトデータを返す"""
-    response = requests.get(image_url, timeout=30)
-    response.raise_for_status()
-    return response.content
-
-
-def upload_to_wordpress(image_data, filename, alt_text, config):
-    """WordPressメディアライブラリに画像をアップロードする"""
-    url = f"{config['WORDPRESS_URL']}/wp-json/wp/v2/media"
-    auth = (config["WORDPRESS_USERNAME"], config["WORDPRESS_APPLICATION_PASSWORD"])
-
-    files = {
-        "file": (filename, image_data, "image/jpeg"),
-    }
-    headers = {
-        "User-Agent": "Mozilla/5.0 (compatible; WP-Script/1.0)",
+    Returns:
+        挿入する画像の情報 {"url", "alt", "photographer"}
+    """
+    alt_text = f"{title} - {image_info['description']}"
+    reused = _journal.find_media(post['id'], image_info['url']) if _journal else None
+    if reused:
+        # 中断した実行でアップロード済みの画像を使い回す（alt_textは再設定）
+        media_id, source_url = reused['id'], reused['source_url']
+        get_batch_writer(config).add("wp/v2/media", media_id, {"alt_text": alt_text})
+    else:
+        # 同じ画像がアップロード済みならそのメディアを使う（なければWordPressにアップロード）
+        # alt_text の再設定は記事の更新と一緒にキューに追加する
+        filename = f"article-{post['id']}-image-{index + 1}.jpg"
+        media, _ = image_transfer.upload_unsplash_image(
+            config, image_info, filename, alt_text, get_batch_writer(config))
+        media_id, source_url = media['id'], media['source_url']
+        if _journal is not None:
+            _journal.record_media(post['id'], image_info['url'],
+                                  {'id': media_id, 'source_url': source_url})
+
+    return {
+        'url': source_url,
+        'alt': alt_text,
+        'photographer': image_info['photographer']
     }
 
-    response = requests.post(url, headers=headers, files=files, auth=auth)
 
-    if response.status_code not in (200, 201):
-        raise Exception(f"メディアアップロード失敗 (HTTP {response.status_code}): {response.text[:200]}")
+def insert_images_into_content(doc, images, post_title):
+    """記事ドキュメントに画像を挿入（h2見出しの後に均等配置）
 
-    media = response.json()
+    images の要素が None の位置には、apply で画像を入れる枠の目印（IMAGE_SLOT）を入れる。
 
-    # alt_textを設定
-    update_url = f"{url}/{media['id']}"
-    requests.post(update_url, json={"alt_text": alt_text}, auth=auth)
+    Returns:
+        挿入したらTrue
+    """
+    soup = doc.soup
 
-    return media["id"], media["source_url"]
-
-
-def insert_images_into_content(html_content, images, post_title):
-    """HTMLコンテンツに画像を挿入（h2見出しの後に均等配置）"""
-    soup = BeautifulSoup(html_content, 'html.parser')
-
-    # h2見出しを取得
-    h2_headings = soup.find_all('h2')
+    # h2見出しを取得（このドキュメントで追加したまとめ・関連記事は除く）
+    h2_headings = [h for h in soup.find_all('h2') if not doc.is_added(h)]
 
     if not h2_headings:
         # h2がない場合はpタグの後に挿入
-        paragraphs = soup.find_all('p')
+        paragraphs = [p for p in soup.find_all('p') if not doc.is_added(p)]
         if len(paragraphs) < 2:
-            return html_content  # 挿入できる場所がない
+            return False  # 挿入できる場所がない
         insert_positions = paragraphs[:len(images)]
     else:
         # 画像を均等配置する位置を決定
@@ -529,29 +677,60 @@ def insert_images_into_content(html_content, images, post_title):
                 step = num_h2 // num_images
                 insert_positions = [h2_headings[i * step] for i in range(num_images)]
 
-    # 画像を挿入（後ろから挿入して位置ズレ防止）
+    # 画像を挿入（後ろから挿入して位置ズレ防止。None は画像枠の目印を入れる）
     for position, image_info in zip(reversed(insert_positions), reversed(images)):
-        figure = soup.new_tag('figure', attrs={'class': 'wp-block-image'})
-        img_tag = soup.new_tag('img', src=image_info['url'], alt=image_info['alt'])
-        figure.append(img_tag)
+        if image_info is None:
+            doc.insert_after(position, Comment(IMAGE_SLOT))
+        else:
+            doc.insert_after(position, build_image_figure(soup, image_info))
+
+    doc.changed = True
+    return True
 
-        # クレジット表記
-        figcaption = soup.new_tag('figcaption')
-        figcaption.string = f"Photo by {image_info['photographer']} on Unsplash"
-        figure.append(figcaption)
 
-        position.insert_after(figure)
+def build_image_figure(soup, image_info):
+    """本文に挿入する画像の figure 要素（クレジット表記付き）"""
+    figure = soup.new_tag('figure', attrs={'class': 'wp-block-image'})
+    img_tag = soup.new_tag('img', src=image_info['url'], alt=image_info['alt'])
+    figure.append(img_tag)
 
-    return str(soup)
+    # クレジット表記
+    figcaption = soup.new_tag('figcaption')
+    figcaption.string = f"Photo by {image_info['photographer']} on Unsplash"
+    figure.append(figcaption)
+    return figure
 
 
-def add_images_to_post(post, max_images, config, dry_run=False):
-    """記事に画像を追加（バリエーション改善版）"""
+def fill_image_slots(content, images):
+    """plan で本文に入れた画像枠を、用意した画像の figure に置き換える
+
+    本文は解析せずに文字列として置き換える。画像が足りない枠は取り除く。
+    ブロックエディタの記事では PostDocument.insert_after と同じくカスタムHTMLブロックで包む。
+    """
+    soup = html_backend.parse_fragment("")
+    blocks = BLOCK_MARKER in content
+    parts = content.split(IMAGE_SLOT_HTML)
+    filled = [parts[0]]
+    for i, part in enumerate(parts[1:]):
+        if i < len(images):
+            figure = str(build_image_figure(soup, images[i]))
+            filled.append(f"<!-- wp:html -->\n{figure}\n<!-- /wp:html -->" if blocks else figure)
+        filled.append(part)
+    return "".join(filled)
+
+
+def collect_images(post, max_images, config, dry_run=False):
+    """記事に追加する画像を用意する（Unsplash検索・ダウンロード・アップロード）
+
+    ネットワーク処理のみで本文には触れない。本文への挿入は add_images_to_post で行う。
+
+    Returns:
+        (挿入する画像のリスト, エラーメッセージ（成功時はNone）, Unsplashのレート残り)
+    """
     if 'UNSPLASH_ACCESS_KEY' not in config:
-        return False, "Unsplash APIキーが設定されていません"
+        return [], "Unsplash APIキーが設定されていません", None
 
     title = html_module.unescape(post['title']['rendered'])
-    html_content = post['content']['rendered']
 
     # キーワード抽出
     keyword = extract_keywords(title)
@@ -573,11 +752,11 @@ def add_images_to_post(post, max_images, config, dry_run=False):
                 break
 
     if not images_from_unsplash:
-        return False, "画像が見つかりませんでした"
+        return [], "画像が見つかりませんでした", rate_remaining
 
     # 重複チェック用のセット
     used_urls = set()
-    images_to_insert = []
+    selected = []
 
     # 画像を選択（インデックスベース、重複なし）
     for i in range(min(max_images, len(images_from_unsplash))):
@@ -594,49 +773,694 @@ def add_images_to_post(post, max_images, config, dry_run=False):
                         break
 
             used_urls.add(image_info['url'])
+            selected.append(image_info)
+
+    if dry_run:
+        # DRY RUNモードでは画像情報のみ記録
+        images_to_insert = [{
+            'url': image_info['url'],
+            'alt': f"{title} - {image_info['description']}",
+            'photographer': image_info['photographer']
+        } for image_info in selected]
+    elif len(selected) > 1:
+        # 1記事分の画像は並行してアップロードする（挿入順は選択順のまま）
+        with concurrent.futures.ThreadPoolExecutor(max_workers=IMAGE_UPLOAD_WORKERS) as executor:
+            images_to_insert = list(executor.map(
+                lambda args: prepare_image(post, args[0], args[1], title, config), enumerate(selected)))
+    else:
+        images_to_insert = [prepare_image(post, i, image_info, title, config)
+                            for i, image_info in enumerate(selected)]
+
+    if not images_to_insert:
+        return [], "画像が見つかりませんでした", rate_remaining
+
+    return images_to_insert, None, rate_remaining
 
-            if not dry_run:
-                # Unsplashダウンロードトリガー（利用規約準拠）
-                trigger_unsplash_download(image_info["download_location"], config)
 
-                # 画像ダウンロード
-                image_data = download_image(image_info["url"])
+def add_images_to_post(doc, collected, log=print):
+    """collect_images で用意した画像を記事に追加（バリエーション改善版。ドキュメントを変更する）"""
+    images_to_insert, error, rate_remaining = collected
+    if error:
+        return False, error
+
+    # レート制限チェック
+    if rate_remaining is not None and rate_remaining <= 5:
+        log(f"\n        ⚠️ Unsplash APIレート制限に近づいています（残り{rate_remaining}）")
+
+    # HTML挿入
+    title = html_module.unescape(doc.post['title']['rendered'])
+    insert_images_into_content(doc, images_to_insert, title)
+
+    return True, f"画像追加（{len(images_to_insert)}枚、{format_rate_remaining(rate_remaining)}）"
+
+
+def format_rate_remaining(rate_remaining):
+    """Unsplashのレート残りの表示（検索キャッシュから返した場合はNone）"""
+    return "検索キャッシュ" if rate_remaining is None else f"レート残り{rate_remaining}"
+
+
+# =============================================================================
+# 記事単位の処理・実行エンジン
+# =============================================================================
+
+def save_post_changes(post_id, new_content, meta_description, config):
+    """変換済みの記事の変更をまとめて保存する
+
+    本文は1記事につき1件の更新としてキューに追加し（batch/v1 でまとめて送信）、
+    メタディスクリプションは同じタイミングで AIOSEO に送信する。
+
+    Args:
+        new_content: 変更後の本文（変更がなければNone）
+        meta_description: 設定するメタディスクリプション（なければNone）
+
+    Returns:
+        保存した項目名のリスト
+    """
+    saved = []
+    # AIOSEO を先に送る（失敗したら本文も送らず、再開時に記事ごとやり直す）
+    if meta_description is not None:
+        done = _journal.get(post_id, "meta-desc") if _journal else None
+        if done is None or done.get("description") != meta_description:
+            set_meta_description(post_id, meta_description, config)
+            if _journal is not None:
+                _journal.checkpoint(post_id, "meta-desc", {"description": meta_description})
+        saved.append("メタディスクリプション")
+    if new_content is not None:
+        update_post_content(post_id, new_content, config)
+        saved.insert(0, "本文")
+    return saved
+
+
+class OutputBuffer:
+    """記事ごとの出力をまとめて表示するためのバッファ（print互換）"""
+
+    def __init__(self):
+        self.parts = []
+
+    def __call__(self, *values, sep=' ', end='\n', flush=False):
+        self.parts.append(sep.join(str(v) for v in values) + end)
+
+    def getvalue(self):
+        return ''.join(self.parts)
+
+
+def post_header(post, index, total):
+    """記事ごとの出力の見出し行"""
+    title = html_module.unescape(post['title']['rendered'])[:50]
+    return f"\n[{index}/{total}] 「{title}...」"
 
-                # WordPressにアップロード
-                filename = f"article-{post['id']}-image-{i+1}.jpg"
-                alt_text = f"{title} - {image_info['description']}"
-                media_id, source_url = upload_to_wordpress(image_data, filename, alt_text, config)
 
-                images_to_insert.append({
-                    'url': source_url,
-                    'alt': alt_text,
-                    'photographer': image_info['photographer']
-                })
+def link_suggestions_for(post, suggestions_dict):
+    """記事1件分の内部リンク提案（CSV未読み込みならNone）
+
+    プロセスプールに渡すデータを小さくするため、提案全体ではなく該当記事の分だけを渡す。
+    """
+    if suggestions_dict is None:
+        return None
+    if post['id'] not in suggestions_dict:
+        return {}
+    return {post['id']: suggestions_dict[post['id']]}
+
+
+def step_params(post, args, suggestions_dict):
+    """実行台帳の指紋に含めるステップごとのパラメータ"""
+    suggestions = link_suggestions_for(post, suggestions_dict)
+    if suggestions:
+        suggestions = sorted(suggestions[post['id']], key=lambda link: link['target_id'])
+    return {
+        "meta-desc": None,
+        "summary": None,
+        "links": {"max_links": args.max_links, "suggestions": suggestions},
+        "images": {"max_images": args.max_images},
+    }
+
+
+def plan_posts(posts, args, suggestions_dict):
+    """記事ごとに実行するステップを決める
+
+    実行台帳の指紋が一致するステップは除く（--force なら全ステップ）。
+
+    Returns:
+        (実行する [(記事, ステップのリスト)], スキップした記事数)
+    """
+    steps = MODE_STEPS[args.mode]
+    if args.force:
+        return [(post, steps) for post in posts], 0
+
+    ledger = get_ledger()
+    plans = []
+    for post in posts:
+        pending = ledger.pending_steps(post, steps, step_params(post, args, suggestions_dict))
+        if pending:
+            plans.append((post, pending))
+    return plans, len(posts) - len(plans)
+
+
+def fetch_post_images(post, steps, args, config):
+    """記事単位のネットワーク処理（画像の用意）。画像ステップがなければNone
+
+    中断した実行で用意済みの画像はジャーナルから復元し、リクエストを送らない。
+    """
+    if "images" not in steps:
+        return None
+    if _journal is not None:
+        collected = _journal.get(post['id'], "images")
+        if collected is not None:
+            return tuple(collected)
+
+    collected = collect_images(post, args.max_images, config, args.dry_run)
+    if _journal is not None and collected[1] is None:
+        _journal.checkpoint(post['id'], "images", list(collected))
+    return collected
+
+
+def require_raw_content(post):
+    """raw本文（context=edit）がなければ例外（rendered を書き戻すと本文が肥大化するため）"""
+    if 'raw' not in post['content']:
+        raise Exception("raw本文がありません（context=edit で取得できる認証情報で記事ストアを同期してください）")
+
+
+def transform_post(post, steps, max_links, max_images, suggestions, images, dry_run=False):
+    """1記事分の本文変換（メタディスクリプション・まとめ・内部リンク・画像の挿入）
+
+    HTMLの解析と変換だけを行いネットワークには触れないため、プロセスプールでも実行できる。
+    画像は fetch_post_images で用意したものを受け取る。
+
+    Returns:
+        (変更後の本文（変更がなければNone）, メタディスクリプション（なければNone）, ログ文字列,
+         結果が確定したステップのリスト（実行台帳に記録するもの）)
+    """
+    require_raw_content(post)
+    log = OutputBuffer()
+    doc = PostDocument(post)
+    settled = run_steps(doc, steps, max_links, max_images, suggestions, images, dry_run, log)
+    new_content = doc.html() if doc.changed else None
+    return new_content, doc.meta_description, log.getvalue(), settled
+
+
+def run_steps(doc, steps, max_links, max_images, suggestions, images, dry_run, log, step_total=None):
+    """記事ドキュメントに各ステップを順に適用する（transform_post / plan_post 共通）
+
+    Returns:
+        結果が確定したステップのリスト
+    """
+    step_total = step_total or len(steps)
+    step_num = 0
+    settled = []
+
+    if 'meta-desc' in steps:
+        step_num += 1
+        log(f"  [{step_num}/{step_total}] メタディスクリプション設定... ", end="")
+        doc.meta_description = generate_meta_description(doc)
+        log(f"{len(doc.meta_description)}文字")
+        if dry_run:
+            log(f"        プレビュー: {doc.meta_description[:80]}...")
+        settled.append('meta-desc')
+
+    if 'summary' in steps:
+        step_num += 1
+        log(f"  [{step_num}/{step_total}] まとめセクション追加... ", end="")
+        success, message = add_summary_to_post(doc)
+        settled.append('summary')  # 既存のまとめや見出し不足も本文が同じなら結果は同じ
+        if success:
+            log(f"✅ {message}")
+        else:
+            log(f"⚠️ {message}")
+
+    if 'links' in steps:
+        step_num += 1
+        log(f"  [{step_num}/{step_total}] 内部リンク追加（最大{max_links}個）... ", end="")
+        settled.append('links')  # CSV未読み込みも指紋に含める（CSVができたら再実行される）
+        if suggestions is not None:
+            success, message = add_internal_links_to_post(doc, suggestions, max_links)
+            if success:
+                log(f"✅ {message}")
             else:
-                # DRY RUNモードでは画像情報のみ記録
-                images_to_insert.append({
-                    'url': image_info['url'],
-                    'alt': f"{title} - {image_info['description']}",
-                    'photographer': image_info['photographer']
-                })
+                log(f"⚠️ {message}")
+        else:
+            log("⚠️ スキップ（CSV未読み込み）")
+
+    if 'images' in steps:
+        step_num += 1
+        log(f"  [{step_num}/{step_total}] 画像追加（最大{max_images}枚）... ", end="")
+        success, message = add_images_to_post(doc, images, log=log)
+        if success:
+            settled.append('images')  # 見つからなかった場合などは次回も試す
+            log(f"✅ {message}")
+        else:
+            log(f"⚠️ {message}")
 
-            time.sleep(0.3)  # API負荷軽減
+    return settled
 
-    # レート制限チェック
-    if rate_remaining <= 5:
-        print(f"\n        ⚠️ Unsplash APIレート制限に近づいています（残り{rate_remaining}）")
 
-    if not images_to_insert:
-        return False, "画像が見つかりませんでした"
+def transform_args(post, steps, args, suggestions_dict, images):
+    """transform_post に渡す引数（プロセスプールへ送れる値のみ）"""
+    return (post, steps, args.max_links, args.max_images,
+            link_suggestions_for(post, suggestions_dict), images, args.dry_run)
 
-    # HTML挿入
-    new_content = insert_images_into_content(html_content, images_to_insert, title)
 
-    # WordPress更新
-    if not dry_run:
-        update_post_content(post['id'], new_content, config)
+def save_transformed(post, result, args, config, suggestions_dict, log):
+    """変換結果を保存し、確定したステップの指紋を実行台帳に保留する（DRY RUNでは何もしない）"""
+    new_content, meta_description, _, settled = result
+    if args.dry_run:
+        return
+    # 全ステップの変更をまとめて1回だけ書き出す
+    saved = save_post_changes(post['id'], new_content, meta_description, config)
+    if saved:
+        log(f"  💾 保存: {' + '.join(saved)}")
+    if new_content is None and _journal is not None:
+        # 本文を書き込む記事は、書き込み結果が確定した時点で保存完了にする（record_write_results）
+        _journal.checkpoint(post['id'], "saved")
+
+    # 本文を書き込んだ記事の指紋は、書き込み結果が確定してから記録する（flush_writes）
+    params = step_params(post, args, suggestions_dict)
+    fingerprints = {
+        step: (improvement_ledger.params_hash(params[step]),
+               improvement_ledger.hash_value(meta_description) if step == 'meta-desc' else None)
+        for step in settled
+    }
+    unchanged_hash = improvement_ledger.content_hash(post) if new_content is None else None
+    get_ledger().stage(post['id'], fingerprints, unchanged_hash)
+
+
+def process_post(post, steps, index, total, args, config, suggestions_dict, log=print):
+    """1記事分の改善ステップを実行する
+
+    Returns:
+        成功したらTrue（KeyboardInterrupt は呼び出し元へ送出）
+    """
+    log(post_header(post, index, total))
+
+    try:
+        images = fetch_post_images(post, steps, args, config)
+        result = transform_post(*transform_args(post, steps, args, suggestions_dict, images))
+        log(result[2], end="")
+        save_transformed(post, result, args, config, suggestions_dict, log)
+        return True
+
+    except Exception as e:
+        log(f"  ❌ 失敗: {e}")
+        return False
+
+
+def new_outcomes():
+    """実行エンジンが記事ごとの結果を記録する {"success": 記事IDの集合, "fail": 記事IDの集合}
+
+    エンジンは記事の処理が終わるたびに記録するため、中断した場合もそれまでの結果が残る。
+    """
+    return {"success": set(), "fail": set()}
+
+
+def record_outcome(outcomes, post, ok):
+    outcomes["success" if ok else "fail"].add(post['id'])
+
+
+def run_posts_sequential(plans, args, config, suggestions_dict, outcomes):
+    """従来の逐次実行（1記事ずつ処理。リクエスト間隔は rate_limiter が調整）
+
+    plans は plan_posts が返す [(記事, ステップのリスト)]。結果は outcomes（new_outcomes）に記録する。
+    """
+    for i, (post, steps) in enumerate(plans, 1):
+        ok = process_post(post, steps, i, len(plans), args, config, suggestions_dict)
+        record_outcome(outcomes, post, ok)
+
+
+async def run_posts_async(plans, args, config, suggestions_dict, outcomes):
+    """asyncioで複数記事を並行処理する
+
+    各記事の処理はスレッドで実行し、記事の同時処理数は --workers、
+    エンドポイントごとの同時リクエスト数は ENDPOINT_LIMITS で制限する。
+    出力は記事ごとにまとめ、記事の順番どおりに表示する。結果は処理が終わった順に outcomes に記録する。
+    """
+    semaphore = asyncio.Semaphore(args.workers)
+
+    async def run_one(index, post, steps):
+        async with semaphore:
+            log = OutputBuffer()
+            ok = await asyncio.to_thread(
+                process_post, post, steps, index, len(plans), args, config, suggestions_dict, log
+            )
+            record_outcome(outcomes, post, ok)
+            return log
+
+    tasks = [asyncio.create_task(run_one(i, post, steps)) for i, (post, steps) in enumerate(plans, 1)]
+
+    for task in tasks:
+        log = await task
+        print(log.getvalue(), end="", flush=True)
+
+
+async def run_posts_pipeline(plans, args, config, suggestions_dict, outcomes):
+    """ネットワーク処理とHTML変換を別ステージに分けたパイプラインで記事を処理する
+
+    取得ステージ（スレッド、--workers 並列）: Unsplash検索・画像のダウンロード・アップロード
+    変換ステージ（プロセスプール、--processes 並列）: HTMLの解析と変換（transform_post）
+    保存ステージ（スレッド、--workers 並列）: 本文とメタディスクリプションの保存
+    ステージ間は上限付きのキューでつなぎ、後段が詰まれば前段を待たせる。
+    出力は記事ごとにまとめ、記事の順番どおりに表示する。結果は処理が終わった順に outcomes に記録する。
+    """
+    loop = asyncio.get_running_loop()
+    total = len(plans)
+    queue_size = max(args.workers, args.processes) * PIPELINE_QUEUE_FACTOR
+    transform_queue = asyncio.Queue(maxsize=queue_size)
+    save_queue = asyncio.Queue(maxsize=queue_size)
+    items = iter(enumerate(plans, 1))
+
+    logs = {}
+    next_index = 1
+
+    def finish(index, post, ok, log):
+        """記事の処理結果を記録し、順番が来た記事から表示する"""
+        nonlocal next_index
+        record_outcome(outcomes, post, ok)
+        logs[index] = log
+        while next_index in logs:
+            print(logs.pop(next_index).getvalue(), end="", flush=True)
+            next_index += 1
+
+    async def fetch_worker():
+        for index, (post, steps) in items:
+            log = OutputBuffer()
+            log(post_header(post, index, total))
+            try:
+                images = await asyncio.to_thread(fetch_post_images, post, steps, args, config)
+            except Exception as e:
+                log(f"  ❌ 失敗: {e}")
+                finish(index, post, False, log)
+                continue
+            await transform_queue.put((index, post, steps, log, images))
+
+    async def transform_worker(pool):
+        while True:
+            item = await transform_queue.get()
+            if item is None:
+                return
+            index, post, steps, log, images = item
+            try:
+                result = await loop.run_in_executor(
+                    pool, transform_post, *transform_args(post, steps, args, suggestions_dict, images)
+                )
+            except Exception as e:
+                log(f"  ❌ 失敗: {e}")
+                finish(index, post, False, log)
+                continue
+            log(result[2], end="")
+            await save_queue.put((index, post, log, result))
+
+    async def save_worker():
+        while True:
+            item = await save_queue.get()
+            if item is None:
+                return
+            index, post, log, result = item
+            try:
+                await asyncio.to_thread(
+                    save_transformed, post, result, args, config, suggestions_dict, log
+                )
+            except Exception as e:
+                log(f"  ❌ 失敗: {e}")
+                finish(index, post, False, log)
+                continue
+            finish(index, post, True, log)
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=args.processes) as pool:
+        savers = [asyncio.create_task(save_worker()) for _ in range(args.workers)]
+        transformers = [asyncio.create_task(transform_worker(pool)) for _ in range(args.processes)]
+        await asyncio.gather(*(fetch_worker() for _ in range(args.workers)))
+        for _ in transformers:
+            await transform_queue.put(None)
+        await asyncio.gather(*transformers)
+        for _ in savers:
+            await save_queue.put(None)
+        await asyncio.gather(*savers)
 
-    return True, f"画像追加（{len(images_to_insert)}枚、レート残り{rate_remaining}）"
+
+# =============================================================================
+# 変更計画（plan / apply）
+# =============================================================================
+
+def load_local_posts(post_id=None):
+    """ローカル記事ストアの記事を通信せずに読み込む（plan 用）"""
+    with post_store.PostStore() as store:
+        if post_id:
+            post = store.get_post(post_id)
+            return [post] if post else []
+        return store.get_posts()
+
+
+def plan_post(post, steps, max_links, max_images, suggestions):
+    """1記事分の変更を通信せずに計算する（プロセスプールでも実行できる）
+
+    画像は本文に枠の目印だけを入れ、apply で Unsplash から取得して埋める。
+
+    Returns:
+        変更計画のエントリ（dict）
+    """
+    log = OutputBuffer()
+    doc = PostDocument(post)
+    text_steps = [step for step in steps if step != 'images']
+    settled = run_steps(doc, text_steps, max_links, max_images, suggestions, None, True, log,
+                        step_total=len(steps))
+    content_changed = doc.changed
+
+    image_slots = 0
+    if 'images' in steps:
+        log(f"  [{len(steps)}/{len(steps)}] 画像枠の追加（最大{max_images}枚）... ", end="")
+        title = html_module.unescape(post['title']['rendered'])
+        if insert_images_into_content(doc, [None] * max_images, title):
+            # 挿入位置が足りなければ max_images より少ない枠しか入らない
+            image_slots = doc.html().count(IMAGE_SLOT_HTML)
+            log(f"✅ {image_slots}枠（検索キーワード: {extract_keywords(title)}）")
+        else:
+            log("⚠️ 挿入できる場所がありません")
+
+    return {
+        "post_id": post['id'],
+        "title": html_module.unescape(post['title']['rendered']),
+        "modified": post.get('modified'),
+        "base_hash": improvement_ledger.content_hash(post),
+        "steps": steps,
+        "settled": settled,
+        "meta_description": doc.meta_description,
+        "content": doc.html() if doc.changed else None,
+        "content_changed": content_changed,
+        "image_slots": image_slots,
+        "log": log.getvalue(),
+    }
+
+
+def write_plan(args, suggestions_dict):
+    """ローカル記事ストアと内部リンク提案CSVから変更計画を作り、ファイルに書き出す（通信しない）"""
+    posts = load_local_posts(args.post_id)
+    if not posts:
+        print("エラー: ローカル記事ストアに対象の記事がありません。")
+        print("  先に 'python apply_post_improvements.py --dry-run' などで記事ストアを同期してください")
+        sys.exit(1)
+    print(f"ローカル記事ストア: {len(posts)}記事")
+    without_raw = [post for post in posts if 'raw' not in post['content']]
+    if without_raw:
+        # rendered を書き戻すと本文が肥大化するため、raw本文のない記事は計画に含めない
+        print(f"警告: raw本文（context=edit）のない記事を除外します: {len(without_raw)}記事")
+        print("  認証情報を設定して記事ストアを同期し直してください")
+        posts = [post for post in posts if 'raw' in post['content']]
+
+    plans, skipped_count = plan_posts(posts, args, suggestions_dict)
+    print(f"処理対象: {len(plans)}記事")
+    if skipped_count:
+        print(f"スキップ（前回の実行から変更なし）: {skipped_count}記事")
+
+    params = [step_params(post, args, suggestions_dict) for post, _ in plans]
+    work = [
+        (post, steps, args.max_links, args.max_images, link_suggestions_for(post, suggestions_dict))
+        for post, steps in plans
+    ]
+    if args.processes > 1 and len(work) > 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=args.processes) as pool:
+            changes = list(pool.map(plan_post, *zip(*work), chunksize=8))
+    else:
+        changes = [plan_post(*item) for item in work]
+
+    for i, (change, step_params_) in enumerate(zip(changes, params), 1):
+        # 指紋に使うパラメータは計画時のものを記録する（apply では CSV を読まない）
+        change['params'] = {step: improvement_ledger.params_hash(step_params_[step])
+                            for step in change['steps']}
+        print(post_header({'title': {'rendered': change['title']}}, i, len(changes)))
+        print(change['log'], end="")
+
+    plan_file = args.plan_file or f"reports/improvement_plan_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    os.makedirs(os.path.dirname(plan_file) or ".", exist_ok=True)
+    plan = {
+        "created_at": datetime.now().isoformat(),
+        "options": {"mode": args.mode, "max_links": args.max_links, "max_images": args.max_images},
+        "changes": changes,
+    }
+    with open(plan_file, 'w', encoding='utf-8') as f:
+        json.dump(plan, f, ensure_ascii=False, indent=2)
+
+    print(f"\n{'='*60}")
+    print(f"変更計画を書き出しました: {plan_file}")
+    print(f"  対象: {len(changes)}記事 / 画像枠: {sum(c['image_slots'] for c in changes)}枠")
+    print("  内容を確認してから 'python apply_post_improvements.py apply' で適用してください")
+    print(f"{'='*60}")
+
+
+def load_plan(plan_file=None):
+    """変更計画ファイルを読み込む（省略時は reports/ の最新）"""
+    if plan_file is None:
+        plan_files = sorted(glob.glob(PLAN_FILE_PATTERN))
+        if not plan_files:
+            print("エラー: 変更計画ファイルが見つかりません")
+            print("  先に 'python apply_post_improvements.py plan' を実行してください")
+            sys.exit(1)
+        plan_file = plan_files[-1]
+    with open(plan_file, 'r', encoding='utf-8') as f:
+        plan = json.load(f)
+    print(f"変更計画読み込み: {plan_file}（{plan['created_at'][:19]} 作成, {len(plan['changes'])}記事）\n")
+    return plan
+
+
+def is_change_applied(change, post):
+    """計画の変更が適用済みか（実行台帳に現在の本文で全ステップの指紋がある）"""
+    recorded = get_ledger().get(post['id'])
+    current = improvement_ledger.content_hashes(post)
+    meta_hash = improvement_ledger.hash_value(change['meta_description'])
+    return all(
+        step in recorded
+        and recorded[step]['content_hash'] in current
+        and recorded[step]['params_hash'] == change['params'][step]
+        and (step != 'meta-desc' or recorded[step]['output_hash'] == meta_hash)
+        for step in change['settled']
+    )
+
+
+def apply_change(change, post, config, log):
+    """計画した1記事分の変更を適用する（画像の用意と保存のみで、本文は解析しない）
+
+    Returns:
+        "applied" / "skipped"（適用済み）/ "stale"（計画後に記事が更新された）
+    """
+    if change['settled'] and is_change_applied(change, post):
+        log("  ⏭️ 適用済み")
+        return "skipped"
+    if improvement_ledger.content_hash(post) != change['base_hash']:
+        log("  ⚠️ 計画後に記事が更新されています（plan をやり直してください）")
+        return "stale"
+
+    settled = list(change['settled'])
+    content = change['content']
+    # 枠のない画像はアップロードしない（本文の枠の数が上限）
+    image_slots = min(change['image_slots'], content.count(IMAGE_SLOT_HTML) if content else 0)
+    if image_slots:
+        log(f"  画像の用意（{image_slots}枚）... ", end="")
+        images, error, rate_remaining = collect_images(post, image_slots, config)
+        if error:
+            log(f"⚠️ {error}")
+            images = []
+        else:
+            settled.append('images')
+            log(f"✅ {len(images)}枚（{format_rate_remaining(rate_remaining)}）")
+        content = fill_image_slots(content, images)
+        if not images and not change['content_changed']:
+            content = None  # 画像以外に本文の変更がない
+
+    saved = save_post_changes(post['id'], content, change['meta_description'], config)
+    if saved:
+        log(f"  💾 保存: {' + '.join(saved)}")
+
+    meta_description = change['meta_description']
+    fingerprints = {
+        step: (change['params'][step],
+               improvement_ledger.hash_value(meta_description) if step == 'meta-desc' else None)
+        for step in settled
+    }
+    unchanged_hash = change['base_hash'] if content is None else None
+    get_ledger().stage(post['id'], fingerprints, unchanged_hash)
+    return "applied"
+
+
+def apply_plan(args, config):
+    """変更計画を適用する（画像の検索・アップロードと、本文・メタディスクリプションの書き込み）
+
+    記事は --workers 件ずつ並行して処理し、本文は batch/v1 でまとめて送信する。
+    """
+    plan = load_plan(args.plan_file)
+    changes = plan['changes']
+    posts_by_id = {post['id']: post for post in get_all_posts(config, args.full_sync)}
+    wp_client.configure_endpoint_limits(ENDPOINT_LIMITS)
+
+    def apply_one(item):
+        index, change = item
+        log = OutputBuffer()
+        log(post_header({'title': {'rendered': change['title']}}, index, len(changes)))
+        post = posts_by_id.get(change['post_id'])
+        if post is None:
+            log("  ❌ 失敗: 記事が見つかりません（削除された可能性があります）")
+            return "fail", log
+        try:
+            return apply_change(change, post, config, log), log
+        except Exception as e:
+            log(f"  ❌ 失敗: {e}")
+            return "fail", log
+
+    counts = {"applied": 0, "skipped": 0, "stale": 0, "fail": 0}
+    interrupted = False
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=args.workers)
+    try:
+        for status, log in executor.map(apply_one, enumerate(changes, 1)):
+            print(log.getvalue(), end="", flush=True)
+            counts[status] += 1
+    except KeyboardInterrupt:
+        print("\n\n中断されました。")
+        interrupted = True
+    finally:
+        # 中断時は未着手の記事を取り消し、処理中の記事だけ終わるのを待つ
+        executor.shutdown(cancel_futures=True)
+
+    # キューに残った書き込みを送信（失敗した記事は失敗数に含める）
+    write_failures = flush_writes(config)
+    failed_post_ids = {object_id for (route, object_id) in write_failures if route == "wp/v2/posts"}
+    counts["applied"] -= len(failed_post_ids)
+    counts["fail"] += len(failed_post_ids)
+
+    count_lines = [f"成功: {counts['applied']}記事", f"失敗: {counts['fail']}記事"]
+    if counts["skipped"]:
+        count_lines.append(f"スキップ: {counts['skipped']}記事（適用済み）")
+    if counts["stale"]:
+        count_lines.append(f"計画後に更新: {counts['stale']}記事（plan をやり直してください）")
+    notes = []
+    if interrupted:
+        notes.append("同じ計画で apply を再実行すると、適用済みの記事は飛ばして続きから適用します")
+    print_run_summary("適用完了！", count_lines, write_failures, notes)
+
+
+def print_run_summary(title, count_lines, write_failures, notes=()):
+    """実行サマリーを表示する（run と apply で共通）
+
+    Args:
+        title: 見出し
+        count_lines: 記事数の行（成功・失敗など）
+        write_failures: flush_writes が返した書き込み失敗
+        notes: 末尾に「※」を付けて表示する注記
+    """
+    print(f"\n{'='*60}")
+    print(title)
+    for line in count_lines:
+        print(f"  {line}")
+    print(f"  {rate_limiter.format_wait_stats()}")
+    for stats in (unsplash_cache.format_stats(), media_index.format_stats(),
+                  image_optimizer.format_stats(), image_transfer.format_stats()):
+        if stats:
+            print(f"  {stats}")
+    retry_summary = retry_policy.format_summary()
+    if retry_summary:
+        print(retry_summary)
+    if write_failures:
+        print(f"  書き込み失敗: {len(write_failures)}件")
+        for (route, object_id), error in sorted(write_failures.items()):
+            print(f"    ❌ {route}/{object_id}: {error}")
+    for note in notes:
+        print(f"  ※ {note}")
+    print(f"{'='*60}")
 
 
 # =============================================================================
@@ -646,17 +1470,60 @@ def add_images_to_post(post, max_images, config, dry_run=False):
 def main():
     """メイン処理"""
     parser = argparse.ArgumentParser(description='WordPress記事の改善を自動適用')
+    parser.add_argument('command', nargs='?', choices=['run', 'plan', 'apply'], default='run',
+                        help='run: 取得から保存までを一度に実行（既定）、'
+                             'plan: ローカル記事ストアから変更計画を作成（通信なし）、'
+                             'apply: 変更計画を適用')
     parser.add_argument('--mode', choices=['meta-desc', 'summary', 'links', 'images', 'all'],
                         default='all', help='実行モード')
     parser.add_argument('--post-id', type=int, help='特定の記事IDのみ処理')
     parser.add_argument('--dry-run', action='store_true', help='実際に更新せず確認のみ')
     parser.add_argument('--max-links', type=int, default=5, help='追加する内部リンク数')
     parser.add_argument('--max-images', type=int, default=3, help='追加する画像数')
+    parser.add_argument('--full-sync', action='store_true', help='ローカル記事ストアを差分ではなく全件で再取得')
+    parser.add_argument('--engine', choices=['pipeline', 'async', 'sequential'], default='pipeline',
+                        help='実行エンジン（pipeline: 通信とHTML変換を別ステージで並行処理、'
+                             'async: 複数記事をスレッドで並行処理、sequential: 従来の逐次処理）')
+    parser.add_argument('--workers', type=int, default=4,
+                        help='pipeline/asyncエンジンで同時に通信する記事数')
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1,
+                        help='pipelineエンジンでHTML変換に使うプロセス数')
+    parser.add_argument('--force', action='store_true',
+                        help='実行台帳を無視して全記事・全ステップを実行（前回から変更がなくても再実行）')
+    parser.add_argument('--resume', action='store_true',
+                        help='中断した前回の実行を続きから再開（モードなどのオプションは前回のものを使う）')
+    parser.add_argument('--plan-file',
+                        help='plan の書き出し先 / apply で読み込む変更計画（既定: reports/improvement_plan_*.json の最新）')
 
     args = parser.parse_args()
 
-    # 設定読み込み
-    config = load_config()
+    if args.command != 'run' and (args.dry_run or args.resume):
+        print(f"エラー: {args.command} では --dry-run / --resume は使えません（確認は plan の出力で行います）")
+        sys.exit(1)
+    if args.command == 'apply':
+        apply_plan(args, load_config())
+        return
+
+    # 設定読み込み（plan は通信しないため不要）
+    config = load_config() if args.command == 'run' else None
+
+    # 実行ジャーナル（中断した実行の再開用）
+    global _journal
+    resumed = None
+    if args.resume and args.dry_run:
+        print("エラー: --resume と --dry-run は同時に指定できません。")
+        sys.exit(1)
+    if args.command == 'run' and not args.dry_run:
+        _journal = run_journal.RunJournal("apply_post_improvements")
+    if args.resume:
+        resumed = _journal.resume()
+        if resumed is None:
+            print("エラー: 再開できる中断した実行がありません。")
+            sys.exit(1)
+        for name in RESUME_OPTIONS:
+            setattr(args, name, resumed['options'][name])
+        print(f"中断した実行 #{resumed['id']}（{resumed['started_at'][:19]} 開始）を再開します")
+        print(f"  モード: {args.mode} / 完了済みのステップ: {resumed['completed']}件\n")
 
     # 内部リンク提案読み込み（linksモードの場合）
     suggestions_dict = None
@@ -673,93 +1540,76 @@ def main():
             if args.mode == 'links':
                 sys.exit(1)
 
+    if args.command == 'plan':
+        write_plan(args, suggestions_dict)
+        return
+
     # 記事取得
     if args.post_id:
         posts = [get_single_post(args.post_id, config)]
     else:
-        posts = get_all_posts(config)
-
-    print(f"処理対象: {len(posts)}記事")
+        posts = get_all_posts(config, args.full_sync)
+
+    if resumed:
+        # 前回と同じ記事・ステップのうち、保存まで完了していないものだけを実行する
+        posts_by_id = {post['id']: post for post in posts}
+        plans = [
+            (posts_by_id[post_id], steps) for post_id, steps in resumed['plan']
+            if post_id in posts_by_id and not _journal.completed(post_id, "saved")
+        ]
+        skipped_count = 0
+        print(f"処理対象: {len(plans)}記事（完了済み {len(resumed['plan']) - len(plans)}記事は再開時にスキップ）")
+    else:
+        # 実行台帳の指紋が一致する（前回から変更がない）記事・ステップは除く
+        plans, skipped_count = plan_posts(posts, args, suggestions_dict)
+        if _journal is not None:
+            options = {name: getattr(args, name) for name in RESUME_OPTIONS}
+            _journal.start(options, [(post['id'], steps) for post, steps in plans])
+
+        print(f"処理対象: {len(plans)}記事")
+        if skipped_count:
+            print(f"スキップ（前回の実行から変更なし）: {skipped_count}記事")
     if args.dry_run:
         print("【DRY RUN モード】実際には更新しません\n")
 
-    # 処理実行
-    success_count = 0
-    fail_count = 0
-
-    for i, post in enumerate(posts, 1):
-        title = html_module.unescape(post['title']['rendered'])[:50]
-        print(f"\n[{i}/{len(posts)}] 「{title}...」")
+    # 処理実行（中断しても、キューに入った書き込みは送信してから終了する）
+    # 結果は記事ごとに outcomes に記録されるため、中断した場合もそれまでの結果を表示できる
+    interrupted = False
+    outcomes = new_outcomes()
+    try:
+        if args.engine == 'pipeline' and len(plans) > 1:
+            wp_client.configure_endpoint_limits(ENDPOINT_LIMITS)
+            print(f"パイプラインエンジン: 通信 最大{args.workers}記事 / HTML変換 {args.processes}プロセス\n")
+            asyncio.run(run_posts_pipeline(plans, args, config, suggestions_dict, outcomes))
+        elif args.engine == 'async' and len(plans) > 1:
+            wp_client.configure_endpoint_limits(ENDPOINT_LIMITS)
+            print(f"非同期エンジン: 最大{args.workers}記事を並行処理\n")
+            asyncio.run(run_posts_async(plans, args, config, suggestions_dict, outcomes))
+        else:
+            run_posts_sequential(plans, args, config, suggestions_dict, outcomes)
+    except KeyboardInterrupt:
+        print("\n\n中断されました。")
+        interrupted = True
 
-        post_success = True
-
-        try:
-            # モード別処理
-            step_total = 4 if args.mode == 'all' else 1
-            step_num = 0
-
-            if args.mode in ['meta-desc', 'all']:
-                step_num += 1
-                print(f"  [{step_num}/{step_total}] メタディスクリプション設定... ", end="", flush=True)
-                meta_desc = generate_meta_description(post)
-                print(f"{len(meta_desc)}文字")
-                if args.dry_run:
-                    print(f"        プレビュー: {meta_desc[:80]}...")
-                else:
-                    set_meta_description(post['id'], meta_desc, config)
-                    print("        ✅ 設定完了")
-
-            if args.mode in ['summary', 'all']:
-                step_num += 1
-                print(f"  [{step_num}/{step_total}] まとめセクション追加... ", end="", flush=True)
-                success, message = add_summary_to_post(post, config, args.dry_run)
-                if success:
-                    print(f"✅ {message}")
-                else:
-                    print(f"⚠️ {message}")
-
-            if args.mode in ['links', 'all']:
-                step_num += 1
-                print(f"  [{step_num}/{step_total}] 内部リンク追加（最大{args.max_links}個）... ", end="", flush=True)
-                if suggestions_dict:
-                    success, message = add_internal_links_to_post(post, suggestions_dict, args.max_links, config, args.dry_run)
-                    if success:
-                        print(f"✅ {message}")
-                    else:
-                        print(f"⚠️ {message}")
-                else:
-                    print("⚠️ スキップ（CSV未読み込み）")
-
-            if args.mode in ['images', 'all']:
-                step_num += 1
-                print(f"  [{step_num}/{step_total}] 画像追加（最大{args.max_images}枚）... ", end="", flush=True)
-                success, message = add_images_to_post(post, args.max_images, config, args.dry_run)
-                if success:
-                    print(f"✅ {message}")
-                else:
-                    print(f"⚠️ {message}")
-
-            success_count += 1
-
-            # レート制限対策の待機
-            time.sleep(1)
-
-        except KeyboardInterrupt:
-            print("\n\n中断されました。")
-            break
-        except Exception as e:
-            print(f"  ❌ 失敗: {e}")
-            fail_count += 1
-            post_success = False
+    # キューに残った書き込みを送信（書き込みに失敗した記事は失敗に含める）
+    write_failures = flush_writes(config)
+    failed_post_ids = {object_id for (route, object_id) in write_failures if route == "wp/v2/posts"}
+    success_count = len(outcomes["success"] - failed_post_ids)
+    fail_count = len(outcomes["fail"] | failed_post_ids)
 
     # サマリー
-    print(f"\n{'='*60}")
-    print("処理完了！")
-    print(f"  成功: {success_count}記事")
-    print(f"  失敗: {fail_count}記事")
+    count_lines = [f"成功: {success_count}記事", f"失敗: {fail_count}記事"]
+    if skipped_count:
+        count_lines.append(f"スキップ: {skipped_count}記事（変更なし）")
+    notes = []
     if args.dry_run:
-        print("  ※ DRY RUNモードのため、実際には更新されていません")
-    print(f"{'='*60}")
+        notes.append("DRY RUNモードのため、実際には更新されていません")
+    if interrupted:
+        notes.append("続きから再開するには --resume を付けて実行してください")
+    print_run_summary("処理完了！", count_lines, write_failures, notes)
+
+    if _journal is not None and not interrupted:
+        _journal.finish()
 
 
 if __name__ == "__main__":
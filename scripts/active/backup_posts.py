@@ -5,71 +5,85 @@
 """
 
 import os
-import json
 import csv
 from datetime import datetime
 from pathlib import Path
 import requests
 from dotenv import load_dotenv
 
+import wp_client
+import post_store
+import post_sync
+import json_stream
+
 # 環境変数読み込み
 load_dotenv()
 
 WORDPRESS_URL = os.getenv('WORDPRESS_URL', 'https://techsimpleapp.main.jp')
+WORDPRESS_USERNAME = os.getenv('WORDPRESS_USERNAME')
+WORDPRESS_APP_PASSWORD = os.getenv('WORDPRESS_APPLICATION_PASSWORD')
 BACKUP_DIR = Path('backups')
 BACKUP_DIR.mkdir(exist_ok=True)
 
 
-def get_all_posts():
-    """全記事を取得（ページネーション対応）"""
-    posts = []
-    page = 1
-    per_page = 100
+def get_config():
+    """環境変数からWordPressの接続設定を作る"""
+    return {
+        'WORDPRESS_URL': WORDPRESS_URL,
+        'WORDPRESS_USERNAME': WORDPRESS_USERNAME,
+        'WORDPRESS_APPLICATION_PASSWORD': WORDPRESS_APP_PASSWORD,
+    }
 
-    print(f"🔄 記事一覧を取得中...")
 
-    while True:
-        url = f"{WORDPRESS_URL}/wp-json/wp/v2/posts"
-        params = {'per_page': per_page, 'page': page}
+def sync_store(store):
+    """ローカル記事ストアを差分同期する
 
-        try:
-            response = requests.get(url, params=params, timeout=30)
-            response.raise_for_status()
-        except requests.exceptions.RequestException as e:
-            print(f"❌ エラー: {e}")
-            return posts
+    認証情報があればAIOSEOのメタディスクリプションも古い行だけ取得する。
 
-        batch = response.json()
-        if not batch:
-            break
+    Returns:
+        同期できたらTrue
+    """
+    config = get_config()
+
+    print(f"🔄 記事一覧を取得中...")
 
-        posts.extend(batch)
-        print(f"  ページ {page}: {len(batch)}件取得")
+    try:
+        stats = post_sync.sync_store(config, store)
+        print(f"  取得: {stats['fetched']}件 / 削除検出: {stats['removed']}件")
 
-        # 次のページがあるかチェック
-        total_pages = int(response.headers.get('X-WP-TotalPages', 1))
-        if page >= total_pages:
-            break
+        if wp_client.get_auth(config):
+            meta_count = post_sync.sync_meta_descriptions(config, store)
+            print(f"  メタディスクリプション取得: {meta_count}件")
+    except (requests.exceptions.RequestException, wp_client.WordPressAPIError) as e:
+        print(f"❌ エラー: {e}")
+        return False
 
-        page += 1
+    return True
 
-    return posts
 
+def save_json_backup(config, timestamp):
+    """JSON形式でバックアップ（wp/v2/posts の完全なデータ）
 
-def save_json_backup(posts, timestamp):
-    """JSON形式でバックアップ（完全なデータ）"""
+    ローカル記事ストアは一部の項目しか持たないため、REST API から全項目を取得し、
+    受信した記事を1件ずつ書き出す。
+    """
     filename = BACKUP_DIR / f"posts_backup_{timestamp}.json"
 
     with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(posts, f, ensure_ascii=False, indent=2)
+        json_stream.dump_array(wp_client.iter_posts(config), f)
 
     print(f"✓ JSON backup saved: {filename}")
     return filename
 
 
 def save_csv_backup(posts, timestamp):
-    """CSV形式でバックアップ（主要データのみ）"""
+    """CSV形式でバックアップ（主要データのみ）
+
+    Returns:
+        (ファイル名, 統計情報)
+    """
     filename = BACKUP_DIR / f"posts_backup_{timestamp}.csv"
+    stats = {'total': 0, 'published': 0, 'draft': 0, 'with_featured': 0}
 
     with open(filename, 'w', encoding='utf-8', newline='') as f:
         writer = csv.writer(f)
@@ -98,8 +112,14 @@ def save_csv_backup(posts, timestamp):
                 '✓' if post.get('featured_media') else '✗'
             ])
 
+            # 統計情報も同じ走査で集計する
+            stats['total'] += 1
+            stats['published'] += post.get('status') == 'publish'
+            stats['draft'] += post.get('status') == 'draft'
+            stats['with_featured'] += bool(post.get('featured_media'))
+
     print(f"✓ CSV backup saved: {filename}")
-    return filename
+    return filename, stats
 
 
 def main():
@@ -108,22 +128,30 @@ def main():
     print("📦 WordPress 記事一覧バックアップ")
     print("=" * 60)
 
-    # 記事取得
-    posts = get_all_posts()
+    with post_store.PostStore() as store:
+        # 記事取得
+        if not sync_store(store):
+            print("❌ 記事が取得できませんでした")
+            return
 
-    if not posts:
-        print("❌ 記事が取得できませんでした")
-        return
+        post_count = len(store.get_ids())
+        if not post_count:
+            print("❌ 記事が取得できませんでした")
+            return
 
-    print(f"\n✓ {len(posts)}件の記事を取得しました")
+        print(f"\n✓ {post_count}件の記事を取得しました")
 
-    # タイムスタンプ生成
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        # タイムスタンプ生成
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
 
-    # バックアップ保存
-    print("\n💾 バックアップを保存中...")
-    json_file = save_json_backup(posts, timestamp)
-    csv_file = save_csv_backup(posts, timestamp)
+        # バックアップ保存（JSONは全項目を取得し直し、CSVはストアから1件ずつ読み出す）
+        print("\n💾 バックアップを保存中...")
+        try:
+            json_file = save_json_backup(get_config(), timestamp)
+        except (requests.exceptions.RequestException, wp_client.WordPressAPIError) as e:
+            print(f"❌ エラー: JSONバックアップを保存できませんでした: {e}")
+            return
+        csv_file, stats = save_csv_backup(store.iter_posts(), timestamp)
 
     # 結果表示
     print("\n" + "=" * 60)
@@ -131,18 +159,16 @@ def main():
     print("=" * 60)
     print(f"  - JSON: {json_file}")
     print(f"  - CSV: {csv_file}")
-    print(f"  - 記事数: {len(posts)}件")
+    print(f"  - 記事数: {stats['total']}件")
     print(f"  - タイムスタンプ: {timestamp}")
 
     # 統計情報
-    published = sum(1 for p in posts if p.get('status') == 'publish')
-    draft = sum(1 for p in posts if p.get('status') == 'draft')
-    with_featured = sum(1 for p in posts if p.get('featured_media'))
+    with_featured = stats['with_featured']
 
     print("\n📊 統計情報:")
-    print(f"  - 公開記事: {published}件")
-    print(f"  - 下書き: {draft}件")
-    print(f"  - アイキャッチ画像設定済み: {with_featured}件 ({with_featured/len(posts)*100:.1f}%)")
+    print(f"  - 公開記事: {stats['published']}件")
+    print(f"  - 下書き: {stats['draft']}件")
+    print(f"  - アイキャッチ画像設定済み: {with_featured}件 ({with_featured/stats['total']*100:.1f}%)")
 
     print("=" * 60)
 
@@ -11,9 +11,13 @@ Phase 1-3の全項目を再確認し、AdSense申請の準備が整っている
 import os
 import sys
 from dotenv import load_dotenv
-import requests
 from typing import Dict, List
 
+import wp_client
+import http_cache
+import post_store
+import post_sync
+
 # .envファイルから環境変数を読み込み
 load_dotenv()
 
@@ -22,6 +26,9 @@ SITE_URL = os.getenv("WORDPRESS_URL", "https://techsimpleapp.main.jp")
 WORDPRESS_USERNAME = os.getenv("WORDPRESS_USERNAME")
 WORDPRESS_APP_PASSWORD = os.getenv("WORDPRESS_APPLICATION_PASSWORD")
 
+# サイトマップ・固定ページの条件付きリクエストキャッシュ
+HTTP_CACHE = http_cache.HTTPCache()
+
 # 色付き出力用のANSIエスケープコード
 class Colors:
     GREEN = '\033[92m'
@@ -60,16 +67,16 @@ def print_info(text: str):
 
 
 def get_wordpress_posts() -> List[Dict]:
-    """WordPressの公開記事を取得"""
+    """WordPressの公開記事を取得（ローカル記事ストアを差分同期）"""
+    config = {
+        "WORDPRESS_URL": SITE_URL,
+        "WORDPRESS_USERNAME": WORDPRESS_USERNAME,
+        "WORDPRESS_APPLICATION_PASSWORD": WORDPRESS_APP_PASSWORD,
+    }
     try:
-        url = f"{SITE_URL}/wp-json/wp/v2/posts"
-        params = {
-            "per_page": 100,
-            "status": "publish"
-        }
-        response = requests.get(url, params=params, timeout=10)
-        response.raise_for_status()
-        return response.json()
+        with post_store.PostStore() as store:
+            posts, _ = post_sync.sync_posts(config, store)
+        return posts
     except Exception as e:
         print_error(f"記事の取得に失敗: {e}")
         return []
@@ -152,7 +159,7 @@ def check_phase2_pages() -> Dict[str, bool]:
     for page in required_pages:
         url = f"{SITE_URL}{page['path']}"
         try:
-            response = requests.get(url, timeout=10)
+            response = wp_client.request("GET", url, timeout=10, cache=HTTP_CACHE)
             if response.status_code == 200:
                 print_success(f"{page['name']}: 存在します")
                 results[page['name']] = True
@@ -197,7 +204,7 @@ def check_phase3_technical() -> Dict[str, bool]:
     for sitemap in sitemap_urls:
         url = f"{SITE_URL}{sitemap}"
         try:
-            response = requests.get(url, timeout=10)
+            response = wp_client.request("GET", url, timeout=10, cache=HTTP_CACHE)
             if response.status_code == 200:
                 print_success(f"XMLサイトマップ: {sitemap} が見つかりました")
                 sitemap_found = True
@@ -212,7 +219,7 @@ def check_phase3_technical() -> Dict[str, bool]:
 
     # 3. robots.txt確認
     try:
-        response = requests.get(f"{SITE_URL}/robots.txt", timeout=10)
+        response = wp_client.request("GET", f"{SITE_URL}/robots.txt", timeout=10, cache=HTTP_CACHE)
         if response.status_code == 200:
             print_success("robots.txt: 存在します")
             results["robots_txt"] = True
@@ -300,6 +307,7 @@ def main():
 
     print("\n" + "="*70)
     print_info("詳細な申請手順は PHASE4_GUIDE.md を参照してください")
+    print_info(HTTP_CACHE.format_stats())
     print("="*70 + "\n")
 
 
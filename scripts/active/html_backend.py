@@ -0,0 +1,135 @@
+"""
+HTML解析バックエンドの切り替え
+
+各スクリプトの BeautifulSoup のパーサー指定をここに集約する。
+環境変数 HTML_PARSER（html.parser / lxml / selectolax）で全体を固定できる。
+
+記事本文のような断片（<html>/<body> を含まないHTML）は parse_fragment() で解析する。
+lxml が補う <html><head><body> は取り除き、html.parser と同じ形で文字列化できるようにする。
+本文を書き換える処理は BeautifulSoup のツリー操作と文字列化が大半を占め、lxml にしても
+速くならない（scripts/dev/bench_html_parsers.py で計測）ため、既定は html.parser。
+
+数え上げや meta タグの取得のような読み取り専用の処理は QueryDocument / select() を使う。
+こちらは selectolax > lxml > html.parser の順に、インストールされているものを使う。
+selectolax なら BeautifulSoup のツリーを作らずに処理する。
+
+使用方法:
+    import html_backend
+
+    soup = html_backend.parse_fragment(post['content']['rendered'])
+    ...
+    new_content = str(soup)
+
+    doc = html_backend.QueryDocument(html)
+    headings = doc.select("h2, h3")
+    images = doc.select("img")
+"""
+
+import os
+from collections import namedtuple
+
+from bs4 import BeautifulSoup
+
+try:
+    import lxml  # noqa: F401
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+try:
+    from selectolax.parser import HTMLParser as SelectolaxParser
+    HAS_SELECTOLAX = True
+except ImportError:
+    SelectolaxParser = None
+    HAS_SELECTOLAX = False
+
+
+TREE_PARSERS = ("html.parser", "lxml")  # ツリーを書き換える処理の優先順
+QUERY_PARSERS = ("selectolax", "lxml", "html.parser")  # 読み取り専用の検索の優先順
+
+# select() の結果（読み取り専用の要素）
+Node = namedtuple("Node", ["name", "text", "attrs"])
+
+
+def available_parsers(query=False):
+    """このマシンで使えるパーサー（query=True なら selectolax も含む）"""
+    installed = {"html.parser": True, "lxml": HAS_LXML, "selectolax": HAS_SELECTOLAX}
+    return [name for name in (QUERY_PARSERS if query else TREE_PARSERS) if installed[name]]
+
+
+def get_parser(query=False):
+    """使用するパーサー名（HTML_PARSER の指定 > 優先順で最初に使えるもの）"""
+    choices = available_parsers(query)
+    name = os.getenv("HTML_PARSER")
+    if name:
+        if name not in available_parsers(query=True):
+            raise ValueError(f"HTML_PARSER={name} は使用できません（利用可能: {', '.join(available_parsers(query=True))}）")
+        # selectolax はツリーを作れないため、書き換える処理では優先順どおりに選ぶ
+        if name in choices:
+            return name
+    return choices[0]
+
+
+def parse(html, parser=None):
+    """HTML文書全体を解析する（公開ページの取得結果など）"""
+    return BeautifulSoup(html, parser or get_parser())
+
+
+def parse_fragment(html, parser=None):
+    """記事本文などのHTML断片を解析する
+
+    str(soup) は元の断片と同じ構造（<html>/<body> のラッパーなし）になる。
+    """
+    parser = parser or get_parser()
+    if parser == "html.parser":
+        return BeautifulSoup(html, parser)
+
+    # <body> で包むと、先頭の <style> や コメントが <head> や文書の外へ移動しない
+    soup = BeautifulSoup(f"<body>{html}</body>", parser)
+    # ラッパーは最上位にしかないので、ツリー全体は探索しない
+    for root in list(soup.contents):
+        if root.name != "html":
+            continue
+        for wrapper in list(root.contents):
+            if wrapper.name in ("head", "body"):
+                wrapper.unwrap()
+        root.unwrap()
+    return soup
+
+
+class QueryDocument:
+    """読み取り専用で要素を検索するための解析済み文書
+
+    同じHTMLに複数のセレクタを使う場合は、1回だけ解析してこれを使い回す。
+    """
+
+    def __init__(self, html, parser=None):
+        self.parser = parser or get_parser(query=True)
+        if self.parser == "selectolax":
+            self.tree = SelectolaxParser(html)
+        else:
+            self.tree = BeautifulSoup(html, self.parser)
+
+    def select(self, selector):
+        """CSSセレクタに一致する要素を返す
+
+        Returns:
+            Node(name, text, attrs) のリスト（文書順）
+        """
+        if self.parser == "selectolax":
+            return [
+                Node(node.tag, node.text(deep=True), {k: v or "" for k, v in node.attributes.items()})
+                for node in self.tree.css(selector)
+            ]
+        return [
+            Node(tag.name, tag.get_text(), {
+                k: " ".join(v) if isinstance(v, list) else v
+                for k, v in tag.attrs.items()
+            })
+            for tag in self.tree.select(selector)
+        ]
+
+
+def select(html, selector, parser=None):
+    """CSSセレクタに一致する要素を読み取り専用で返す（1回だけ検索する場合）"""
+    return QueryDocument(html, parser).select(selector)
@@ -0,0 +1,163 @@
+"""
+HTTP条件付きリクエストキャッシュ（ETag / Last-Modified）
+
+GETレスポンスの本文と検証子（ETag, Last-Modified）をディスク（SQLite）に保存し、
+次回は If-None-Match / If-Modified-Since を付けて再検証する。
+304 Not Modified が返れば保存済みの本文を再利用する。
+合計サイズが上限を超えたら、最後に使われたのが古いものから削除する（LRU）。
+
+使用方法:
+    import http_cache
+    import wp_client
+
+    cache = http_cache.HTTPCache()
+    response = wp_client.request("GET", url, cache=cache)
+    print(cache.format_stats())
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+
+CACHE_PATH = "cache/http_cache.sqlite3"
+MAX_BYTES = 50 * 1024 * 1024  # 50MB
+
+# 保存するレスポンスヘッダー（本文の解釈に必要なもののみ）
+STORED_HEADERS = ["Content-Type", "ETag", "Last-Modified", "X-WP-Total", "X-WP-TotalPages"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    encoding TEXT,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_entries_access ON entries (last_access);
+"""
+
+
+class HTTPCache:
+    """ディスク上のHTTP条件付きリクエストキャッシュ"""
+
+    def __init__(self, path=CACHE_PATH, max_bytes=MAX_BYTES):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "bytes_reused": 0, "evicted": 0}
+
+    def close(self):
+        self.conn.close()
+
+    def fetch(self, session, url, params=None, headers=None, auth=None, **kwargs):
+        """条件付きGETを送り、304なら保存済みの本文でレスポンスを組み立てる"""
+        key = cache_key(url, params, auth)
+        entry = self._load(key)
+
+        request_headers = dict(headers or {})
+        if entry is not None:
+            stored = json.loads(entry["headers"])
+            if stored.get("ETag"):
+                request_headers["If-None-Match"] = stored["ETag"]
+            if stored.get("Last-Modified"):
+                request_headers["If-Modified-Since"] = stored["Last-Modified"]
+
+        response = session.get(url, params=params, headers=request_headers, auth=auth, **kwargs)
+
+        if response.status_code == 304 and entry is not None:
+            with self.lock:
+                self.stats["hits"] += 1
+                self.stats["bytes_reused"] += entry["size"]
+            self._touch(key)
+            return build_response(entry, response)
+
+        with self.lock:
+            self.stats["misses"] += 1
+        if response.status_code == 200 and has_validator(response):
+            self._store(key, url, response)
+        return response
+
+    def format_stats(self):
+        """ヒット・ミス数の表示用文字列"""
+        s = self.stats
+        total = s["hits"] + s["misses"]
+        rate = s["hits"] / total * 100 if total else 0.0
+        return (f"HTTPキャッシュ: ヒット {s['hits']} / ミス {s['misses']} "
+                f"(ヒット率 {rate:.1f}%, 再利用 {s['bytes_reused'] / 1024:.1f} KB, "
+                f"削除 {s['evicted']}件)")
+
+    # -------------------------------------------------------------------------
+    # 内部処理
+    # -------------------------------------------------------------------------
+
+    def _load(self, key):
+        with self.lock:
+            return self.conn.execute("SELECT * FROM entries WHERE key = ?", (key,)).fetchone()
+
+    def _touch(self, key):
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+
+    def _store(self, key, url, response):
+        headers = {name: response.headers[name] for name in STORED_HEADERS if name in response.headers}
+        body = response.content
+        with self.lock, self.conn:
+            self.conn.execute(
+                """INSERT OR REPLACE INTO entries
+                   (key, url, status, headers, encoding, body, size, last_access)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                (key, url, response.status_code, json.dumps(headers), response.encoding,
+                 body, len(body), time.time()),
+            )
+            self._evict()
+
+    def _evict(self):
+        """合計サイズが上限を超えていれば、古いアクセス順に削除する（ロック取得済みで呼ぶ）"""
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for row in self.conn.execute("SELECT key, size FROM entries ORDER BY last_access").fetchall():
+            self.conn.execute("DELETE FROM entries WHERE key = ?", (row["key"],))
+            self.stats["evicted"] += 1
+            total -= row["size"]
+            if total <= self.max_bytes:
+                break
+
+
+def cache_key(url, params=None, auth=None):
+    """URL・クエリ・認証ユーザーからキャッシュキーを作る"""
+    prepared = requests.Request("GET", url, params=params).prepare()
+    user = auth[0] if auth else ""
+    return f"{user}@{prepared.url}"
+
+
+def has_validator(response):
+    """レスポンスが再検証用のヘッダーを持つか"""
+    return "ETag" in response.headers or "Last-Modified" in response.headers
+
+
+def build_response(entry, not_modified):
+    """保存済みのエントリと304レスポンスから、200相当のレスポンスを組み立てる"""
+    response = requests.Response()
+    response.status_code = entry["status"]
+    response._content = entry["body"]
+    response.headers = CaseInsensitiveDict(json.loads(entry["headers"]))
+    response.encoding = entry["encoding"]
+    response.url = not_modified.url
+    response.request = not_modified.request
+    response.elapsed = not_modified.elapsed
+    response.from_cache = True
+    return response
@@ -0,0 +1,178 @@
+"""
+アップロード前の画像の最適化（縮小・再圧縮・メタデータ削除・WebP変換）
+
+Unsplash の画像（urls.regular）をそのままアップロードすると、ページの重さが
+Unsplash 次第になる。image_transfer の段（stage）として、アップロードの前に
+次の処理を行う。
+
+    - 長辺を IMAGE_MAX_SIZE ピクセル以下に縮小（EXIF の向きは先に反映する）
+    - IMAGE_QUALITY の品質で再圧縮（JPEG はプログレッシブ・ハフマン最適化）
+    - EXIF などのメタデータを削除（色の再現に使う ICC プロファイルは残す）
+    - IMAGE_FORMAT=webp なら WebP に変換
+
+JPEG で縮小の必要がなく、再圧縮しても小さくならない場合は元の画像をそのまま使う
+（EXIF・XMP などのメタデータを含む場合は、削除のため再圧縮した画像を使う）。
+画像のデコードには全体が必要なため、最適化する場合は1枚分をメモリに持つ。
+
+Pillow が必要（インストールされていなければ最適化せずにアップロードする）。
+
+設定（環境変数、任意）:
+    IMAGE_OPTIMIZE=1        # 0 で最適化しない
+    IMAGE_MAX_SIZE=1600     # 長辺の最大ピクセル数
+    IMAGE_QUALITY=82        # 再圧縮の品質（1〜95）
+    IMAGE_FORMAT=jpeg       # jpeg / webp
+
+使用方法:
+    import image_optimizer
+
+    media, info = image_transfer.transfer(
+        config, url, filename, stages=image_optimizer.stages(filename))
+    print(image_optimizer.format_stats())
+"""
+
+import io
+import os
+import threading
+
+try:
+    from PIL import Image, ImageOps
+    HAS_PILLOW = True
+except ImportError:
+    Image = ImageOps = None
+    HAS_PILLOW = False
+
+
+DEFAULT_MAX_SIZE = 1600
+DEFAULT_QUALITY = 82
+DEFAULT_FORMAT = "jpeg"
+
+CHUNK_SIZE = 64 * 1024
+
+# 出力形式 → (Pillow の形式名, Content-Type, 拡張子)
+FORMATS = {
+    "jpeg": ("JPEG", "image/jpeg", ".jpg"),
+    "webp": ("WEBP", "image/webp", ".webp"),
+}
+
+# 最適化した画像の記録（実行サマリー用）: [(ラベル, 元のバイト数, 最適化後のバイト数)]
+_results = []
+_results_lock = threading.Lock()
+
+
+def get_settings():
+    """環境変数の設定（最適化しない場合はNone）"""
+    if not HAS_PILLOW or os.getenv("IMAGE_OPTIMIZE", "1") == "0":
+        return None
+    image_format = os.getenv("IMAGE_FORMAT", DEFAULT_FORMAT).lower()
+    if image_format not in FORMATS:
+        raise ValueError(f"IMAGE_FORMAT は {' / '.join(FORMATS)} のいずれかを指定してください: {image_format}")
+    return {
+        "max_size": int(os.getenv("IMAGE_MAX_SIZE", DEFAULT_MAX_SIZE)),
+        "quality": int(os.getenv("IMAGE_QUALITY", DEFAULT_QUALITY)),
+        "format": image_format,
+    }
+
+
+def optimize(data, max_size=DEFAULT_MAX_SIZE, quality=DEFAULT_QUALITY, image_format=DEFAULT_FORMAT):
+    """画像のバイト列を最適化したバイト列を返す"""
+    pil_format = FORMATS[image_format][0]
+    with Image.open(io.BytesIO(data)) as source:
+        source_format = source.format
+        icc_profile = source.info.get("icc_profile")
+        has_metadata = has_removable_metadata(source)
+        image = ImageOps.exif_transpose(source)
+
+    resized = max(image.size) > max_size
+    if resized:
+        image.thumbnail((max_size, max_size), Image.LANCZOS)
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+
+    options = {"quality": quality}
+    if icc_profile:
+        options["icc_profile"] = icc_profile
+    if pil_format == "JPEG":
+        options.update(optimize=True, progressive=True)
+
+    out = io.BytesIO()
+    image.save(out, pil_format, **options)
+    result = out.getvalue()
+
+    if source_format == pil_format and not resized and not has_metadata and len(result) >= len(data):
+        return data  # 再圧縮しても小さくならない
+    return result
+
+
+def has_removable_metadata(image):
+    """削除するメタデータ（EXIF・XMP・IPTC。撮影位置を含みうる）を含む画像か"""
+    if image.info.get("exif") or image.info.get("xmp") or image.info.get("XML:com.adobe.xmp"):
+        return True
+    # JPEG の APP1（EXIF・XMP）と APP13（IPTC）
+    return any(marker in ("APP1", "APP13") for marker, _ in getattr(image, "applist", []))
+
+
+class OptimizeStage:
+    """image_transfer の段: 画像全体を受け取って最適化し、チャンクに分けて返す
+
+    content_type と extension は image_transfer.transfer がアップロードに使う。
+    画像全体を読み込むため buffered（アップロードに Content-Length を付ける）。
+    """
+
+    buffered = True
+
+    def __init__(self, filename, settings):
+        self.settings = settings
+        _, self.content_type, self.extension = FORMATS[settings["format"]]
+        self.label = os.path.splitext(filename)[0] + self.extension
+        self.before = 0
+        self.after = 0
+
+    def __call__(self, chunks):
+        data = b"".join(chunks)
+        try:
+            optimized = optimize(data, self.settings["max_size"], self.settings["quality"],
+                                 self.settings["format"])
+        except (OSError, ValueError) as e:
+            raise Exception(f"画像の最適化に失敗しました（{self.label}）: {e}")
+        self.before, self.after = len(data), len(optimized)
+        record(self.label, self.before, self.after)
+
+        for start in range(0, len(optimized), CHUNK_SIZE):
+            yield optimized[start:start + CHUNK_SIZE]
+
+
+def stages(filename):
+    """image_transfer.transfer に渡す段のリスト（最適化しない場合は空）
+
+    Args:
+        filename: アップロードするファイル名（実行サマリーに表示する）
+    """
+    settings = get_settings()
+    return [OptimizeStage(filename, settings)] if settings else []
+
+
+def record(label, before, after):
+    with _results_lock:
+        _results.append((label, before, after))
+
+
+def format_size(num_bytes):
+    """バイト数を KB / MB で表す"""
+    if num_bytes >= 1024 * 1024:
+        return f"{num_bytes / (1024 * 1024):.1f}MB"
+    return f"{num_bytes / 1024:.0f}KB"
+
+
+def format_stats():
+    """実行サマリー用の画像ごとの最適化前後のサイズ（最適化しなかった場合は空文字）"""
+    with _results_lock:
+        results = list(_results)
+    if not results:
+        return ""
+    before = sum(r[1] for r in results)
+    after = sum(r[2] for r in results)
+    lines = [f"画像の最適化: {len(results)}枚 {format_size(before)} → {format_size(after)}"
+             f"（{(after - before) / before:+.0%}）"]
+    for label, image_before, image_after in results:
+        lines.append(f"    {label}: {format_size(image_before)} → {format_size(image_after)}")
+    return "\n".join(lines)
@@ -0,0 +1,326 @@
+"""
+画像のストリーミング転送（Unsplash からのダウンロード → WordPress へのアップロード）
+
+ダウンロードした画像の本文をチャンクごとに読み、ハッシュ計算・変換の段を通して、
+そのまま wp/v2/media への multipart アップロード（chunked 転送）の本文として送る。
+画像全体をメモリに持たないため、並列でアップロードしても、大きな画像（urls.full）を
+使ってもメモリ使用量は増えない。
+
+段（stage）はチャンクのイテレータを受け取り、チャンクのイテレータを返す関数:
+
+    def stage(chunks):
+        for chunk in chunks:
+            yield chunk
+
+形式を変える段（image_optimizer の WebP 変換など）は content_type と extension の属性を持ち、
+アップロードの Content-Type とファイル名の拡張子はそれに合わせる。画像全体を読み込んでから
+返す段（buffered = True）がある場合は、本文を chunked 転送にせず Content-Length を付けて送る。
+
+chunked 転送のアップロードを受け付けないサーバー（Content-Length を必須とするプロキシなど）では、
+画像をダウンロードし直して Content-Length 付きで送り直し、以降の転送も同じ方法で送る。
+
+メディア（アップロード）とダウンロードの同時実行枠は、ダウンロードの開始からアップロードの
+完了まで両方を確保する（アップロードの枠を待つ間にダウンロードの接続を開いたままにしない）。
+
+ハッシュ（HashStage）は変換前の元画像に対して計算する（media_index の照合に使う）。
+アップロードは本文を再送できないため再試行しない（retry_policy では POST は再試行しない）。
+
+alt_text・caption・title はアップロードと同じリクエストのフォーム項目として送り、
+メディアの作成後に別のリクエストで設定しない。作成されたメディアの alt_text が
+送った値と異なる場合は記録し、format_stats() で実行サマリーに表示する。
+
+Unsplash の検索結果の画像は upload_unsplash_image() で、ダウンロードのトリガー・
+アップロード済みメディアの照合（media_index）・最適化（image_optimizer）とまとめて扱う。
+
+使用方法:
+    import image_transfer
+
+    media, info = image_transfer.transfer(config, image_url, "article-1-image-1.jpg",
+                                          fields={"alt_text": alt_text, "caption": caption})
+    info["sha256"], info["bytes"], info["metadata_ok"]
+
+    # Unsplash の画像（alt_text の再設定は writer（wp_client.BatchWriter）に追加する）
+    media, existing = image_transfer.upload_unsplash_image(config, image_info, filename, alt_text, writer)
+"""
+
+import os
+import uuid
+import hashlib
+import threading
+
+import wp_client
+import rate_limiter
+import media_index
+import image_optimizer
+
+
+CHUNK_SIZE = 64 * 1024
+
+USER_AGENT = "Mozilla/5.0 (compatible; WP-Script/1.0)"
+
+# chunked 転送を拒否されたとみなすレスポンス（ステータス, WordPress のエラーコード）
+CHUNKED_REJECTED_STATUS = 411
+CHUNKED_REJECTED_CODES = {"rest_upload_no_data"}
+
+# alt_text を設定できなかったメディアの記録（実行サマリー用）: [(メディアID, ファイル名)]
+_metadata_failures = []
+_metadata_failures_lock = threading.Lock()
+
+# サーバーが chunked 転送のアップロードを受け付けるか（拒否されたら以降は Content-Length 付きで送る）
+_chunked_upload = {"supported": True}
+_chunked_upload_lock = threading.Lock()
+
+
+class ChunkedUploadRejected(Exception):
+    """サーバーが chunked 転送のアップロードを拒否した"""
+
+
+class HashStage:
+    """通過するチャンクの SHA-256 とバイト数を数える段"""
+
+    def __init__(self):
+        self.hash = hashlib.sha256()
+        self.bytes = 0
+
+    def __call__(self, chunks):
+        for chunk in chunks:
+            self.hash.update(chunk)
+            self.bytes += len(chunk)
+            yield chunk
+
+    def hexdigest(self):
+        return self.hash.hexdigest()
+
+
+def open_download(url, headers=None):
+    """画像のダウンロードを開始する（本文はまだ読まない）
+
+    ステータスはここで確認するため、アップロードを始める前に失敗が分かる。
+    同時実行枠は呼び出し側（transfer）で確保する。
+    """
+    response = wp_client.request("GET", url, headers=headers, stream=True)
+    if response.status_code != 200:
+        response.close()
+        raise Exception(f"画像ダウンロード失敗 (HTTP {response.status_code}): {url}")
+    return response
+
+
+def iter_body(response, chunk_size=CHUNK_SIZE):
+    """レスポンスの本文をチャンクごとに返す（読み終えたら接続をプールに返す）"""
+    try:
+        for chunk in response.iter_content(chunk_size):
+            if chunk:
+                yield chunk
+    finally:
+        response.close()
+
+
+def multipart_body(chunks, filename, content_type, boundary, fields=None):
+    """フォーム項目とファイル1つ分の multipart/form-data の本文をチャンクごとに返す"""
+    for name, value in (fields or {}).items():
+        yield (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="{name}"\r\n'
+            f"Content-Type: text/plain; charset=UTF-8\r\n\r\n"
+            f"{value}\r\n"
+        ).encode("utf-8")
+    yield (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode("utf-8")
+    yield from chunks
+    yield f"\r\n--{boundary}--\r\n".encode("utf-8")
+
+
+def upload_stream(config, chunks, filename, content_type="image/jpeg", fields=None, buffered=False):
+    """チャンクのイテレータを WordPress メディアライブラリにアップロードする
+
+    Args:
+        fields: メディアに設定する項目（alt_text, caption, title など）
+        buffered: True なら本文をまとめてから Content-Length 付きで送る（False なら chunked 転送）
+
+    Returns:
+        作成されたメディア（レスポンスのJSON）
+
+    Raises:
+        ChunkedUploadRejected: chunked 転送をサーバーが受け付けなかった
+    """
+    boundary = uuid.uuid4().hex
+    headers = {
+        "User-Agent": USER_AGENT,
+        "Content-Type": f"multipart/form-data; boundary={boundary}",
+    }
+    body = multipart_body(chunks, filename, content_type, boundary, fields)
+    if buffered:
+        body = b"".join(body)
+
+    response = wp_client.wp_request(config, "POST", "wp/v2/media", headers=headers, data=body)
+
+    if not buffered and is_chunked_rejected(response):
+        raise ChunkedUploadRejected(f"HTTP {response.status_code}: {response.text[:200]}")
+    if response.status_code not in (200, 201):
+        raise Exception(f"メディアアップロード失敗 (HTTP {response.status_code}): {response.text[:200]}")
+
+    return response.json()
+
+
+def is_chunked_rejected(response):
+    """chunked 転送のアップロードが拒否されたレスポンスか（411、または本文が届かなかったエラー）"""
+    if response.status_code == CHUNKED_REJECTED_STATUS:
+        return True
+    if response.status_code != 400:
+        return False
+    try:
+        return response.json().get("code") in CHUNKED_REJECTED_CODES
+    except ValueError:
+        return False
+
+
+def chunked_upload_supported():
+    with _chunked_upload_lock:
+        return _chunked_upload["supported"]
+
+
+def disable_chunked_upload():
+    """以降のアップロードを Content-Length 付きで送る"""
+    with _chunked_upload_lock:
+        _chunked_upload["supported"] = False
+
+
+def transfer(config, url, filename, stages=(), content_type="image/jpeg", headers=None, fields=None):
+    """画像をダウンロードしながら WordPress にアップロードする
+
+    Args:
+        url: 画像のURL
+        filename: アップロードするファイル名
+        stages: ハッシュ計算の後に通す変換の段のリスト
+        headers: ダウンロードのリクエストヘッダー
+        fields: メディアに設定する項目（alt_text, caption, title など。アップロードと同時に送る）
+
+    Returns:
+        (作成されたメディア, {"sha256": 元画像のハッシュ, "bytes": 元画像のバイト数,
+                             "metadata_ok": alt_text を設定できたか})
+    """
+    for stage in stages:
+        content_type = getattr(stage, "content_type", content_type)
+        if getattr(stage, "extension", None):
+            filename = os.path.splitext(filename)[0] + stage.extension
+    buffered = any(getattr(stage, "buffered", False) for stage in stages)
+
+    with wp_client.endpoint_slot("media"), wp_client.endpoint_slot("unsplash_download"):
+        try:
+            media, hasher = transfer_once(config, url, filename, stages, content_type, headers, fields,
+                                          buffered or not chunked_upload_supported())
+        except ChunkedUploadRejected:
+            # 本文は送信済みで再送できないため、ダウンロードし直して Content-Length 付きで送る
+            disable_chunked_upload()
+            media, hasher = transfer_once(config, url, filename, stages, content_type, headers, fields, True)
+
+    metadata_ok = check_metadata(media, fields)
+    if not metadata_ok:
+        with _metadata_failures_lock:
+            _metadata_failures.append((media["id"], filename))
+    return media, {"sha256": hasher.hexdigest(), "bytes": hasher.bytes, "metadata_ok": metadata_ok}
+
+
+def transfer_once(config, url, filename, stages, content_type, headers, fields, buffered):
+    """1回分のダウンロードとアップロード（transfer が同時実行枠を確保してから呼ぶ）
+
+    Returns:
+        (作成されたメディア, 元画像の HashStage)
+    """
+    response = open_download(url, headers)
+    hasher = HashStage()
+    chunks = hasher(iter_body(response))
+    for stage in stages:
+        chunks = stage(chunks)
+    try:
+        return upload_stream(config, chunks, filename, content_type, fields, buffered), hasher
+    finally:
+        response.close()
+
+
+def trigger_unsplash_download(config, download_location, on_wait=None):
+    """Unsplash利用規約に従いダウンロードをトリガーする"""
+    headers = {"Authorization": f"Client-ID {config['UNSPLASH_ACCESS_KEY']}"}
+    rate_limiter.acquire("unsplash", on_wait=on_wait)
+    with wp_client.endpoint_slot("unsplash_download"):
+        response = wp_client.request("GET", download_location, headers=headers)
+    rate_limiter.update_from_headers("unsplash", response.headers)
+
+
+def transfer_unsplash_image(config, image_info, filename, alt_text, writer, on_wait=None):
+    """Unsplashの画像をダウンロードしながらWordPressメディアライブラリにアップロードする
+
+    alt_text・キャプション・タイトルはアップロードと同じリクエストで設定する。
+    作成時に設定されなかった alt_text は writer に追加して送り直す（失敗はサマリーに表示）。
+
+    Returns:
+        (作成されたメディア, 元画像の SHA-256)
+    """
+    # Unsplashダウンロードトリガー（利用規約準拠）
+    trigger_unsplash_download(config, image_info["download_location"], on_wait)
+
+    # 縮小・再圧縮してからアップロード（image_optimizer の設定による）
+    fields = {
+        "alt_text": alt_text,
+        "caption": f"Photo by {image_info['photographer']} on Unsplash",
+        "title": image_info["description"],
+    }
+    media, info = transfer(config, image_info["url"], filename,
+                           stages=image_optimizer.stages(filename), fields=fields)
+    if not info["metadata_ok"]:
+        writer.add("wp/v2/media", media["id"], {"alt_text": alt_text})
+    return media, info["sha256"]
+
+
+def upload_unsplash_image(config, image_info, filename, alt_text, writer, on_wait=None):
+    """Unsplashの画像をメディアにする（アップロード済みの同じ画像があればそれを使う）
+
+    既存のメディアを使う場合は、alt_text をこの記事用に設定し直す更新を writer に追加する。
+
+    Args:
+        image_info: Unsplash の検索結果（id, url, download_location, description, photographer）
+        writer: alt_text の更新を追加する wp_client.BatchWriter
+        on_wait: Unsplash のレート制限で待機する際に呼ぶ関数（待機秒数を受け取る）
+
+    Returns:
+        ({"id", "source_url"}, 既存のメディアを使ったか)
+    """
+    media, existing = media_index.find_or_upload(
+        config, image_info.get("id"),
+        lambda: transfer_unsplash_image(config, image_info, filename, alt_text, writer, on_wait),
+        lambda media_id: delete_media(config, media_id),
+    )
+    if existing:
+        writer.add("wp/v2/media", media["id"], {"alt_text": alt_text})
+    return media, existing
+
+
+def check_metadata(media, fields):
+    """作成されたメディアに alt_text が送った値のとおりに設定されているか"""
+    expected = (fields or {}).get("alt_text")
+    return expected is None or media.get("alt_text") == expected
+
+
+def delete_media(config, media_id):
+    """メディアを完全に削除する（ゴミ箱に入れない）。削除できたらTrue"""
+    response = wp_client.wp_request(config, "DELETE", f"wp/v2/media/{media_id}", params={"force": "true"})
+    return response.status_code == 200
+
+
+def format_stats():
+    """実行サマリー用の alt_text を設定できなかったメディアの一覧と、chunked 転送を拒否された
+    場合の注記（どちらもなければ空文字）"""
+    with _metadata_failures_lock:
+        failures = list(_metadata_failures)
+    lines = []
+    if not chunked_upload_supported():
+        lines.append("⚠️ サーバーが chunked 転送のアップロードを受け付けないため、"
+                     "画像全体を読み込んで Content-Length 付きで送信しました")
+    if failures:
+        lines.append(f"⚠️ アップロード時に alt_text を設定できなかったメディア: {len(failures)}件（再設定をキューに追加）")
+    for media_id, filename in failures:
+        lines.append(f"    wp/v2/media/{media_id}（{filename}）")
+    return "\n".join(lines)
@@ -10,14 +10,18 @@ import sys
 import argparse
 from datetime import datetime
 
-import requests
 import html as html_module
 from dotenv import load_dotenv
-from bs4 import BeautifulSoup
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 from janome.tokenizer import Tokenizer
 
+import wp_client
+import html_backend
+import http_cache
+import post_store
+import post_sync
+
 
 def load_config():
     """環境変数から設定を読み込む"""
@@ -39,36 +43,22 @@ def load_config():
     return config
 
 
-def get_all_posts(config):
-    """WordPress REST APIで全記事を取得する"""
-    url = f"{config['WORDPRESS_URL']}/wp-json/wp/v2/posts"
-    auth = (config["WORDPRESS_USERNAME"], config["WORDPRESS_APPLICATION_PASSWORD"])
-
-    all_posts = []
-    page = 1
-
+def get_all_posts(config, full_sync=False):
+    """ローカル記事ストアを差分同期して全記事を取得する"""
     print("WordPress記事を取得中...")
-    while True:
-        params = {"per_page": 100, "page": page, "status": "publish"}
-        response = requests.get(url, params=params, auth=auth)
-
-        if response.status_code != 200:
-            if page == 1:
-                print(f"エラー: 記事の取得に失敗しました (HTTP {response.status_code})")
-                print(f"レスポンス: {response.text[:200]}")
-                sys.exit(1)
-            break
-
-        posts = response.json()
-        if not posts:
-            break
-
-        all_posts.extend(posts)
-        total_pages = int(response.headers.get("X-WP-TotalPages", 1))
-        if page >= total_pages:
-            break
-        page += 1
+    try:
+        with post_store.PostStore() as store:
+            all_posts, stats = post_sync.sync_posts(config, store, full=full_sync)
+            # メタディスクリプション（AIOSEO）は未取得・記事更新後の行だけ取得してストアに保存
+            if post_sync.sync_meta_descriptions(config, store):
+                all_posts = store.get_posts()
+    except wp_client.WordPressAPIError as e:
+        print(f"エラー: 記事の取得に失敗しました (HTTP {e.status_code})")
+        print(f"レスポンス: {e.text[:200]}")
+        sys.exit(1)
 
+    mode = "差分同期" if stats['mode'] == 'delta' else "全件同期"
+    print(f"{mode}: 取得 {stats['fetched']}記事 / 削除検出 {stats['removed']}記事")
     print(f"取得完了: {len(all_posts)}記事\n")
     return all_posts
 
@@ -84,73 +74,55 @@ def extract_text_content(html_content):
     return text
 
 
-def analyze_post_structure(post, config):
-    """記事の構造を分析"""
+def analyze_post_structure(post, config, page_cache=None):
+    """記事の構造を分析（page_cache があれば公開ページを条件付きリクエストで取得）"""
     html_content = post['content']['rendered']
     title = html_module.unescape(post['title']['rendered'])
 
-    # BeautifulSoupでHTML解析
-    soup = BeautifulSoup(html_content, 'html.parser')
+    # HTML解析（数えるだけなので読み取り専用。selectolax があれば高速に処理する）
+    doc = html_backend.QueryDocument(html_content)
 
     # 1. 見出し数（h2, h3）
-    headings = soup.find_all(['h2', 'h3'])
+    headings = doc.select('h2, h3')
     heading_count = len(headings)
 
     # 2. まとめセクションの有無
     has_summary = False
     summary_keywords = ['まとめ', '結論', '要約', 'ポイント', '総括']
     for heading in headings:
-        heading_text = heading.get_text().strip()
+        heading_text = heading.text.strip()
         if any(keyword in heading_text for keyword in summary_keywords):
             has_summary = True
             break
 
     # 3. 画像数（本文中のみ、アイキャッチ除外）
-    images = soup.find_all('img')
+    images = doc.select('img')
     image_count = len(images)
 
     # 4. 内部リンク数（同一ドメイン）
-    links = soup.find_all('a', href=True)
+    links = doc.select('a[href]')
     internal_links = [
         link for link in links
-        if config['WORDPRESS_URL'] in link['href']
+        if config['WORDPRESS_URL'] in link.attrs['href']
     ]
     internal_link_count = len(internal_links)
 
-    # 5. メタディスクリプション取得（AIOSEO API経由）
-    meta_desc = ''
-    meta_desc_length = 0
-    has_meta_desc = False
+    # 5. メタディスクリプション（ローカル記事ストアに同期済みのAIOSEOの値）
+    meta_desc = post.get('meta_description') or ''
 
-    # AIOSEO APIで記事のメタディスクリプションを取得
-    post_id = post['id']
-    aioseo_url = f"{config['WORDPRESS_URL']}/wp-json/aioseo/v1/post"
-    auth = (config["WORDPRESS_USERNAME"], config["WORDPRESS_APPLICATION_PASSWORD"])
+    # ストアにない場合は記事ページのHTMLメタタグから取得
+    if not meta_desc:
+        try:
+            page_response = wp_client.request("GET", post['link'], cache=page_cache)
+            if page_response.status_code == 200:
+                meta_tags = html_backend.select(page_response.text, 'meta[name="description"]')
+                if meta_tags and meta_tags[0].attrs.get('content'):
+                    meta_desc = meta_tags[0].attrs['content']
+        except Exception:
+            pass  # メタディスクリプション取得失敗時はスキップ
 
-    try:
-        # AIOSEO APIはPOSTリクエストで記事情報を取得
-        response = requests.post(aioseo_url, json={'id': post_id}, auth=auth)
-        if response.status_code == 200:
-            result = response.json()
-            # AIOSEO APIのレスポンスからdescriptionを取得
-            # 注: AIOSEOのレスポンス形式が不明なため、HTMLから直接取得する方法に変更
-            # 代わりに記事ページのHTMLメタタグから取得
-            pass
-    except Exception:
-        pass
-
-    # HTMLメタタグから直接取得する方法（より確実）
-    try:
-        page_response = requests.get(post['link'])
-        if page_response.status_code == 200:
-            page_soup = BeautifulSoup(page_response.text, 'html.parser')
-            meta_tag = page_soup.find('meta', attrs={'name': 'description'})
-            if meta_tag and meta_tag.get('content'):
-                meta_desc = meta_tag.get('content')
-                has_meta_desc = True
-                meta_desc_length = len(meta_desc)
-    except Exception:
-        pass  # メタディスクリプション取得失敗時はスキップ
+    has_meta_desc = bool(meta_desc)
+    meta_desc_length = len(meta_desc)
 
     # 6. 文字数
     text_content = extract_text_content(html_content)
@@ -449,13 +421,14 @@ def run_analyze_mode(config, all_posts):
     analysis_results = []
     success_count = 0
     fail_count = 0
+    page_cache = http_cache.HTTPCache()
 
     for i, post in enumerate(all_posts, 1):
         title = html_module.unescape(post['title']['rendered'])[:50]
         print(f"[{i}/{len(all_posts)}] 「{title}...」 ", end="", flush=True)
 
         try:
-            result = analyze_post_structure(post, config)
+            result = analyze_post_structure(post, config, page_cache)
             analysis_results.append(result)
             print("✅ 完了")
             success_count += 1
@@ -476,7 +449,9 @@ def run_analyze_mode(config, all_posts):
     print(f"  成功: {success_count}件")
     print(f"  失敗: {fail_count}件")
     print(f"  レポート: {csv_filename}")
+    print(f"  {page_cache.format_stats()}")
     print(f"{'=' * 60}\n")
+    page_cache.close()
 
 
 def run_suggest_links_mode(config, all_posts):
@@ -511,6 +486,11 @@ def main():
         default='analyze',
         help='実行モード (default: analyze)'
     )
+    parser.add_argument(
+        '--full-sync',
+        action='store_true',
+        help='ローカル記事ストアを差分ではなく全件で再取得'
+    )
 
     args = parser.parse_args()
 
@@ -518,7 +498,7 @@ def main():
     config = load_config()
 
     # 全記事取得
-    all_posts = get_all_posts(config)
+    all_posts = get_all_posts(config, args.full_sync)
 
     if not all_posts:
         print("記事が見つかりませんでした。")
@@ -0,0 +1,176 @@
+"""
+記事改善の実行台帳（ステップごとの指紋）
+
+apply_post_improvements の各ステップ（meta-desc, summary, links, images）について、
+記事ごとに「どの入力に対して実行済みか」を指紋として SQLite に記録する。
+
+指紋の内容:
+    content_hash  実行後の記事のハッシュ（タイトル＋本文。書き込んだ場合はサーバーが返した本文）
+                  本文は raw（context=edit）を使う。rendered は記事を編集しなくても
+                  プラグインやショートコードの更新で変わるため、raw がない場合のみ使う
+    params_hash   ステップのパラメータのハッシュ（内部リンク提案の集合、最大数など）
+    output_hash   ステップの出力のハッシュ（メタディスクリプション）
+
+再実行時に指紋が一致するステップは実行しない。全ステップが一致する記事は、
+Unsplash を含めてリクエストを1件も送らずにスキップできる。
+
+本文の書き込みは batch/v1 でまとめて送るため、指紋は stage() で保留しておき、
+書き込み結果が確定してから commit() で記録する（バッチを送信するたびに呼んでよい）。
+
+使用方法:
+    import improvement_ledger
+
+    with improvement_ledger.Ledger() as ledger:
+        steps = ledger.pending_steps(post, ["meta-desc", "summary"], params)
+        ...
+        ledger.stage(post["id"], {"summary": (params_hash, None)}, content_hash)
+        ledger.commit({})
+"""
+
+import os
+import json
+import sqlite3
+import hashlib
+import threading
+from datetime import datetime
+
+
+LEDGER_PATH = "cache/improvements.sqlite3"
+
+# ステップの処理内容を変えたら上げる（古い指紋をすべて無効にする）
+LEDGER_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fingerprints (
+    post_id INTEGER NOT NULL,
+    step TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    params_hash TEXT NOT NULL,
+    output_hash TEXT,
+    recorded_at TEXT NOT NULL,
+    PRIMARY KEY (post_id, step)
+);
+"""
+
+
+def hash_value(value):
+    """JSONにできる値のハッシュ（キーの順序に依存しない）"""
+    text = json.dumps(value, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def content_hash(post):
+    """記事のタイトルと本文のハッシュ（本文は raw、なければ rendered）"""
+    content = post["content"]
+    return hash_value([post["title"]["rendered"], content["raw"] if "raw" in content else content["rendered"]])
+
+
+def content_hashes(post):
+    """記録済みの指紋と照合する記事のハッシュ（現在の方式と、rendered で記録していた以前の方式）
+
+    以前の方式の指紋も一致とみなし、更新後の初回の実行で冪等でないステップ
+    （links, images）をやり直さないようにする。
+    """
+    return {content_hash(post), hash_value([post["title"]["rendered"], post["content"]["rendered"]])}
+
+
+def params_hash(params):
+    """ステップのパラメータのハッシュ（LEDGER_VERSION を含む）"""
+    return hash_value([LEDGER_VERSION, params])
+
+
+class Ledger:
+    """SQLiteによる記事改善の実行台帳（スレッドセーフ）"""
+
+    def __init__(self, path=LEDGER_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+        self.lock = threading.Lock()
+        self.staged = {}  # {post_id: (fingerprints, content_hash)}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def get(self, post_id):
+        """記事の指紋 {step: 行}"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT * FROM fingerprints WHERE post_id = ?", (post_id,)
+            ).fetchall()
+        return {row["step"]: row for row in rows}
+
+    def pending_steps(self, post, steps, params):
+        """指紋が一致せず、実行が必要なステップ（steps の順序のまま）
+
+        Args:
+            steps: 実行したいステップ名のリスト
+            params: {step: パラメータ}（JSONにできる値）
+        """
+        recorded = self.get(post["id"])
+        current = content_hashes(post)
+        meta = post.get("meta_description")
+
+        pending = []
+        for step in steps:
+            row = recorded.get(step)
+            if (row is None
+                    or row["content_hash"] not in current
+                    or row["params_hash"] != params_hash(params.get(step))):
+                pending.append(step)
+            elif step == "meta-desc" and meta is not None and row["output_hash"] != hash_value(meta):
+                # 管理画面などでメタディスクリプションが変更されている
+                pending.append(step)
+        return pending
+
+    def stage(self, post_id, fingerprints, content_hash=None):
+        """実行したステップの指紋を保留する
+
+        Args:
+            fingerprints: {step: (params_hash, output_hash)}
+            content_hash: 本文を書き込まなかった場合の記事ハッシュ（書き込んだ場合はNone）
+        """
+        if not fingerprints:
+            return
+        with self.lock:
+            self.staged[post_id] = (fingerprints, content_hash)
+
+    def commit(self, written_hashes):
+        """保留中の指紋を記録する
+
+        Args:
+            written_hashes: {記事ID: 書き込み後の記事ハッシュ（書き込みに失敗した記事はNone）}
+
+        Returns:
+            記録した記事数
+        """
+        recorded_at = datetime.now().isoformat()
+        rows = []
+        with self.lock:
+            staged, self.staged = self.staged, {}
+            for post_id, (fingerprints, unchanged_hash) in staged.items():
+                if post_id not in written_hashes and unchanged_hash is None:
+                    # 書き込みがまだ送信されていない（次の commit まで保留する）
+                    self.staged[post_id] = (fingerprints, unchanged_hash)
+                    continue
+                current = written_hashes.get(post_id) if post_id in written_hashes else unchanged_hash
+                if current is None:
+                    continue  # 書き込みに失敗した（次回も実行する）
+                for step, (step_params_hash, output_hash) in fingerprints.items():
+                    rows.append((post_id, step, current, step_params_hash, output_hash, recorded_at))
+
+            with self.conn:
+                self.conn.executemany("""
+                    INSERT OR REPLACE INTO fingerprints (
+                        post_id, step, content_hash, params_hash, output_hash, recorded_at
+                    ) VALUES (?, ?, ?, ?, ?, ?)
+                """, rows)
+        return len({row[0] for row in rows})
@@ -0,0 +1,184 @@
+"""
+JSON配列のストリーミング読み書き
+
+REST APIのページやバックアップJSONのような「記事の配列」を、全体を読み込まずに
+1件ずつデコードして返す。同時にメモリに載るのはおおむね記事1件分になる。
+
+対応する形式:
+    [ {...}, {...}, ... ]              トップレベルの配列
+    { "posts": [ {...}, ... ], ... }   トップレベルのオブジェクト内の配列（key を指定）
+
+使用方法:
+    import json_stream
+
+    for post in json_stream.iter_file("backups/posts_backup_xxx.json"):
+        ...
+    for post in json_stream.iter_response(response):  # requests の stream=True
+        ...
+"""
+
+import json
+import codecs
+
+
+CHUNK_SIZE = 64 * 1024  # 1回に読み込む文字数（バイト数）
+WHITESPACE = " \t\n\r"
+NUMBER_CHARS = set("0123456789+-.eE")  # 数値の続きになりうる文字
+
+_decoder = json.JSONDecoder()
+
+
+class _Reader:
+    """テキストのチャンク列を読み進めるバッファ"""
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        """チャンクを1つ読み足す。終端ならFalse"""
+        if self.eof:
+            return False
+        for chunk in self.chunks:
+            if chunk:
+                # 読み終えた部分は捨ててバッファを小さく保つ
+                self.buf = self.buf[self.pos:] + chunk
+                self.pos = 0
+                return True
+        self.eof = True
+        return False
+
+    def peek(self):
+        """空白を飛ばして次の1文字を返す（終端なら空文字）"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, chars):
+        """次の文字が chars のいずれかであることを確認して読み進める"""
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError(f"JSONの形式が不正です: {chars!r} が必要ですが {char!r} でした")
+        self.pos += 1
+        return char
+
+    def finish(self):
+        """残りが空白だけであることを確認する（終端まで読むため、途切れたバイト列も検出される）"""
+        char = self.peek()
+        if char:
+            raise ValueError(f"JSONの形式が不正です: 終端の後に {char!r} があります")
+
+    def value(self):
+        """次のJSON値を1つデコードする
+
+        値がバッファの末尾で終わっている場合は、数値などが途中で切れている
+        可能性があるため、続きを読み込んでから確定する。数値の後ろに数値の
+        続きになりうる文字（"0." や "2e" の "." "e" など）しかない場合も同様。
+        """
+        self.peek()
+        while True:
+            try:
+                obj, end = _decoder.raw_decode(self.buf, self.pos)
+                if self.eof or (end < len(self.buf) and not self._number_may_continue(obj, end)):
+                    self.pos = end
+                    return obj
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+
+    def _number_may_continue(self, obj, end):
+        """デコードした数値が、続きのチャンクでさらに続く可能性があるか"""
+        if isinstance(obj, bool) or not isinstance(obj, (int, float)):
+            return False
+        return all(char in NUMBER_CHARS for char in self.buf[end:])
+
+
+def _iter_array(reader):
+    """配列の先頭 '[' から要素を1つずつ返す"""
+    reader.expect("[")
+    if reader.peek() == "]":
+        reader.pos += 1
+        return
+    while True:
+        yield reader.value()
+        if reader.expect(",]") == "]":
+            return
+
+
+def iter_array(chunks, key=None):
+    """テキストのチャンク列からJSON配列の要素を1つずつ返すジェネレータ
+
+    Args:
+        chunks: 文字列のイテラブル（ファイルの読み込み結果など）
+        key: 指定するとトップレベルのオブジェクトの key の配列を対象にする
+    """
+    reader = _Reader(chunks)
+    if key is None:
+        yield from _iter_array(reader)
+        reader.finish()
+        return
+
+    reader.expect("{")
+    if reader.peek() == "}":
+        reader.pos += 1
+        reader.finish()
+        return
+    while True:
+        name = reader.value()
+        reader.expect(":")
+        if name == key:
+            yield from _iter_array(reader)
+        else:
+            reader.value()  # 対象外のキーの値は読み飛ばす
+        if reader.expect(",}") == "}":
+            reader.finish()
+            return
+
+
+def iter_file(path, key=None, chunk_size=CHUNK_SIZE):
+    """JSONファイルの配列の要素を1つずつ返す"""
+    with open(path, "r", encoding="utf-8") as f:
+        yield from iter_array(iter(lambda: f.read(chunk_size), ""), key)
+
+
+def iter_response(response, key=None, chunk_size=CHUNK_SIZE):
+    """requests のレスポンス（stream=True）の配列の要素を1つずつ返す
+
+    本文の末尾でマルチバイト文字が途切れている場合は UnicodeDecodeError（ValueError）になる。
+    """
+    decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")()
+    yield from iter_array(_decode_chunks(decoder, response.iter_content(chunk_size)), key)
+
+
+def _decode_chunks(decoder, chunks):
+    """バイト列のチャンクを文字列のチャンクにする（最後に final=True でデコーダーを確定させる）"""
+    for chunk in chunks:
+        yield decoder.decode(chunk)
+    yield decoder.decode(b"", final=True)
+
+
+def dump_array(items, f, indent=2):
+    """イテラブルの要素を1件ずつJSON配列としてファイルに書き出す
+
+    json.dump(list(items), f, indent=indent) と同じ形の出力になる。
+
+    Returns:
+        書き出した件数
+    """
+    count = 0
+    pad = " " * indent
+    for item in items:
+        f.write("[\n" if count == 0 else ",\n")
+        text = json.dumps(item, ensure_ascii=False, indent=indent)
+        f.write(pad + text.replace("\n", "\n" + pad))
+        count += 1
+    f.write("\n]" if count else "[]")
+    return count
@@ -0,0 +1,206 @@
+"""
+アップロード済みメディアの索引（同じ画像の重複アップロード防止）
+
+Unsplash の写真IDと画像バイト列の SHA-256 から、アップロード済みの
+WordPress メディア（ID・source_url）を引けるように SQLite に記録する。
+
+    写真IDで見つかった場合    ダウンロードもアップロードもせずに既存のメディアを使う
+    見つからない場合          アップロードして索引に記録する
+
+画像はダウンロードしながらアップロードする（image_transfer）ため、SHA-256 は
+アップロードが終わるまで分からない。アップロードした画像の SHA-256 が既存のメディアと
+一致した場合（別の写真IDで同じ画像をアップロード済み）は、今回のメディアを削除して
+既存のメディアを使う。
+
+メディアIDはサイトごとに異なるため、索引は WORDPRESS_URL ごとに分ける。
+メディアの更新（alt_text の設定など）がメディアがない（404・410）ために失敗した場合は、
+メディアが削除されたため forget_missing() で索引から外す（次回はアップロードし直す）。
+通信エラーなど、メディアがあるかどうか分からない失敗では索引を残す。
+
+使用方法:
+    import media_index
+
+    media, reused = media_index.find_or_upload(
+        config, photo_id,
+        upload=lambda: transfer_image(...),      # (メディア, 元画像の SHA-256) を返す
+        discard=lambda media_id: delete_media(...),
+    )
+"""
+
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+
+INDEX_PATH = "cache/media_index.sqlite3"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS media (
+    site TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    media_id INTEGER NOT NULL,
+    source_url TEXT NOT NULL,
+    recorded_at TEXT NOT NULL,
+    PRIMARY KEY (site, sha256)
+);
+CREATE TABLE IF NOT EXISTS photos (
+    site TEXT NOT NULL,
+    photo_id TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    PRIMARY KEY (site, photo_id)
+);
+CREATE INDEX IF NOT EXISTS idx_media_media_id ON media (site, media_id);
+"""
+
+_index = None
+_index_lock = threading.Lock()
+
+
+class MediaIndex:
+    """SQLiteによるアップロード済みメディアの索引（スレッドセーフ）"""
+
+    def __init__(self, site, path=INDEX_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.site = site.rstrip("/")
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+        self.lock = threading.Lock()
+        self.photo_locks = {}  # {photo_id: Lock}（同じ写真を並行してアップロードしない）
+        self.stats = {"photo": 0, "duplicate": 0, "uploaded": 0}
+
+    def close(self):
+        self.conn.close()
+
+    def find_by_photo(self, photo_id):
+        """写真IDからメディア {"id", "source_url"} を返す（なければNone）"""
+        with self.lock:
+            row = self.conn.execute("""
+                SELECT m.media_id, m.source_url FROM photos p
+                JOIN media m ON m.site = p.site AND m.sha256 = p.sha256
+                WHERE p.site = ? AND p.photo_id = ?
+            """, (self.site, photo_id)).fetchone()
+        return {"id": row["media_id"], "source_url": row["source_url"]} if row else None
+
+    def find_by_hash(self, sha256):
+        """画像の SHA-256 からメディア {"id", "source_url"} を返す（なければNone）"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT media_id, source_url FROM media WHERE site = ? AND sha256 = ?",
+                (self.site, sha256),
+            ).fetchone()
+        return {"id": row["media_id"], "source_url": row["source_url"]} if row else None
+
+    def record(self, sha256, media_id, source_url, photo_id=None):
+        """アップロードしたメディアを記録する（photo_id があれば写真IDからも引けるようにする）"""
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO media (site, sha256, media_id, source_url, recorded_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (self.site, sha256, media_id, source_url, datetime.now().isoformat()),
+            )
+            if photo_id:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO photos (site, photo_id, sha256) VALUES (?, ?, ?)",
+                    (self.site, photo_id, sha256),
+                )
+
+    def forget(self, media_id):
+        """メディアを索引から外す（削除されたメディアなど）"""
+        with self.lock, self.conn:
+            rows = self.conn.execute(
+                "SELECT sha256 FROM media WHERE site = ? AND media_id = ?", (self.site, media_id)
+            ).fetchall()
+            for row in rows:
+                self.conn.execute("DELETE FROM photos WHERE site = ? AND sha256 = ?", (self.site, row["sha256"]))
+            self.conn.execute("DELETE FROM media WHERE site = ? AND media_id = ?", (self.site, media_id))
+
+    def photo_lock(self, photo_id):
+        """写真ごとのロック（同じ写真の検索結果を複数の記事で同時に処理する場合に使う）"""
+        with self.lock:
+            return self.photo_locks.setdefault(photo_id or "", threading.Lock())
+
+    def find_or_upload(self, photo_id, upload, discard=None):
+        """既存のメディアを探し、なければアップロードする
+
+        Args:
+            photo_id: Unsplash の写真ID（不明ならNone。SHA-256だけで照合する）
+            upload: 画像を転送して ({"id", "source_url"}, 元画像の SHA-256) を返す関数
+                （写真IDで見つかった場合は呼ばない）
+            discard: アップロードした画像が既存のメディアと同じだった場合に、
+                アップロードしたメディアのIDを受け取って削除する関数
+
+        Returns:
+            ({"id", "source_url"}, 既存のメディアを使ったか)
+        """
+        with self.photo_lock(photo_id):
+            if photo_id:
+                media = self.find_by_photo(photo_id)
+                if media is not None:
+                    self.count("photo")
+                    return media, True
+
+            media, sha256 = upload()
+            existing = self.find_by_hash(sha256)
+            if existing is not None and existing["id"] != media["id"]:
+                if discard is not None:
+                    discard(media["id"])
+                self.record(sha256, existing["id"], existing["source_url"], photo_id)
+                self.count("duplicate")
+                return existing, True
+
+            self.record(sha256, media["id"], media["source_url"], photo_id)
+            self.count("uploaded")
+            return {"id": media["id"], "source_url": media["source_url"]}, False
+
+    def count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+
+def get_index(config):
+    """プロセス内で共有する索引（config の WORDPRESS_URL のサイト用）"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = MediaIndex(config["WORDPRESS_URL"])
+        return _index
+
+
+def find_or_upload(config, photo_id, upload, discard=None):
+    """共有の索引でメディアを探し、なければアップロードする（MediaIndex.find_or_upload を参照）"""
+    return get_index(config).find_or_upload(photo_id, upload, discard)
+
+
+def forget(media_id):
+    """共有の索引からメディアを外す（索引を使っていなければ何もしない）"""
+    with _index_lock:
+        index = _index
+    if index is not None:
+        index.forget(media_id)
+
+
+def forget_missing(media_id, error):
+    """メディアの更新の失敗（wp_client.BatchWriter のエラーメッセージ）が、メディアがない
+    ためなら共有の索引から外す。外したらTrue"""
+    if not str(error).startswith(("HTTP 404", "HTTP 410")):
+        return False
+    forget(media_id)
+    return True
+
+
+def format_stats():
+    """実行サマリー用の再利用・アップロード数の文字列（索引を使わなかった場合は空文字）"""
+    with _index_lock:
+        index = _index
+    if index is None:
+        return ""
+    with index.lock:
+        stats = dict(index.stats)
+    reused = stats["photo"] + stats["duplicate"]
+    if not (reused or stats["uploaded"]):
+        return ""
+    return (f"メディア: 既存を再利用 {reused}件（転送不要 {stats['photo']}件）"
+            f" / 新規アップロード {stats['uploaded']}件")
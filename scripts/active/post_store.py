@@ -0,0 +1,231 @@
+"""
+ローカル記事ストア（SQLite）
+
+記事ID・更新日時（modified）をキーに、タイトル、本文（rendered / raw）、
+カテゴリ・タグID、アイキャッチ画像ID、AIOSEOのメタディスクリプションを保持する。
+各スクリプトはここから記事を読み、古くなった行だけを post_sync で更新する。
+
+使用方法:
+    import post_store
+
+    with post_store.PostStore() as store:
+        posts = store.get_posts()
+"""
+
+import os
+import json
+import sqlite3
+from datetime import datetime
+
+
+STORE_PATH = "cache/posts.sqlite3"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    id INTEGER PRIMARY KEY,
+    modified TEXT NOT NULL,
+    modified_gmt TEXT,
+    date TEXT,
+    slug TEXT,
+    status TEXT,
+    link TEXT,
+    title TEXT,
+    content_rendered TEXT,
+    content_raw TEXT,
+    excerpt TEXT,
+    categories TEXT,
+    tags TEXT,
+    featured_media INTEGER DEFAULT 0,
+    meta_description TEXT,
+    meta_modified TEXT,
+    synced_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_posts_modified ON posts (modified_gmt);
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class PostStore:
+    """SQLiteによる記事ストア"""
+
+    def __init__(self, path=STORE_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    # -------------------------------------------------------------------------
+    # 同期状態
+    # -------------------------------------------------------------------------
+
+    def get_state(self, key, default=None):
+        """同期状態の値を取得する"""
+        row = self.conn.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+        return json.loads(row["value"]) if row else default
+
+    def set_state(self, key, value):
+        """同期状態の値を保存する"""
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)",
+                (key, json.dumps(value, ensure_ascii=False)),
+            )
+
+    # -------------------------------------------------------------------------
+    # 記事
+    # -------------------------------------------------------------------------
+
+    def upsert_posts(self, posts):
+        """REST APIの記事データを保存する（posts はリストでもジェネレータでもよい）
+
+        raw本文は context=edit で取得した場合のみ含まれる。含まれない場合は
+        古いraw本文が残らないようNULLにする。メタディスクリプションは
+        記事の modified が変わっていなければ保持する。
+        """
+        synced_at = datetime.now().isoformat()
+
+        def to_row(post):
+            content = post.get('content', {})
+            return (
+                post['id'],
+                post['modified'],
+                post.get('modified_gmt'),
+                post.get('date'),
+                post.get('slug'),
+                post.get('status'),
+                post.get('link'),
+                post.get('title', {}).get('rendered', ''),
+                content.get('rendered', ''),
+                content.get('raw'),
+                post.get('excerpt', {}).get('rendered'),
+                json.dumps(post.get('categories', [])),
+                json.dumps(post.get('tags', [])),
+                post.get('featured_media', 0),
+                synced_at,
+            )
+
+        # ジェネレータを渡せば受信しながら1件ずつ書き込む
+        rows = (to_row(post) for post in posts)
+
+        with self.conn:
+            self.conn.executemany("""
+                INSERT INTO posts (
+                    id, modified, modified_gmt, date, slug, status, link, title,
+                    content_rendered, content_raw, excerpt, categories, tags,
+                    featured_media, synced_at
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (id) DO UPDATE SET
+                    modified = excluded.modified,
+                    modified_gmt = excluded.modified_gmt,
+                    date = excluded.date,
+                    slug = excluded.slug,
+                    status = excluded.status,
+                    link = excluded.link,
+                    title = excluded.title,
+                    content_rendered = excluded.content_rendered,
+                    content_raw = excluded.content_raw,
+                    excerpt = excluded.excerpt,
+                    categories = excluded.categories,
+                    tags = excluded.tags,
+                    featured_media = excluded.featured_media,
+                    synced_at = excluded.synced_at
+            """, rows)
+
+    def delete_posts(self, post_ids):
+        """記事を削除する（WordPress側で削除・非公開化されたもの）"""
+        with self.conn:
+            self.conn.executemany("DELETE FROM posts WHERE id = ?", [(i,) for i in post_ids])
+
+    def get_ids(self):
+        """保存されている記事IDの集合"""
+        return {row["id"] for row in self.conn.execute("SELECT id FROM posts")}
+
+    def get_ids_without_raw(self):
+        """raw本文のない（認証なしで取得した）記事IDの集合"""
+        return {row["id"] for row in self.conn.execute("SELECT id FROM posts WHERE content_raw IS NULL")}
+
+    def iter_posts(self, post_ids=None):
+        """記事をREST APIと同じ形のdictで1件ずつ返す（公開日の新しい順）"""
+        query = "SELECT * FROM posts"
+        params = ()
+        if post_ids is not None:
+            post_ids = list(post_ids)
+            query += f" WHERE id IN ({','.join('?' * len(post_ids))})"
+            params = tuple(post_ids)
+        query += " ORDER BY date DESC, id DESC"
+        for row in self.conn.execute(query, params):
+            yield row_to_post(row)
+
+    def get_posts(self, post_ids=None):
+        """記事をREST APIと同じ形のdictのリストで返す（公開日の新しい順）"""
+        return list(self.iter_posts(post_ids))
+
+    def get_post(self, post_id):
+        """記事を1件返す。なければNone"""
+        posts = self.get_posts([post_id])
+        return posts[0] if posts else None
+
+    def get_latest_modified(self):
+        """modified_gmt が最大の記事の (modified_gmt, modified) を返す"""
+        row = self.conn.execute(
+            "SELECT modified_gmt, modified FROM posts ORDER BY modified_gmt DESC LIMIT 1"
+        ).fetchone()
+        return (row["modified_gmt"], row["modified"]) if row else (None, None)
+
+    # -------------------------------------------------------------------------
+    # メタディスクリプション（AIOSEO）
+    # -------------------------------------------------------------------------
+
+    def get_stale_meta_ids(self):
+        """メタディスクリプションが未取得、または記事更新後に未再取得の記事ID"""
+        rows = self.conn.execute(
+            "SELECT id FROM posts WHERE meta_modified IS NULL OR meta_modified != modified"
+        )
+        return [row["id"] for row in rows]
+
+    def set_meta_description(self, post_id, description, modified=None):
+        """メタディスクリプションを保存する（modified はその時点の記事更新日時）"""
+        with self.conn:
+            self.conn.execute(
+                """UPDATE posts SET meta_description = ?,
+                       meta_modified = COALESCE(?, modified)
+                   WHERE id = ?""",
+                (description, modified, post_id),
+            )
+
+
+def row_to_post(row):
+    """SQLiteの行をREST APIの記事dictに変換する"""
+    content = {'rendered': row["content_rendered"] or ''}
+    if row["content_raw"] is not None:
+        content['raw'] = row["content_raw"]
+
+    return {
+        'id': row["id"],
+        'date': row["date"],
+        'modified': row["modified"],
+        'modified_gmt': row["modified_gmt"],
+        'slug': row["slug"],
+        'status': row["status"],
+        'link': row["link"],
+        'title': {'rendered': row["title"] or ''},
+        'content': content,
+        'excerpt': {'rendered': row["excerpt"] or ''},
+        'categories': json.loads(row["categories"] or '[]'),
+        'tags': json.loads(row["tags"] or '[]'),
+        'featured_media': row["featured_media"] or 0,
+        'meta_description': row["meta_description"],
+    }
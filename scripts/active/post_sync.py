@@ -0,0 +1,151 @@
+"""
+記事の差分同期
+
+ローカル記事ストア（post_store）を WordPress と同期する。
+前回同期時の modified_gmt の最大値（ハイウォーターマーク）を保存し、
+次回以降は modified_after でそれ以降に更新された記事だけを取得する。
+削除・非公開化は id のみの一覧（_fields=id）で検出する。
+
+使用方法:
+    import post_store
+    import post_sync
+
+    with post_store.PostStore() as store:
+        posts, stats = post_sync.sync_posts(config, store)
+"""
+
+from datetime import datetime, timedelta
+
+import requests
+
+import wp_client
+
+
+SYNC_PARAMS = {"status": "publish"}
+INCLUDE_CHUNK = 100  # include パラメータ1回あたりのID数
+
+
+def modified_after_param(modified):
+    """modified_after に渡す値を作る
+
+    WordPress は modified_after をサイトのローカル時刻（post_modified列）と比較するため、
+    ローカル時刻の modified を使う。同一秒内の更新を取りこぼさないよう1秒戻す。
+    """
+    value = datetime.fromisoformat(modified) - timedelta(seconds=1)
+    return value.isoformat()
+
+
+def store_params(config):
+    """ストア用の取得パラメータ（認証があれば context=edit で raw 本文も取得）"""
+    params = dict(SYNC_PARAMS)
+    if wp_client.get_auth(config):
+        params["context"] = "edit"
+    return params
+
+
+def fetch_posts_by_ids(config, post_ids, params):
+    """指定IDの記事を include でまとめて取得する"""
+    posts = []
+    post_ids = list(post_ids)
+    for start in range(0, len(post_ids), INCLUDE_CHUNK):
+        chunk = post_ids[start:start + INCLUDE_CHUNK]
+        chunk_params = dict(params)
+        chunk_params["include"] = ",".join(str(i) for i in chunk)
+        posts.extend(wp_client.get_all_posts(config, chunk_params, fields="store"))
+    return posts
+
+
+def sync_store(config, store, full=False):
+    """ストアを差分同期する（記事はストアから読み出す）
+
+    初回、full=True、または取得条件が前回と異なる場合は全件取得する。
+    context=edit の有無（raw本文の有無）は取得条件に含めない。認証がある場合は、
+    認証なしで同期した raw 本文のない記事を差分同期のときに取得し直す。
+
+    Returns:
+        {'mode': 'full'|'delta', 'fetched': 件数, 'removed': 件数}
+    """
+    params = store_params(config)
+    _, modified = store.get_latest_modified()
+
+    if full or modified is None or store.get_state('params') != SYNC_PARAMS:
+        # 受信した記事から順にストアへ書き込む（全件をメモリに載せない）
+        stored_ids = store.get_ids()
+        fetched_ids = set()
+
+        def track(posts):
+            for post in posts:
+                fetched_ids.add(post['id'])
+                yield post
+
+        store.upsert_posts(track(wp_client.iter_posts(config, params, fields="store")))
+        removed = stored_ids - fetched_ids
+        store.delete_posts(removed)
+        store.set_state('params', SYNC_PARAMS)
+        stats = {'mode': 'full', 'fetched': len(fetched_ids), 'removed': len(removed)}
+    else:
+        # 1. ハイウォーターマーク以降に更新された記事のみ取得
+        delta_params = dict(params)
+        delta_params['modified_after'] = modified_after_param(modified)
+        changed = wp_client.get_all_posts(config, delta_params, fields="store")
+        store.upsert_posts(changed)
+
+        # 2. idのみの一覧で削除・非公開化を検出
+        listing = wp_client.get_all_posts(config, SYNC_PARAMS, fields="ids")
+        live_ids = {item['id'] for item in listing}
+        stored_ids = store.get_ids()
+        removed = stored_ids - live_ids
+        store.delete_posts(removed)
+
+        # 下書きから公開に戻した記事など、ストアにないIDは個別に取得
+        missing = live_ids - stored_ids
+        if 'context' in params:
+            # 認証なしで同期した記事は raw 本文がないため取得し直す
+            missing |= store.get_ids_without_raw() & live_ids
+        if missing:
+            store.upsert_posts(fetch_posts_by_ids(config, missing, params))
+
+        stats = {'mode': 'delta', 'fetched': len(changed) + len(missing), 'removed': len(removed)}
+
+    store.set_state('synced_at', datetime.now().isoformat())
+    return stats
+
+
+def sync_posts(config, store, full=False):
+    """ストアを差分同期し、同期後の全記事を返す
+
+    Returns:
+        (posts, stats)
+        posts: WordPressの一覧と同じ並び順（公開日の新しい順）の記事リスト
+        stats: sync_store の結果に 'total': 件数 を加えたもの
+    """
+    stats = sync_store(config, store, full)
+    posts = store.get_posts()
+    stats['total'] = len(posts)
+    return posts, stats
+
+
+def sync_meta_descriptions(config, store):
+    """AIOSEOのメタディスクリプションを、未取得・記事更新後の行だけ取得する
+
+    200 の応答があれば、success: false など説明文がない場合も空文字を保存する
+    （記事が更新されるまで再取得しない）。通信エラーや 200 以外の応答の行は次回再取得する。
+
+    Returns:
+        取得した件数
+    """
+    stale_ids = store.get_stale_meta_ids()
+    for post_id in stale_ids:
+        try:
+            response = wp_client.wp_post(config, "aioseo/v1/post", {"id": post_id}, idempotent=True)
+            if response.status_code != 200:
+                continue  # 取得できなかった行は次回再取得する
+            result = response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"警告: 記事ID {post_id} のメタディスクリプションを取得できませんでした: {e}")
+            continue
+        description = ''
+        if isinstance(result, dict) and result.get('success') and 'post' in result:
+            description = result['post'].get('description') or ''
+        store.set_meta_description(post_id, description)
+    return len(stale_ids)
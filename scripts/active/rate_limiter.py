@@ -0,0 +1,131 @@
+"""
+トークンバケット方式のレート制限
+
+サービスごとに「レート（1秒あたりのリクエスト数）」と「バースト（連続で送れる数）」を持ち、
+トークンが足りない時だけ必要な時間だけ待機する。固定の time.sleep を置き換える。
+Unsplash は X-Ratelimit-Limit / X-Ratelimit-Remaining ヘッダーで残量を随時反映する。
+
+設定は環境変数 RATE_LIMIT_<サービス名> で上書きできる（形式: "レート/バースト"）。
+    RATE_LIMIT_WORDPRESS=2/4      # 1秒あたり2リクエスト、最大4連続
+    RATE_LIMIT_UNSPLASH=0.0139/50 # 1時間あたり50リクエスト
+
+使用方法:
+    import rate_limiter
+
+    rate_limiter.acquire("unsplash")
+    response = ...
+    rate_limiter.update_from_headers("unsplash", response.headers)
+"""
+
+import os
+import time
+import threading
+
+
+# サービス別の既定値: (レート[回/秒], バースト, 予備枠)
+# 予備枠はサーバー側の残量からこの数を差し引いて扱う（他スクリプトとの共用分）
+DEFAULT_LIMITS = {
+    "wordpress": (4.0, 8, 0),
+    "unsplash": (50 / 3600, 50, 5),  # デモ枠: 1時間あたり50リクエスト
+}
+
+UNSPLASH_WINDOW = 3600  # Unsplashのレート制限の集計期間（秒）
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+class TokenBucket:
+    """スレッドセーフなトークンバケット"""
+
+    def __init__(self, rate, burst, reserve=0, name=""):
+        self.rate = rate
+        self.burst = burst
+        self.reserve = reserve
+        self.name = name
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        self.total_wait = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, tokens=1, on_wait=None):
+        """トークンを取得する。足りなければ必要な時間だけ待つ
+
+        Args:
+            on_wait: 1秒以上待つ場合に待機秒数を渡して呼ばれる関数（表示用）
+
+        Returns:
+            待機した秒数
+        """
+        with self.lock:
+            self._refill()
+            self.tokens -= tokens
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            self.total_wait += wait
+
+        # 予約済みのトークンを待つ（ロック外で待機し、他スレッドは後ろに並ぶ）
+        if wait > 0:
+            if on_wait and wait >= 1:
+                on_wait(wait)
+            time.sleep(wait)
+        return wait
+
+    def update_remaining(self, remaining, limit=None, window=None):
+        """サーバーが返した残量をバケットに反映する
+
+        残量が予備枠を下回るとトークンがマイナスになり、不足分だけ待機が長くなる。
+        limit と window が分かればレートとバーストも合わせる。
+        """
+        with self.lock:
+            if limit and window:
+                self.rate = limit / window
+                self.burst = limit
+            self._refill()
+            self.tokens = min(self.burst, remaining - self.reserve)
+
+
+def parse_limit(value):
+    """'レート/バースト' 形式の文字列を (rate, burst) に変換する"""
+    rate, _, burst = value.partition("/")
+    rate = float(rate)
+    return rate, int(burst) if burst else max(1, int(rate))
+
+
+def get_bucket(name):
+    """サービス名に対応するトークンバケットを返す（初回は既定値・環境変数から作成）"""
+    with _buckets_lock:
+        bucket = _buckets.get(name)
+        if bucket is None:
+            rate, burst, reserve = DEFAULT_LIMITS.get(name, (1.0, 1, 0))
+            override = os.getenv(f"RATE_LIMIT_{name.upper()}")
+            if override:
+                rate, burst = parse_limit(override)
+            bucket = TokenBucket(rate, burst, reserve, name)
+            _buckets[name] = bucket
+        return bucket
+
+
+def acquire(name, tokens=1, on_wait=None):
+    """サービスのトークンを取得する（TokenBucket.acquire を参照）"""
+    return get_bucket(name).acquire(tokens, on_wait)
+
+
+def update_from_headers(name, headers, window=UNSPLASH_WINDOW):
+    """X-Ratelimit-Remaining / X-Ratelimit-Limit ヘッダーを反映する"""
+    remaining = headers.get("X-Ratelimit-Remaining")
+    if remaining is None:
+        return
+    limit = headers.get("X-Ratelimit-Limit")
+    get_bucket(name).update_remaining(int(remaining), int(limit) if limit else None, window)
+
+
+def format_wait_stats():
+    """サービスごとの累計待機時間の表示用文字列"""
+    with _buckets_lock:
+        parts = [f"{name} {bucket.total_wait:.1f}秒" for name, bucket in _buckets.items()]
+    return "レート制限による待機: " + (", ".join(parts) if parts else "なし")
@@ -0,0 +1,220 @@
+"""
+HTTPリクエストの再試行ポリシーとサーキットブレーカー
+
+一時的なエラー（429, 5xx, 接続エラー, タイムアウト）を指数バックオフ＋ジッターで再試行する。
+Retry-After ヘッダーがあればその秒数を優先する。再試行するのは既定では冪等なメソッド
+（GET, HEAD, OPTIONS, PUT, DELETE）のみで、POST は呼び出し側が idempotent=True を
+指定した場合（同じ内容での記事更新など）だけ再試行する。
+
+ホストごとにサーキットブレーカーを持ち、連続で失敗した場合や 503/429 で Retry-After を
+受け取った場合は、そのホストへの全ワーカーのリクエストを一定時間止める。
+
+再試行したリクエストは記録され、format_summary() で実行結果のサマリーに表示できる。
+
+使用方法（wp_client.request から呼ばれる）:
+    response = retry_policy.call(method, url, send, idempotent=None)
+"""
+
+import time
+import random
+import threading
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+import requests
+
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+MAX_RETRIES = 3
+BASE_DELAY = 1.0  # 秒
+MAX_DELAY = 30.0  # バックオフ1回あたりの上限（秒）
+MAX_RETRY_AFTER = 120.0  # これより長い Retry-After は待たずに失敗とする（秒）
+
+BREAKER_THRESHOLD = 5  # 連続失敗がこの回数に達したらブレーカーを開く
+BREAKER_COOLDOWN = 30.0  # ブレーカーを開いている時間（秒）
+
+RETRY_EXCEPTIONS = (requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+# 再試行したリクエストの記録（実行サマリー用）
+_retry_log = []
+_retry_log_lock = threading.Lock()
+
+
+class CircuitBreaker:
+    """ホスト単位のサーキットブレーカー"""
+
+    def __init__(self, host, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.host = host
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.open_until = 0.0
+        self.trips = 0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        """ブレーカーが開いていれば閉じるまで待つ"""
+        while True:
+            with self.lock:
+                remaining = self.open_until - time.monotonic()
+            if remaining <= 0:
+                return
+            time.sleep(remaining)
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+
+    def record_failure(self, pause=None):
+        """失敗を記録する。pause（秒）を渡すと閾値に関係なくその時間ブレーカーを開く"""
+        with self.lock:
+            self.failures += 1
+            if pause is None and self.failures < self.threshold:
+                return
+            duration = max(pause or 0.0, self.cooldown if self.failures >= self.threshold else 0.0)
+            if duration <= 0:
+                return
+            until = time.monotonic() + duration
+            if until <= self.open_until:
+                return
+            self.open_until = until
+            self.trips += 1
+            self.failures = 0
+        print(f"\n⚠️ {self.host} が過負荷のため、全リクエストを{duration:.0f}秒停止します")
+
+
+def get_breaker(url):
+    """URLのホストに対応するサーキットブレーカーを返す"""
+    host = urlsplit(url).netloc
+    with _breakers_lock:
+        breaker = _breakers.get(host)
+        if breaker is None:
+            breaker = CircuitBreaker(host)
+            _breakers[host] = breaker
+        return breaker
+
+
+def parse_retry_after(value):
+    """Retry-After ヘッダー（秒数またはHTTP日付）を秒数に変換する。解釈できなければNone"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def backoff_delay(attempt):
+    """指数バックオフ（フルジッター）の待機秒数"""
+    return random.uniform(0, min(MAX_DELAY, BASE_DELAY * 2 ** attempt))
+
+
+def is_retryable(method, idempotent):
+    """再試行してよいリクエストか（idempotent=None ならメソッドで判定）"""
+    if idempotent is None:
+        return method.upper() in IDEMPOTENT_METHODS
+    return idempotent
+
+
+def call(method, url, send, idempotent=None, max_retries=MAX_RETRIES):
+    """send() を再試行ポリシーとサーキットブレーカーのもとで実行する
+
+    Args:
+        send: レスポンスを返す引数なしの関数
+        idempotent: 再試行してよいか（None ならメソッドで判定）
+
+    Returns:
+        最後のレスポンス（再試行しきれなかったエラーステータスもそのまま返す）
+
+    Raises:
+        requests.exceptions.RequestException: 再試行しきれなかった接続エラー等
+    """
+    breaker = get_breaker(url)
+    retries = max_retries if is_retryable(method, idempotent) else 0
+    errors = []
+
+    for attempt in range(retries + 1):
+        breaker.wait()
+        try:
+            response = send()
+        except RETRY_EXCEPTIONS as e:
+            breaker.record_failure()
+            errors.append(type(e).__name__)
+            if attempt >= retries:
+                if retries:
+                    _record(method, url, errors, ok=False)
+                raise
+            time.sleep(backoff_delay(attempt))
+            continue
+
+        if response.status_code not in RETRY_STATUSES:
+            breaker.record_success()
+            if errors:
+                _record(method, url, errors, ok=True)
+            return response
+
+        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        overloaded = response.status_code in (429, 503) and retry_after is not None
+        breaker.record_failure(pause=min(retry_after, MAX_RETRY_AFTER) if overloaded else None)
+        errors.append(f"HTTP {response.status_code}")
+
+        if attempt >= retries or (retry_after is not None and retry_after > MAX_RETRY_AFTER):
+            if retries:
+                _record(method, url, errors, ok=False)
+            return response
+
+        # 再試行するレスポンスは閉じて接続をプールに返す（stream=True の本文は読まれないまま残るため）
+        response.close()
+
+        # ブレーカーで止めた場合は breaker.wait() が待つので、ここでは通常のバックオフのみ
+        delay = backoff_delay(attempt)
+        if retry_after is not None and not overloaded:
+            delay = max(delay, retry_after)
+        time.sleep(delay)
+
+    return response
+
+
+def _record(method, url, errors, ok):
+    with _retry_log_lock:
+        _retry_log.append({
+            "method": method.upper(),
+            "url": url,
+            "errors": list(errors),
+            "ok": ok,
+        })
+
+
+def get_retry_log():
+    """再試行したリクエストの記録のコピー"""
+    with _retry_log_lock:
+        return list(_retry_log)
+
+
+def format_summary():
+    """実行サマリー用の再試行結果の文字列（再試行がなければ空文字）"""
+    log = get_retry_log()
+    with _breakers_lock:
+        trips = sum(b.trips for b in _breakers.values())
+    if not log and not trips:
+        return ""
+
+    recovered = sum(1 for entry in log if entry["ok"])
+    lines = [f"再試行: {len(log)}件（回復 {recovered}件 / 失敗 {len(log) - recovered}件）"]
+    if trips:
+        lines.append(f"サーキットブレーカー作動: {trips}回")
+    for entry in log:
+        if not entry["ok"]:
+            lines.append(f"  ❌ {entry['method']} {entry['url']} ({', '.join(entry['errors'])})")
+    return "\n".join(lines)
@@ -0,0 +1,166 @@
+"""
+実行ジャーナル（中断した実行の再開用）
+
+スクリプトの実行ごとに、実行時のオプション・対象記事の一覧（計画）と、
+各記事の完了したステップを SQLite に記録する。ステップが終わるたびにコミットするため、
+KeyboardInterrupt や異常終了の後でも --resume で中断した位置から再開できる。
+
+アップロード済みのメディアIDも記録し、再開時は同じ画像を再アップロードせずに使い回す。
+正常に最後まで実行したら finish() で完了にする（完了した実行は再開の対象にならない）。
+
+使用方法:
+    import run_journal
+
+    journal = run_journal.RunJournal("apply_post_improvements")
+    run = journal.resume()          # 中断した実行（なければNone）
+    if run is None:
+        journal.start(options, plan)
+    ...
+    journal.checkpoint(post_id, "meta-desc", {"description": meta_desc})
+    if journal.completed(post_id, "saved"):
+        ...
+    journal.finish()
+"""
+
+import os
+import json
+import sqlite3
+import threading
+from datetime import datetime
+
+
+JOURNAL_PATH = "cache/run_journal.sqlite3"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    script TEXT NOT NULL,
+    options TEXT NOT NULL,
+    plan TEXT NOT NULL,
+    status TEXT NOT NULL,
+    started_at TEXT NOT NULL,
+    finished_at TEXT
+);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    run_id INTEGER NOT NULL,
+    post_id INTEGER NOT NULL,
+    step TEXT NOT NULL,
+    data TEXT,
+    completed_at TEXT NOT NULL,
+    PRIMARY KEY (run_id, post_id, step)
+);
+"""
+
+MEDIA_PREFIX = "media:"  # メディアのチェックポイントのステップ名の接頭辞
+
+
+class RunJournal:
+    """スクリプト1つ分の実行ジャーナル（スレッドセーフ）"""
+
+    def __init__(self, script, path=JOURNAL_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.script = script
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+        self.lock = threading.Lock()
+        self.run_id = None
+        self.checkpoints = {}  # {(post_id, step): data}
+
+    def close(self):
+        self.conn.close()
+
+    def start(self, options, plan):
+        """新しい実行を開始する（中断したままの以前の実行は破棄扱いにする）
+
+        Args:
+            options: 再開時に復元するオプション（JSONにできるdict）
+            plan: 対象記事の一覧（JSONにできる値。再開時にそのまま返す）
+        """
+        now = datetime.now().isoformat()
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE runs SET status = 'abandoned', finished_at = ? "
+                "WHERE script = ? AND status = 'running'",
+                (now, self.script),
+            )
+            cursor = self.conn.execute(
+                "INSERT INTO runs (script, options, plan, status, started_at) VALUES (?, ?, ?, 'running', ?)",
+                (self.script, json.dumps(options, ensure_ascii=False),
+                 json.dumps(plan, ensure_ascii=False), now),
+            )
+            self.run_id = cursor.lastrowid
+            self.checkpoints = {}
+        return self.run_id
+
+    def resume(self):
+        """最後に中断した実行を再開する
+
+        Returns:
+            {"id", "options", "plan", "started_at", "completed"}（再開できる実行がなければNone）
+            completed は完了済みのチェックポイント数
+        """
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT * FROM runs WHERE script = ? AND status = 'running' ORDER BY id DESC LIMIT 1",
+                (self.script,),
+            ).fetchone()
+            if row is None:
+                return None
+            self.run_id = row["id"]
+            self.checkpoints = {
+                (cp["post_id"], cp["step"]): json.loads(cp["data"]) if cp["data"] is not None else None
+                for cp in self.conn.execute(
+                    "SELECT post_id, step, data FROM checkpoints WHERE run_id = ?", (self.run_id,)
+                )
+            }
+        return {
+            "id": row["id"],
+            "options": json.loads(row["options"]),
+            "plan": json.loads(row["plan"]),
+            "started_at": row["started_at"],
+            "completed": len(self.checkpoints),
+        }
+
+    def checkpoint(self, post_id, step, data=None):
+        """記事のステップの完了を記録する（すぐにコミットする）"""
+        if self.run_id is None:
+            return
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO checkpoints (run_id, post_id, step, data, completed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (self.run_id, post_id, step,
+                 json.dumps(data, ensure_ascii=False) if data is not None else None,
+                 datetime.now().isoformat()),
+            )
+            self.checkpoints[(post_id, step)] = data
+
+    def completed(self, post_id, step):
+        """ステップが完了済みか"""
+        with self.lock:
+            return (post_id, step) in self.checkpoints
+
+    def get(self, post_id, step, default=None):
+        """完了済みのステップの記録データ（未完了なら default）"""
+        with self.lock:
+            return self.checkpoints.get((post_id, step), default)
+
+    def record_media(self, post_id, key, media):
+        """アップロードしたメディアを記録する（key は記事内で画像を区別する値。元画像のURLなど）"""
+        self.checkpoint(post_id, MEDIA_PREFIX + key, media)
+
+    def find_media(self, post_id, key):
+        """この実行でアップロード済みのメディア（なければNone）"""
+        return self.get(post_id, MEDIA_PREFIX + key)
+
+    def finish(self):
+        """実行を完了にする（以後は再開の対象にならない）"""
+        if self.run_id is None:
+            return
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE runs SET status = 'finished', finished_at = ? WHERE id = ?",
+                (datetime.now().isoformat(), self.run_id),
+            )
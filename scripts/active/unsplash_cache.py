@@ -0,0 +1,139 @@
+"""
+Unsplash 検索結果のディスクキャッシュ
+
+Unsplash のデモ枠は1時間あたり50リクエストしかないため、同じ検索
+（フォールバックキーワードの "technology" や "coding" など）を繰り返さないよう、
+検索結果を (query, per_page, orientation) ごとに SQLite に保存して再利用する。
+キャッシュにヒットした検索はリクエストを送らず、レート制限の枠も使わない。
+
+古い結果は TTL（既定24時間）で無効にし、件数が上限（既定1000件）を超えたら
+最後に使われた日時が古いものから削除する。
+apply_post_improvements.py と add_featured_images.py で共有する。
+
+設定（環境変数、任意）:
+    UNSPLASH_CACHE_TTL=86400     # 有効期間（秒）。0 でキャッシュを使わない
+    UNSPLASH_CACHE_SIZE=1000     # 保存する検索結果の上限件数
+
+使用方法:
+    import unsplash_cache
+
+    images = unsplash_cache.get(query, per_page, "landscape")
+    if images is None:
+        images = ...  # APIで検索
+        unsplash_cache.put(query, per_page, "landscape", images)
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+
+
+CACHE_PATH = "cache/unsplash_search.sqlite3"
+DEFAULT_TTL = 24 * 3600
+DEFAULT_SIZE = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS searches (
+    query TEXT NOT NULL,
+    per_page INTEGER NOT NULL,
+    orientation TEXT NOT NULL,
+    results TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    used_at REAL NOT NULL,
+    PRIMARY KEY (query, per_page, orientation)
+);
+CREATE INDEX IF NOT EXISTS idx_searches_used_at ON searches (used_at);
+"""
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+class SearchCache:
+    """SQLiteによる検索結果のキャッシュ（スレッドセーフ）"""
+
+    def __init__(self, path=CACHE_PATH, ttl=DEFAULT_TTL, max_entries=DEFAULT_SIZE):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def close(self):
+        self.conn.close()
+
+    def get(self, query, per_page, orientation):
+        """有効な検索結果（画像情報のリスト）を返す。なければ・期限切れならNone"""
+        now = time.time()
+        with self.lock, self.conn:
+            row = self.conn.execute(
+                "SELECT results, fetched_at FROM searches WHERE query = ? AND per_page = ? AND orientation = ?",
+                (query, per_page, orientation),
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                self.misses += 1
+                return None
+            self.conn.execute(
+                "UPDATE searches SET used_at = ? WHERE query = ? AND per_page = ? AND orientation = ?",
+                (now, query, per_page, orientation),
+            )
+            self.hits += 1
+            return json.loads(row[0])
+
+    def put(self, query, per_page, orientation, results):
+        """検索結果を保存し、上限を超えた分を古い順に削除する"""
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO searches (query, per_page, orientation, results, fetched_at, used_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (query, per_page, orientation, json.dumps(results, ensure_ascii=False), now, now),
+            )
+            # 期限切れのものと、上限を超えた最後に使われた日時が古いものを削除
+            self.conn.execute("DELETE FROM searches WHERE fetched_at < ?", (now - self.ttl,))
+            self.conn.execute(
+                "DELETE FROM searches WHERE rowid IN ("
+                "SELECT rowid FROM searches ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+
+def get_cache():
+    """プロセス内で共有するキャッシュ（UNSPLASH_CACHE_TTL=0 ならNone）"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            ttl = int(os.getenv("UNSPLASH_CACHE_TTL", DEFAULT_TTL))
+            if ttl <= 0:
+                return None
+            size = int(os.getenv("UNSPLASH_CACHE_SIZE", DEFAULT_SIZE))
+            _cache = SearchCache(ttl=ttl, max_entries=size)
+        return _cache
+
+
+def get(query, per_page, orientation):
+    """共有キャッシュから検索結果を返す（SearchCache.get を参照）"""
+    cache = get_cache()
+    return cache.get(query, per_page, orientation) if cache else None
+
+
+def put(query, per_page, orientation, results):
+    """共有キャッシュに検索結果を保存する（SearchCache.put を参照）"""
+    cache = get_cache()
+    if cache:
+        cache.put(query, per_page, orientation, results)
+
+
+def format_stats():
+    """実行サマリー用のヒット数の文字列（キャッシュを使わなかった場合は空文字）"""
+    with _cache_lock:
+        cache = _cache
+    if cache is None or not (cache.hits or cache.misses):
+        return ""
+    return f"Unsplash検索キャッシュ: ヒット {cache.hits}件 / API検索 {cache.misses}件"
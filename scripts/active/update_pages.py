@@ -12,10 +12,11 @@ AdSense審査対策: お問い合わせページ・プロフィールページ
 import os
 import sys
 import argparse
-import requests
 import re
 from dotenv import load_dotenv
-from bs4 import BeautifulSoup
+
+import wp_client
+import html_backend
 
 # =============================================================================
 # 設定読み込み
@@ -48,34 +49,24 @@ def load_config():
 
 def get_page_by_id(page_id, config):
     """固定ページをIDで取得"""
-    url = f"{config['WORDPRESS_URL']}/wp-json/wp/v2/pages/{page_id}"
-    auth = (config["WORDPRESS_USERNAME"], config["WORDPRESS_APPLICATION_PASSWORD"])
-
-    response = requests.get(url, params={'context': 'edit'}, auth=auth)
-
-    if response.status_code != 200:
-        print(f"エラー: ページID {page_id} の取得に失敗しました (HTTP {response.status_code})")
-        print(f"レスポンス: {response.text[:200]}")
+    try:
+        return wp_client.get_post(config, page_id, params={'context': 'edit'}, route="wp/v2/pages")
+    except wp_client.WordPressAPIError as e:
+        print(f"エラー: ページID {page_id} の取得に失敗しました (HTTP {e.status_code})")
+        print(f"レスポンス: {e.text[:200]}")
         sys.exit(1)
 
-    return response.json()
-
 
 def update_page_content(page_id, new_content, config):
     """固定ページのコンテンツを更新"""
-    url = f"{config['WORDPRESS_URL']}/wp-json/wp/v2/pages/{page_id}"
-    auth = (config["WORDPRESS_USERNAME"], config["WORDPRESS_APPLICATION_PASSWORD"])
-
     payload = {
         "content": new_content
     }
 
-    response = requests.post(url, json=payload, auth=auth)
-
-    if response.status_code != 200:
-        raise Exception(f"ページ更新失敗 (HTTP {response.status_code}): {response.text[:200]}")
-
-    return response.json()
+    try:
+        return wp_client.update_post(config, page_id, payload, route="wp/v2/pages")
+    except wp_client.WordPressAPIError as e:
+        raise Exception(f"ページ更新失敗 (HTTP {e.status_code}): {e.text[:200]}")
 
 
 # =============================================================================
@@ -96,7 +87,7 @@ def convert_google_form_url_to_iframe(form_url):
     # forms.gle の短縮URLを展開
     if "forms.gle" in form_url:
         try:
-            response = requests.head(form_url, allow_redirects=True, timeout=10)
+            response = wp_client.request("HEAD", form_url, allow_redirects=True, timeout=10)
             form_url = response.url
         except Exception as e:
             print(f"警告: Google Forms URLの展開に失敗しました: {e}")
@@ -226,8 +217,8 @@ def update_profile_page(config, dry_run=False):
     # 既存のHTMLを取得
     current_content = page['content']['raw']
 
-    # BeautifulSoupで解析
-    soup = BeautifulSoup(current_content, 'html.parser')
+    # HTML解析（パーサーは html_backend で選択）
+    soup = html_backend.parse_fragment(current_content)
 
     # 既に運営者情報セクションが存在するかチェック
     existing_operator_section = soup.find('h2', string=lambda t: t and '運営者情報' in t)
@@ -321,9 +312,9 @@ def update_profile_page(config, dry_run=False):
 
     if content_section_div:
         # 新しいセクションをBeautifulSoupのタグとして追加
-        operator_soup = BeautifulSoup(operator_section_html, 'html.parser')
-        career_soup = BeautifulSoup(career_section_html, 'html.parser')
-        purpose_soup = BeautifulSoup(purpose_section_html, 'html.parser')
+        operator_soup = html_backend.parse_fragment(operator_section_html)
+        career_soup = html_backend.parse_fragment(career_section_html)
+        purpose_soup = html_backend.parse_fragment(purpose_section_html)
 
         # content-sectionの最後に追加
         content_section_div.append(operator_soup)
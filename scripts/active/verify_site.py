@@ -20,12 +20,18 @@ from typing import Dict, List, Tuple
 import requests
 from dotenv import load_dotenv
 
+import wp_client
+import http_cache
+
 # .envファイルから環境変数を読み込み
 load_dotenv()
 
 # 設定
 SITE_URL = os.getenv("WORDPRESS_URL", "https://techsimpleapp.main.jp")
 
+# サイトマップ・固定ページの条件付きリクエストキャッシュ
+HTTP_CACHE = http_cache.HTTPCache()
+
 # チェック対象のサイトマップURL（複数パターン）
 SITEMAP_URLS = [
     "/wp-sitemap.xml",          # WordPress標準（5.5以降）
@@ -87,7 +93,7 @@ def check_url_exists(url: str, timeout: int = 10) -> Tuple[bool, int, float]:
     """
     try:
         start_time = time.time()
-        response = requests.get(url, timeout=timeout, allow_redirects=True)
+        response = wp_client.request("GET", url, timeout=timeout, allow_redirects=True, cache=HTTP_CACHE)
         response_time = time.time() - start_time
 
         return response.status_code == 200, response.status_code, response_time
@@ -152,7 +158,7 @@ def check_robots_txt() -> Dict[str, any]:
 
         # robots.txtの内容を取得して表示
         try:
-            response = requests.get(url)
+            response = wp_client.request("GET", url, cache=HTTP_CACHE)
             print_info("\n--- robots.txt の内容 ---")
             print(response.text)
             print_info("--- robots.txt の内容ここまで ---\n")
@@ -220,7 +226,7 @@ def check_https() -> Dict[str, any]:
         # HTTPからのリダイレクトを確認
         http_url = SITE_URL.replace("https://", "http://")
         try:
-            response = requests.get(http_url, allow_redirects=False, timeout=10)
+            response = wp_client.request("GET", http_url, allow_redirects=False, timeout=10)
             if response.status_code in [301, 302]:
                 print_success("HTTP→HTTPSのリダイレクト設定済み")
             else:
@@ -329,6 +335,7 @@ def main():
 
     print("\n" + "="*60)
     print_success("サイト検証が完了しました")
+    print_info(HTTP_CACHE.format_stats())
     print("="*60 + "\n")
 
 
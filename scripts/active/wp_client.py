@@ -0,0 +1,503 @@
+"""
+WordPress REST API 共通クライアント
+
+全スクリプトで共有する keep-alive セッション（コネクションプール付き）、
+デフォルトタイムアウト、認証、ページネーションをまとめたモジュール。
+同一ホストへのリクエストは TLS 接続を再利用する。
+
+使用方法:
+    import wp_client
+
+    posts = wp_client.get_all_posts(config, {"status": "publish"})
+    wp_client.update_post(config, post_id, {"content": new_content})
+"""
+
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import rate_limiter
+import retry_policy
+import json_stream
+
+
+DEFAULT_TIMEOUT = 30  # 秒
+POOL_SIZE = 10  # ホストごとの最大接続数
+DEFAULT_PER_PAGE = 100
+PAGE_WORKERS = 4  # 2ページ目以降を並列取得する際の最大ワーカー数
+BATCH_ROUTE = "batch/v1"
+DEFAULT_BATCH_SIZE = 25  # batch/v1 の1リクエストあたりの件数（WordPressコアの既定上限）
+# batch/v1 に含められないルート（WordPressコアはメディアのコントローラーでバッチを無効にしている）
+UNBATCHABLE_ROUTES = {"wp/v2/media"}
+
+# _fields で要求するフィールドのプロファイル
+# 各スクリプトは必要最小限のプロファイルを指定してレスポンスを小さくする
+FIELD_PROFILES = {
+    # 本文の分析・改善用
+    "analysis": ["id", "title", "content", "link", "categories", "tags", "modified"],
+    # アイキャッチ画像の設定用（add_featured_images は本文を使わないため、ストアを同期せずにこれで取得する）
+    "featured": ["id", "title", "featured_media"],
+    # ローカル記事ストア（post_store）用。差分判定の modified / modified_gmt を含む
+    "store": [
+        "id", "date", "modified", "modified_gmt", "slug", "status", "link",
+        "title", "content", "excerpt", "categories", "tags", "featured_media",
+    ],
+    # 削除・非公開化の検出用（idのみ）
+    "ids": ["id"],
+}
+
+_session = None
+
+# サイトごとの batch/v1 の上限件数（None はバッチ非対応）
+_batch_max_items = {}
+_batch_max_items_lock = threading.Lock()
+
+# エンドポイント別の同時実行数上限（configure_endpoint_limits で設定、未設定なら無制限）
+_endpoint_limits = {}
+
+
+class WordPressAPIError(Exception):
+    """WordPress REST APIが想定外のステータスを返した場合の例外"""
+
+    def __init__(self, message, status_code=None, text=""):
+        super().__init__(message)
+        self.status_code = status_code
+        self.text = text
+
+
+def get_session():
+    """プロセス内で共有する keep-alive セッションを返す"""
+    global _session
+    if _session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        _session = session
+    return _session
+
+
+def configure_endpoint_limits(limits):
+    """エンドポイント名 → 同時実行数 の上限を設定する
+
+    例: {"posts": 4, "aioseo": 4, "media": 2}
+    """
+    _endpoint_limits.clear()
+    for name, limit in limits.items():
+        _endpoint_limits[name] = threading.BoundedSemaphore(limit)
+
+
+@contextmanager
+def endpoint_slot(name):
+    """エンドポイントの同時実行枠を確保する（上限未設定なら何もしない）"""
+    semaphore = _endpoint_limits.get(name)
+    if semaphore is None:
+        yield
+        return
+    with semaphore:
+        yield
+
+
+def request(method, url, timeout=DEFAULT_TIMEOUT, cache=None, idempotent=None, **kwargs):
+    """共有セッションでHTTPリクエストを送る（認証なし、外部API・公開ページ用）
+
+    cache に http_cache.HTTPCache を渡すと、GETを条件付きリクエストで送る。
+    一時的なエラーは retry_policy で再試行する。POST など冪等でないメソッドは
+    idempotent=True を指定した場合のみ再試行する。
+    """
+    if cache is not None and method.upper() == "GET":
+        def send():
+            return cache.fetch(get_session(), url, timeout=timeout, **kwargs)
+    else:
+        def send():
+            return get_session().request(method, url, timeout=timeout, **kwargs)
+    return retry_policy.call(method, url, send, idempotent=idempotent)
+
+
+def get_auth(config):
+    """設定からBasic認証情報を作る。認証情報がなければNoneを返す"""
+    username = config.get("WORDPRESS_USERNAME")
+    password = config.get("WORDPRESS_APPLICATION_PASSWORD")
+    if username and password:
+        return (username, password)
+    return None
+
+
+def api_url(config, route):
+    """REST APIのルート（例: 'wp/v2/posts'）から完全なURLを作る"""
+    return f"{config['WORDPRESS_URL'].rstrip('/')}/wp-json/{route.lstrip('/')}"
+
+
+def wp_request(config, method, route, **kwargs):
+    """WordPress REST APIにリクエストを送る（認証は設定がある場合のみ付与）
+
+    送信前に rate_limiter の "wordpress" バケットからトークンを取得する。
+    """
+    auth = get_auth(config)
+    if auth and "auth" not in kwargs:
+        kwargs["auth"] = auth
+    rate_limiter.acquire("wordpress")
+    return request(method, api_url(config, route), **kwargs)
+
+
+def wp_get(config, route, params=None, **kwargs):
+    """WordPress REST APIへのGET"""
+    return wp_request(config, "GET", route, params=params, **kwargs)
+
+
+def wp_post(config, route, payload=None, **kwargs):
+    """WordPress REST APIへのPOST（JSONボディ）"""
+    return wp_request(config, "POST", route, json=payload, **kwargs)
+
+
+def with_fields(params, fields):
+    """params に _fields を追加した新しい dict を返す
+
+    fields にはプロファイル名（FIELD_PROFILES のキー）かフィールド名のリストを渡す。
+    None の場合は全フィールドを取得する。
+    """
+    params = dict(params or {})
+    if fields is None:
+        return params
+    if isinstance(fields, str):
+        if fields not in FIELD_PROFILES:
+            raise ValueError(f"未知のフィールドプロファイル: {fields}")
+        fields = FIELD_PROFILES[fields]
+    params["_fields"] = ",".join(fields)
+    return params
+
+
+def _fetch_page(config, route, params, page, per_page, **kwargs):
+    """コレクションの指定ページを取得する"""
+    page_params = dict(params or {})
+    page_params.update({"per_page": per_page, "page": page})
+    return wp_get(config, route, params=page_params, **kwargs)
+
+
+def _raise_for_page(response):
+    """ページ取得失敗を例外として送出する"""
+    raise WordPressAPIError(
+        f"取得失敗 (HTTP {response.status_code}): {response.text[:200]}",
+        status_code=response.status_code,
+        text=response.text,
+    )
+
+
+def iter_pages(config, route, params=None, per_page=DEFAULT_PER_PAGE):
+    """ページネーションされたコレクションを1ページずつ返すジェネレータ
+
+    X-WP-TotalPages ヘッダーで終端を判定する。
+    1ページ目の失敗は例外、2ページ目以降の失敗はそこで打ち切る。
+
+    Yields:
+        (page, total_pages, items)
+    """
+    page = 1
+    while True:
+        response = _fetch_page(config, route, params, page, per_page)
+
+        if response.status_code != 200:
+            if page == 1:
+                _raise_for_page(response)
+            break
+
+        items = response.json()
+        if not items:
+            break
+
+        total_pages = int(response.headers.get("X-WP-TotalPages", 1))
+        yield page, total_pages, items
+
+        if page >= total_pages:
+            break
+        page += 1
+
+
+def iter_pages_concurrent(config, route, params=None, per_page=DEFAULT_PER_PAGE,
+                          max_workers=PAGE_WORKERS):
+    """1ページ目の X-WP-TotalPages を見て、2..Nページ目を並列取得する
+
+    結果は iter_pages と同じページ順で返す。途中のページが失敗した場合は
+    逐次取得と同様にそのページ以降を打ち切る。
+
+    Yields:
+        (page, total_pages, items)
+    """
+    response = _fetch_page(config, route, params, 1, per_page)
+    if response.status_code != 200:
+        _raise_for_page(response)
+
+    items = response.json()
+    if not items:
+        return
+
+    total_pages = int(response.headers.get("X-WP-TotalPages", 1))
+    yield 1, total_pages, items
+
+    if total_pages <= 1:
+        return
+
+    workers = max(1, min(max_workers, total_pages - 1))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # mapは投入順に結果を返すため、ページ順がそのまま保たれる
+        responses = executor.map(
+            lambda page: _fetch_page(config, route, params, page, per_page),
+            range(2, total_pages + 1),
+        )
+        for page, response in enumerate(responses, 2):
+            if response.status_code != 200:
+                break
+            items = response.json()
+            if not items:
+                break
+            yield page, total_pages, items
+
+
+def get_all_posts(config, params=None, per_page=DEFAULT_PER_PAGE, max_workers=PAGE_WORKERS,
+                  fields=None):
+    """全記事を取得する（ページネーション対応）
+
+    max_workers が2以上なら2ページ目以降を並列取得し、1なら逐次取得する。
+    どちらの場合も記事の並び順は同じ。fields は with_fields を参照。
+    """
+    params = with_fields(params, fields)
+    if max_workers > 1:
+        pages = iter_pages_concurrent(config, "wp/v2/posts", params, per_page, max_workers)
+    else:
+        pages = iter_pages(config, "wp/v2/posts", params, per_page)
+
+    all_posts = []
+    for _, _, posts in pages:
+        all_posts.extend(posts)
+    return all_posts
+
+
+def iter_posts(config, params=None, per_page=DEFAULT_PER_PAGE, fields=None, route="wp/v2/posts"):
+    """全記事を1件ずつ返すジェネレータ（ページを逐次取得し、ストリーミングでデコード）
+
+    並び順は get_all_posts と同じ。ページ全体をデコードせずに記事を受け取れるため、
+    保存や分析を受信しながら進められる（同時にメモリに載るのはおおむね記事1件分）。
+    """
+    params = with_fields(params, fields)
+    page = 1
+    while True:
+        response = _fetch_page(config, route, params, page, per_page, stream=True)
+        with response:
+            if response.status_code != 200:
+                if page == 1:
+                    _raise_for_page(response)
+                return
+
+            total_pages = int(response.headers.get("X-WP-TotalPages", 1))
+            count = 0
+            for post in json_stream.iter_response(response):
+                count += 1
+                yield post
+
+        if count == 0 or page >= total_pages:
+            return
+        page += 1
+
+
+def get_post(config, post_id, params=None, route="wp/v2/posts", fields=None):
+    """記事（または固定ページ）を1件取得する"""
+    response = wp_get(config, f"{route}/{post_id}", params=with_fields(params, fields))
+
+    if response.status_code != 200:
+        raise WordPressAPIError(
+            f"ID {post_id} の取得失敗 (HTTP {response.status_code}): {response.text[:200]}",
+            status_code=response.status_code,
+            text=response.text,
+        )
+
+    return response.json()
+
+
+def update_post(config, post_id, payload, route="wp/v2/posts"):
+    """記事（または固定ページ）を更新する
+
+    同じ内容での更新は結果が変わらないため、一時的なエラーは再試行する。
+    """
+    with endpoint_slot("posts"):
+        response = wp_post(config, f"{route}/{post_id}", payload, idempotent=True)
+
+    if response.status_code != 200:
+        raise WordPressAPIError(
+            f"更新失敗 (HTTP {response.status_code}): {response.text[:200]}",
+            status_code=response.status_code,
+            text=response.text,
+        )
+
+    return response.json()
+
+
+
+# =============================================================================
+# 一括書き込み（/wp-json/batch/v1）
+# =============================================================================
+
+def get_batch_max_items(config):
+    """batch/v1 の1リクエストあたりの上限件数を返す（非対応のサイトでは None）
+
+    OPTIONS で取得したスキーマの maxItems を使い、結果はサイトごとに保持する。
+    同時に呼ばれても OPTIONS は1回だけ送る（他のスレッドは結果を待つ）。
+    """
+    site = config["WORDPRESS_URL"]
+    with _batch_max_items_lock:
+        if site not in _batch_max_items:
+            response = wp_request(config, "OPTIONS", BATCH_ROUTE)
+            if response.status_code == 404:
+                _batch_max_items[site] = None
+            elif response.status_code != 200:
+                _batch_max_items[site] = DEFAULT_BATCH_SIZE
+            else:
+                try:
+                    args = response.json()["endpoints"][0]["args"]
+                    _batch_max_items[site] = int(args["requests"]["maxItems"])
+                except (ValueError, KeyError, IndexError, TypeError):
+                    _batch_max_items[site] = DEFAULT_BATCH_SIZE
+        return _batch_max_items[site]
+
+
+def _item_result(status, body):
+    """バッチ内の1件のレスポンスを (成功したか, 本文またはエラーメッセージ) にする"""
+    if 200 <= status < 300:
+        return True, body
+    message = body.get("message", "") if isinstance(body, dict) else str(body)
+    return False, f"HTTP {status}: {message[:200]}"
+
+
+def write_one(config, route, object_id, payload):
+    """書き込みを1件送る（batch/v1 を使わない場合）
+
+    Returns:
+        (成功したか, 更新後のデータまたはエラーメッセージ)
+    """
+    try:
+        with endpoint_slot("posts"):
+            response = wp_post(config, f"{route}/{object_id}", payload, idempotent=True)
+    except requests.exceptions.RequestException as e:
+        return False, f"更新失敗: {e}"
+    body = response.json() if response.status_code == 200 else {"message": response.text}
+    return _item_result(response.status_code, body)
+
+
+def batch_write(config, writes, max_items=None):
+    """複数の書き込みを batch/v1 でまとめて送る
+
+    batch/v1 が使えないサイトと、バッチに含められないルート（UNBATCHABLE_ROUTES）は
+    1件ずつ送る。書き込みは同じ内容なら結果が変わらない更新のみを想定し、
+    一時的なエラーは再試行する。
+
+    Args:
+        writes: [(route, object_id, payload), ...]  例: ("wp/v2/posts", 123, {"status": "draft"})
+        max_items: 1リクエストあたりの件数（None ならサーバーの上限）
+
+    Returns:
+        {(route, object_id): (成功したか, 更新後のデータまたはエラーメッセージ)}
+    """
+    results = {}
+    if not writes:
+        return results
+
+    if max_items is None:
+        max_items = get_batch_max_items(config)
+
+    if max_items is None:
+        single, writes = writes, []
+    else:
+        single = [write for write in writes if write[0].strip("/") in UNBATCHABLE_ROUTES]
+        writes = [write for write in writes if write[0].strip("/") not in UNBATCHABLE_ROUTES]
+    for route, object_id, payload in single:
+        results[(route, object_id)] = write_one(config, route, object_id, payload)
+
+    for start in range(0, len(writes), max_items):
+        chunk = writes[start:start + max_items]
+        requests_payload = [
+            {"method": "POST", "path": f"/{route.strip('/')}/{object_id}", "body": payload}
+            for route, object_id, payload in chunk
+        ]
+        try:
+            with endpoint_slot("posts"):
+                response = wp_post(config, BATCH_ROUTE, {"requests": requests_payload}, idempotent=True)
+        except requests.exceptions.RequestException as e:
+            for route, object_id, _ in chunk:
+                results[(route, object_id)] = (False, f"一括更新失敗: {e}")
+            continue
+
+        if response.status_code not in (200, 207):
+            error = f"一括更新失敗 (HTTP {response.status_code}): {response.text[:200]}"
+            for route, object_id, _ in chunk:
+                results[(route, object_id)] = (False, error)
+            continue
+
+        responses = response.json().get("responses", [])
+        for (route, object_id, _), item in zip(chunk, responses):
+            results[(route, object_id)] = _item_result(item.get("status", 500), item.get("body"))
+        for route, object_id, _ in chunk[len(responses):]:
+            results[(route, object_id)] = (False, "一括更新のレスポンスに結果がありません")
+
+    return results
+
+
+class BatchWriter:
+    """書き込みをためて batch/v1 でまとめて送るキュー（スレッドセーフ）
+
+    同じオブジェクトへの書き込みは送信前に1件にまとめる（後の値で上書き）。
+    バッチに含められないルート（メディアなど）は送信時に1件ずつ送る。
+    上限件数に達したら自動で送信し、結果は results に蓄積する。
+
+    使用方法:
+        writer = wp_client.BatchWriter(config)
+        writer.add("wp/v2/posts", post_id, {"content": new_content})
+        results = writer.flush()
+
+    on_results を渡すと、バッチを送信するたびにそのバッチの結果
+    {(route, object_id): (ok, 本文 or エラー)} で呼び出す（進捗の記録用）。
+    """
+
+    def __init__(self, config, max_items=None, on_results=None):
+        self.config = config
+        self.max_items = max_items
+        self.limit = max_items  # 自動送信する件数（未指定なら最初の add で取得する）
+        self.on_results = on_results
+        self.pending = {}
+        self.results = {}
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+
+    def add(self, route, object_id, payload):
+        """書き込みをキューに追加する"""
+        if self.limit is None:
+            # サーバーの上限の取得（OPTIONS）はロックの外で行い、他のスレッドを待たせない
+            self.limit = get_batch_max_items(self.config) or DEFAULT_BATCH_SIZE
+        with self.lock:
+            key = (route, object_id)
+            merged = dict(self.pending.get(key, {}))
+            merged.update(payload)
+            self.pending[key] = merged
+            full = len(self.pending) >= self.limit
+        if full:
+            self.flush()
+
+    def flush(self):
+        """キューにたまった書き込みを送信し、これまでの全結果を返す"""
+        with self.flush_lock:
+            with self.lock:
+                writes = [(route, object_id, payload)
+                          for (route, object_id), payload in self.pending.items()]
+                self.pending = {}
+            results = batch_write(self.config, writes, self.max_items)
+            if self.on_results and results:
+                self.on_results(results)
+            with self.lock:
+                self.results.update(results)
+                return dict(self.results)
+
+    def failures(self):
+        """失敗した書き込みの {(route, object_id): エラーメッセージ}"""
+        with self.lock:
+            return {key: value for key, (ok, value) in self.results.items() if not ok}
@@ -9,10 +9,13 @@ import csv
 import sys
 from datetime import datetime
 
-import requests
 import html as html_module
 from dotenv import load_dotenv
 
+# 共通クライアント（scripts/active/wp_client.py）を読み込む
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "active"))
+import wp_client  # noqa: E402
+
 
 def load_config():
     """環境変数から設定を読み込む"""
@@ -36,33 +39,13 @@ def load_config():
 
 def get_all_posts(config):
     """WordPress REST APIで全記事を取得する"""
-    url = f"{config['WORDPRESS_URL']}/wp-json/wp/v2/posts"
-    auth = (config["WORDPRESS_USERNAME"], config["WORDPRESS_APPLICATION_PASSWORD"])
-
-    all_posts = []
-    page = 1
-
     print("WordPress記事を取得中...")
-    while True:
-        params = {"per_page": 100, "page": page, "status": "publish"}
-        response = requests.get(url, params=params, auth=auth)
-
-        if response.status_code != 200:
-            if page == 1:
-                print(f"エラー: 記事の取得に失敗しました (HTTP {response.status_code})")
-                print(f"レスポンス: {response.text[:200]}")
-                sys.exit(1)
-            break
-
-        posts = response.json()
-        if not posts:
-            break
-
-        all_posts.extend(posts)
-        total_pages = int(response.headers.get("X-WP-TotalPages", 1))
-        if page >= total_pages:
-            break
-        page += 1
+    try:
+        all_posts = wp_client.get_all_posts(config, {"status": "publish"}, fields="analysis")
+    except wp_client.WordPressAPIError as e:
+        print(f"エラー: 記事の取得に失敗しました (HTTP {e.status_code})")
+        print(f"レスポンス: {e.text[:200]}")
+        sys.exit(1)
 
     print(f"取得完了: {len(all_posts)}記事\n")
     return all_posts
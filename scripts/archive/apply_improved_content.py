@@ -11,13 +11,17 @@ posts_improved/内の改善済みHTMLファイルをWordPressに反映します
 """
 
 import os
+import sys
 import glob
 import json
-import requests
 import argparse
 from datetime import datetime
 from dotenv import load_dotenv
 
+# 共通クライアント（scripts/active/wp_client.py）を読み込む
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "active"))
+import wp_client  # noqa: E402
+
 # .envファイルから環境変数を読み込む
 load_dotenv()
 
@@ -62,10 +66,7 @@ def get_improved_posts():
 
 def get_current_post(post_id, config):
     """現在の記事内容を取得"""
-    url = f"{config['WORDPRESS_URL']}/wp-json/wp/v2/posts/{post_id}"
-    auth = (config["WORDPRESS_USERNAME"], config["WORDPRESS_APPLICATION_PASSWORD"])
-
-    response = requests.get(url, auth=auth)
+    response = wp_client.wp_get(config, f"wp/v2/posts/{post_id}")
 
     if response.status_code == 200:
         post = response.json()
@@ -86,12 +87,9 @@ def update_post_content(post_id, new_content, config, dry_run=False):
         print(f"   [DRY RUN] 記事ID {post_id} の更新をスキップ")
         return True
 
-    url = f"{config['WORDPRESS_URL']}/wp-json/wp/v2/posts/{post_id}"
-    auth = (config["WORDPRESS_USERNAME"], config["WORDPRESS_APPLICATION_PASSWORD"])
-
     payload = {"content": new_content}
 
-    response = requests.post(url, json=payload, auth=auth)
+    response = wp_client.wp_post(config, f"wp/v2/posts/{post_id}", payload)
 
     if response.status_code == 200:
         return True
@@ -9,13 +9,17 @@ backup_posts.py - WordPress記事の完全バックアップツール
 """
 
 import os
+import sys
 import json
-import requests
 from datetime import datetime
 from dotenv import load_dotenv
 from bs4 import BeautifulSoup
 import re
 
+# 共通クライアント（scripts/active/wp_client.py）を読み込む
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "active"))
+import wp_client  # noqa: E402
+
 # .envファイルから環境変数を読み込む
 load_dotenv()
 
@@ -37,43 +41,22 @@ def load_config():
 
 def get_all_posts(config):
     """WordPress REST APIから全記事を取得"""
-    url = f"{config['WORDPRESS_URL']}/wp-json/wp/v2/posts"
-    auth = (config["WORDPRESS_USERNAME"], config["WORDPRESS_APPLICATION_PASSWORD"])
-
     all_posts = []
-    page = 1
 
     print("📥 WordPress記事を取得中...")
 
-    while True:
-        params = {
-            "per_page": 100,
-            "page": page,
-            "status": "publish",
-            "_embed": True  # カテゴリ・タグ・アイキャッチ画像も取得
-        }
-
-        response = requests.get(url, params=params, auth=auth)
-
-        if response.status_code != 200:
-            print(f"❌ エラー: {response.status_code}")
-            print(response.text)
-            break
-
-        posts = response.json()
-
-        if not posts:
-            break
-
-        all_posts.extend(posts)
-
-        total_pages = int(response.headers.get("X-WP-TotalPages", 1))
-        print(f"   ページ {page}/{total_pages} 取得完了 ({len(posts)}記事)")
-
-        if page >= total_pages:
-            break
+    params = {
+        "status": "publish",
+        "_embed": True  # カテゴリ・タグ・アイキャッチ画像も取得
+    }
 
-        page += 1
+    try:
+        for page, total_pages, posts in wp_client.iter_pages(config, "wp/v2/posts", params):
+            all_posts.extend(posts)
+            print(f"   ページ {page}/{total_pages} 取得完了 ({len(posts)}記事)")
+    except wp_client.WordPressAPIError as e:
+        print(f"❌ エラー: {e.status_code}")
+        print(e.text)
 
     print(f"✅ 合計 {len(all_posts)} 記事を取得しました")
     return all_posts
@@ -81,12 +64,9 @@ def get_all_posts(config):
 
 def get_meta_description(post_id, config):
     """AIOSEO APIからメタディスクリプションを取得"""
-    url = f"{config['WORDPRESS_URL']}/wp-json/aioseo/v1/post"
-    auth = (config["WORDPRESS_USERNAME"], config["WORDPRESS_APPLICATION_PASSWORD"])
-
     try:
         payload = {"id": post_id}
-        response = requests.post(url, json=payload, auth=auth, timeout=10)
+        response = wp_client.wp_post(config, "aioseo/v1/post", payload, timeout=10, idempotent=True)
 
         if response.status_code == 200:
             result = response.json()
@@ -7,9 +7,12 @@ import os
 import sys
 import csv
 
-import requests
 from dotenv import load_dotenv
 
+# 共通クライアント（scripts/active/wp_client.py）を読み込む
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "active"))
+import wp_client  # noqa: E402
+
 
 def load_config():
     """環境変数から設定を読み込む"""
@@ -31,22 +34,18 @@ def load_config():
     return config
 
 
-def unpublish_post(post_id, config, dry_run=False):
-    """記事を下書きに戻す"""
-    if dry_run:
-        return True
-
-    url = f"{config['WORDPRESS_URL']}/wp-json/wp/v2/posts/{post_id}"
-    auth = (config["WORDPRESS_USERNAME"], config["WORDPRESS_APPLICATION_PASSWORD"])
-
-    data = {"status": "draft"}
-    response = requests.post(url, json=data, auth=auth)
+def unpublish_posts(post_ids, config):
+    """記事をまとめて下書きに戻す（batch/v1 でサーバーの上限件数ずつ送信）
 
-    if response.status_code != 200:
-        print(f"  ❌ 失敗 (HTTP {response.status_code}): {response.text[:100]}")
-        return False
-
-    return True
+    Returns:
+        {記事ID: (成功したか, エラーメッセージ)}
+    """
+    writes = [("wp/v2/posts", post_id, {"status": "draft"}) for post_id in post_ids]
+    results = wp_client.batch_write(config, writes)
+    return {
+        post_id: (ok, "" if ok else detail)
+        for (_, post_id), (ok, detail) in results.items()
+    }
 
 
 def main():
@@ -125,17 +124,20 @@ def main():
 
         print("\n処理を開始します...\n")
 
+        results = unpublish_posts([post_id for post_id, _, _, _ in target_posts], config)
+
         success_count = 0
         fail_count = 0
 
         for i, (post_id, title, word_count, score) in enumerate(target_posts, 1):
-            print(f"[{i}/{len(target_posts)}] {title[:50]}... ", end="", flush=True)
+            print(f"[{i}/{len(target_posts)}] {title[:50]}... ", end="")
 
-            if unpublish_post(post_id, config):
+            ok, error = results[post_id]
+            if ok:
                 print("✅ 完了")
                 success_count += 1
             else:
-                print("❌ 失敗")
+                print(f"❌ 失敗 ({error[:100]})")
                 fail_count += 1
 
         # サマリー
@@ -6,9 +6,12 @@ WordPress REST APIを使用して固定ページのHTML内容を取得する
 
 import os
 import sys
-import requests
 from dotenv import load_dotenv
 
+# 共通クライアント（scripts/active/wp_client.py）を読み込む
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "active"))
+import wp_client  # noqa: E402
+
 def load_config():
     """環境変数から設定を読み込む"""
     load_dotenv()
@@ -30,15 +33,12 @@ def load_config():
 
 def get_page_by_slug(slug, config):
     """固定ページをスラッグで取得"""
-    url = f"{config['WORDPRESS_URL']}/wp-json/wp/v2/pages"
-    auth = (config["WORDPRESS_USERNAME"], config["WORDPRESS_APPLICATION_PASSWORD"])
-
     params = {
         "slug": slug,
         "per_page": 1
     }
 
-    response = requests.get(url, params=params, auth=auth)
+    response = wp_client.wp_get(config, "wp/v2/pages", params=params)
 
     if response.status_code == 200:
         pages = response.json()
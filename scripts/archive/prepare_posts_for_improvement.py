@@ -7,18 +7,22 @@ prepare_posts_for_improvement.py - 記事改善の準備スクリプト
 """
 
 import os
-import json
+import sys
 import glob
-from bs4 import BeautifulSoup
 import re
 
+# 共通モジュール（scripts/active/json_stream.py）を読み込む
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "active"))
+import json_stream  # noqa: E402
+import html_backend  # noqa: E402
+
 
 def html_to_markdown(html):
     """簡易的なHTML→Markdown変換"""
     if not html:
         return ''
 
-    soup = BeautifulSoup(html, 'html.parser')
+    soup = html_backend.parse_fragment(html)
 
     # 改行を保持するため、各要素を処理
     markdown = []
@@ -152,23 +156,20 @@ def prepare_posts():
     backup_file = find_latest_backup()
     print(f"📂 バックアップファイル: {backup_file}")
 
-    # JSONを読み込む
-    with open(backup_file, 'r', encoding='utf-8') as f:
-        backup_data = json.load(f)
-
-    posts = backup_data['posts']
-    print(f"📝 記事数: {len(posts)}")
-    print()
+    # JSONの posts 配列を1件ずつ読み込む（ファイル全体をメモリに載せない）
+    posts = json_stream.iter_file(backup_file, key='posts')
 
     # 各記事をMarkdown形式に変換
     print("📄 記事をMarkdown形式に変換中...")
     print()
 
+    post_count = 0
     for idx, post in enumerate(posts, 1):
         post_id = post['id']
         title = post['title']
+        post_count = idx
 
-        print(f"   [{idx}/{len(posts)}] 記事ID {post_id}: {title[:50]}...")
+        print(f"   [{idx}] 記事ID {post_id}: {title[:50]}...")
 
         # カテゴリとタグの文字列化
         categories_str = ', '.join([cat['name'] for cat in post['categories']])
@@ -207,6 +208,7 @@ def prepare_posts():
             f.write(markdown_content)
 
     print()
+    print(f"📝 記事数: {post_count}")
     print("✅ すべての記事をMarkdown形式に変換しました")
     print(f"   保存先: posts_to_improve/")
     print()
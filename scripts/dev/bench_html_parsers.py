@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+HTML解析バックエンドのベンチマーク
+
+archive/posts_improved/*.html の記事を各バックエンド（html.parser / lxml / selectolax）で
+処理して時間を比較し、結果が html.parser と同じになるかを確認する。
+
+計測する処理:
+    parse      断片の解析と文字列化（parse_fragment → str）
+    improve    apply_post_improvements の記事ドキュメント処理
+               （メタディスクリプション生成・まとめ・関連記事・画像の挿入）
+    markdown   prepare_posts_for_improvement の HTML→Markdown 変換
+    query      improve_post_structure の読み取り専用の数え上げ（見出し・画像・リンク）
+
+使用方法:
+    python scripts/dev/bench_html_parsers.py
+    python scripts/dev/bench_html_parsers.py --repeat 20 --files "backups/*.html"
+
+結果が1件でも html.parser と異なれば終了コード1を返す。
+"""
+
+import os
+import sys
+import glob
+import time
+import argparse
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+sys.path.insert(0, os.path.join(ROOT, "scripts", "active"))
+sys.path.insert(0, os.path.join(ROOT, "scripts", "archive"))
+import html_backend  # noqa: E402
+import apply_post_improvements  # noqa: E402
+import prepare_posts_for_improvement  # noqa: E402
+
+DEFAULT_FILES = os.path.join(ROOT, "archive", "posts_improved", "*.html")
+REFERENCE = "html.parser"
+
+LINKS = [
+    {"target_url": f"https://example.com/?p={i}", "target_title": f"関連記事 {i}", "similarity": 1.0 / i}
+    for i in range(1, 6)
+]
+IMAGES = [
+    {"url": f"https://example.com/image-{i}.jpg", "alt": f"画像 {i}", "photographer": "Example"}
+    for i in range(1, 4)
+]
+
+
+def run_parse(html, parser):
+    return str(html_backend.parse_fragment(html, parser))
+
+
+def run_improve(html, parser):
+    """apply_post_improvements の各ステップを1記事分実行して本文とメタディスクリプションを返す"""
+    os.environ["HTML_PARSER"] = parser
+    post = {"id": 1, "title": {"rendered": "ベンチマーク記事"}, "content": {"rendered": html}}
+    doc = apply_post_improvements.PostDocument(post)
+    meta = apply_post_improvements.generate_meta_description(doc)
+    apply_post_improvements.add_summary_to_post(doc)
+    apply_post_improvements.insert_internal_links(doc, LINKS, 5)
+    apply_post_improvements.insert_images_into_content(doc, IMAGES, "ベンチマーク記事")
+    return meta, doc.html()
+
+
+def run_markdown(html, parser):
+    os.environ["HTML_PARSER"] = parser
+    return prepare_posts_for_improvement.html_to_markdown(html)
+
+
+def run_query(html, parser):
+    doc = html_backend.QueryDocument(html, parser)
+    headings = [node.text.strip() for node in doc.select("h2, h3")]
+    images = len(doc.select("img"))
+    links = [node.attrs["href"] for node in doc.select("a[href]")]
+    return headings, images, links
+
+
+TASKS = {
+    "parse": run_parse,
+    "improve": run_improve,
+    "markdown": run_markdown,
+    "query": run_query,
+}
+
+
+def backends_for(task):
+    """処理ごとに比較するバックエンド（selectolax は読み取り専用の query のみ）"""
+    backends = html_backend.available_parsers(query=(task == "query"))
+    return sorted(backends, key=lambda name: name != REFERENCE)
+
+
+def bench(task, func, documents, repeat):
+    """1つの処理を各バックエンドで計測する
+
+    Returns:
+        [(バックエンド, 1記事あたりのミリ秒, html.parserと異なる記事のリスト)]
+    """
+    results = []
+    expected = None
+    for backend in backends_for(task):
+        outputs = [func(html, backend) for _, html in documents]
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for _, html in documents:
+                func(html, backend)
+        elapsed = time.perf_counter() - start
+        per_doc = elapsed / (repeat * len(documents)) * 1000
+
+        if expected is None:
+            expected = outputs
+        mismatches = [name for (name, _), a, b in zip(documents, outputs, expected) if a != b]
+        results.append((backend, per_doc, mismatches))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTML解析バックエンドのベンチマーク")
+    parser.add_argument("--files", default=DEFAULT_FILES, help="対象のHTMLファイル（glob）")
+    parser.add_argument("--repeat", type=int, default=5, help="計測の繰り返し回数")
+    parser.add_argument("--task", choices=list(TASKS), action="append", dest="tasks",
+                        help="計測する処理（複数指定可、既定: すべて）")
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(args.files))
+    if not paths:
+        print(f"エラー: {args.files} に一致するファイルがありません。")
+        sys.exit(1)
+    documents = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            documents.append((os.path.basename(path), f.read()))
+
+    total_bytes = sum(len(html.encode("utf-8")) for _, html in documents)
+    print(f"対象: {len(documents)}記事（{total_bytes / 1024:.0f} KB）, 繰り返し {args.repeat}回")
+    if not html_backend.HAS_SELECTOLAX:
+        print("（selectolax は未インストールのため計測しません）")
+
+    saved_parser = os.environ.get("HTML_PARSER")
+    has_mismatch = False
+    try:
+        for task in args.tasks or list(TASKS):
+            print(f"\n[{task}]")
+            results = bench(task, TASKS[task], documents, args.repeat)
+            reference_ms = results[0][1]
+            for backend, per_doc, mismatches in results:
+                speedup = reference_ms / per_doc if per_doc else 0
+                status = "✅ 同一" if not mismatches else f"❌ 不一致 {len(mismatches)}件"
+                print(f"  {backend:<12} {per_doc:8.2f} ms/記事  x{speedup:4.1f}  {status}")
+                for name in mismatches[:5]:
+                    print(f"      - {name}")
+                has_mismatch = has_mismatch or bool(mismatches)
+    finally:
+        if saved_parser is None:
+            os.environ.pop("HTML_PARSER", None)
+        else:
+            os.environ["HTML_PARSER"] = saved_parser
+
+    sys.exit(1 if has_mismatch else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,865 @@
+#!/usr/bin/env python3
+"""
+ローカル用 WordPress / Unsplash スタンドインサーバー
+
+本番サイトにアクセスせずに各スクリプトの動作確認・スループット計測を行うための
+偽サーバー。標準ライブラリのみで動作する（Pillow があれば実寸の画像を返す）。
+
+対応エンドポイント:
+    GET  /wp-json/wp/v2/posts            一覧（per_page, page, status, include, modified_after,
+                                         _fields, context）と X-WP-Total / X-WP-TotalPages
+    GET  /wp-json/wp/v2/posts/<id>       1件取得
+    POST /wp-json/wp/v2/posts/<id>       更新（content, title, status, featured_media）
+    GET/POST /wp-json/wp/v2/pages[/<id>] 固定ページ（slug 検索対応）
+    POST /wp-json/wp/v2/media            メディアアップロード（multipart / 生データ、chunked 転送も可。
+                                         --reject-chunked で chunked 転送を 411 で拒否）
+    GET/POST /wp-json/wp/v2/media/<id>   メディア取得・更新（alt_text, caption, title）
+    DELETE /wp-json/wp/v2/media/<id>     メディア削除（force=true のみ）
+    POST /wp-json/aioseo/v1/post         メタディスクリプションの取得・設定
+    OPTIONS/POST /wp-json/batch/v1       一括書き込み（WordPressコアと同じく wp/v2/media は含められない）
+    GET  /sitemap.xml, /wp-sitemap.xml, /sitemap_index.xml, /robots.txt, 記事・固定ページのURL
+    GET  /unsplash/search/photos         Unsplash 検索（X-Ratelimit-* ヘッダー付き）
+    GET  /unsplash/photos/<id>/download  Unsplash ダウンロードトリガー
+    GET  /unsplash/images/<id>.jpg       画像本体
+    GET  /__stats                        エンドポイント別のリクエスト数・転送量
+
+使用方法:
+    # 最新のバックアップ（backups/posts_*.json）から記事を読み込んで起動
+    python scripts/dev/fake_wordpress.py --port 8080
+
+    # 合成記事500件、応答遅延50ms、5%の確率で 502/503/504 を返す
+    python scripts/dev/fake_wordpress.py --synthetic 500 --latency 0.05 --error-rate 0.05
+
+    # ブロックエディタ形式（<!-- wp:... -->）の合成記事
+    python scripts/dev/fake_wordpress.py --synthetic 50 --blocks
+
+    # スクリプトは別の作業ディレクトリで実行する（cache/ や reports/ が本番用と混ざらないように）
+    export WORDPRESS_URL=http://127.0.0.1:8080
+    export WORDPRESS_USERNAME=dev WORDPRESS_APPLICATION_PASSWORD=dev
+    export UNSPLASH_ACCESS_KEY=dev UNSPLASH_API_URL=http://127.0.0.1:8080/unsplash
+    python /path/to/scripts/active/apply_post_improvements.py --mode all
+"""
+
+import io
+import os
+import re
+import sys
+import json
+import glob
+import time
+import base64
+import random
+import hashlib
+import argparse
+import threading
+from datetime import datetime, timedelta, timezone
+from email import policy
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, unquote, quote
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+DEFAULT_PORT = 8080
+BATCH_MAX_ITEMS = 25
+UNSPLASH_LIMIT = 50  # 1時間あたり
+ERROR_STATUSES = [502, 503, 504]
+
+# Pillow がない場合に返す 8x8 のJPEG（COMセグメントで指定サイズまで水増しする）
+TINY_JPEG = base64.b64decode(
+    "/9j/4AAQSkZJRgABAQAAAQABAAD/2wBDAAYEBQYFBAYGBQYHBwYIChAKCgkJChQODwwQFxQYGBcUFhYaHSUfGhsjHBYW"
+    "ICwgIyYnKSopGR8tMC0oMCUoKSj/2wBDAQcHBwoIChMKChMoGhYaKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCgo"
+    "KCgoKCgoKCgoKCgoKCgoKCgoKCj/wAARCAAIAAgDASIAAhEBAxEB/8QAHwAAAQUBAQEBAQEAAAAAAAAAAAECAwQFBgcI"
+    "CQoL/8QAtRAAAgEDAwIEAwUFBAQAAAF9AQIDAAQRBRIhMUEGE1FhByJxFDKBkaEII0KxwRVS0fAkM2JyggkKFhcYGRol"
+    "JicoKSo0NTY3ODk6Q0RFRkdISUpTVFVWV1hZWmNkZWZnaGlqc3R1dnd4eXqDhIWGh4iJipKTlJWWl5iZmqKjpKWmp6ip"
+    "qrKztLW2t7i5usLDxMXGx8jJytLT1NXW19jZ2uHi4+Tl5ufo6erx8vP09fb3+Pn6/8QAHwEAAwEBAQEBAQEBAQAAAAAA"
+    "AAECAwQFBgcICQoL/8QAtREAAgECBAQDBAcFBAQAAQJ3AAECAxEEBSExBhJBUQdhcRMiMoEIFEKRobHBCSMzUvAVYnLR"
+    "ChYkNOEl8RcYGRomJygpKjU2Nzg5OkNERUZHSElKU1RVVldYWVpjZGVmZ2hpanN0dXZ3eHl6goOEhYaHiImKkpOUlZaX"
+    "mJmaoqOkpaanqKmqsrO0tba3uLm6wsPExcbHyMnK0tPU1dbX2Nna4uPk5ebn6Onq8vP09fb3+Pn6/9oADAMBAAIRAxEA"
+    "PwDPooor3Tyj/9k="
+)
+
+# 合成記事用の語彙
+SYNTHETIC_TOPICS = [
+    "ChatGPT", "生成AI", "プログラミング", "セキュリティ", "クラウド", "データ", "DX",
+    "アプリ", "自動化", "効率化", "リモートワーク", "副業", "SEO", "機械学習",
+]
+SYNTHETIC_SUFFIXES = ["入門", "の使い方", "徹底解説", "比較", "おすすめ5選", "の始め方", "最新動向"]
+SYNTHETIC_SENTENCES = [
+    "{topic}は近年急速に普及しており、多くの企業で導入が進んでいます。",
+    "まずは基本的な仕組みを理解することが重要です。",
+    "具体的な手順を順番に見ていきましょう。",
+    "導入にあたってはコストと効果のバランスを考える必要があります。",
+    "実際の利用例を見ると、業務時間が大幅に短縮されたという報告もあります。",
+    "一方で、注意すべき点もいくつか存在します。",
+    "初心者の方でも無料で試せるサービスが増えています。",
+]
+
+
+def now_local():
+    return datetime.now().replace(microsecond=0)
+
+
+def render_content(raw):
+    """保存形式の本文（raw）から表示用の本文（rendered）を作る
+
+    WordPress と同じく、ブロックの区切りコメントを取り除き、img に decoding="async" を付ける。
+    rendered を書き戻すと raw がこの分だけ肥大化する様子を再現する。
+    """
+    rendered = re.sub(r"<!-- /?wp:[^>]*-->\n?", "", raw)
+    return re.sub(r"<img (?![^>]*decoding=)", '<img decoding="async" ', rendered)
+
+
+def isoformat(dt):
+    return dt.strftime("%Y-%m-%dT%H:%M:%S")
+
+
+# =============================================================================
+# データ
+# =============================================================================
+
+class SiteData:
+    """偽サイトの記事・固定ページ・メディア・メタディスクリプション"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.posts = {}
+        self.pages = {}
+        self.media = {}
+        self.media_files = {}
+        self.meta = {}
+        self.next_id = 1
+        self.lock = threading.Lock()
+
+    def new_id(self):
+        self.next_id += 1
+        return self.next_id
+
+    def relink(self, link):
+        """本番URLのパスをこのサーバーのURLに付け替える"""
+        return f"{self.base_url}{urlsplit(link).path}"
+
+    def load_backup(self, path):
+        """backups/posts_*.json（REST API形式の記事配列）から記事を読み込む"""
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            raise ValueError(f"{path} はREST API形式の記事配列ではありません")
+
+        for post in data:
+            post = dict(post)
+            content = dict(post.get("content") or {})
+            # バックアップは rendered のみのため、描画で付く属性を除いて raw とみなす
+            content.setdefault("raw", content.get("rendered", "").replace(' decoding="async"', ""))
+            content["rendered"] = render_content(content["raw"])
+            post["content"] = content
+            post["link"] = self.relink(post.get("link") or f"/?p={post['id']}")
+            post.setdefault("status", "publish")
+            post.setdefault("modified_gmt", post.get("modified"))
+            if post.get("meta_description"):
+                self.meta[post["id"]] = post["meta_description"]
+            self.posts[post["id"]] = post
+        self.next_id = max([self.next_id, *self.posts])
+
+    def generate_posts(self, count, paragraphs=12, seed=0, blocks=False):
+        """合成記事を生成する（blocks=True ならブロックエディタ形式の本文）"""
+        rng = random.Random(seed)
+        start = now_local() - timedelta(days=count)
+        for i in range(count):
+            post_id = self.new_id()
+            topic = rng.choice(SYNTHETIC_TOPICS)
+            title = f"{topic}{rng.choice(SYNTHETIC_SUFFIXES)}"
+            parts = []
+            for section in range(1, paragraphs // 3 + 1):
+                heading = f"<h2>{topic}のポイント{section}</h2>"
+                parts.append(f"<!-- wp:heading -->\n{heading}\n<!-- /wp:heading -->" if blocks else heading)
+                for _ in range(3):
+                    sentences = [rng.choice(SYNTHETIC_SENTENCES).format(topic=topic) for _ in range(4)]
+                    paragraph = f"<p>{''.join(sentences)}</p>"
+                    parts.append(f"<!-- wp:paragraph -->\n{paragraph}\n<!-- /wp:paragraph -->"
+                                 if blocks else paragraph)
+            content = ("\n\n" if blocks else "\n").join(parts)
+            date = start + timedelta(days=i, minutes=rng.randint(0, 600))
+            slug = f"synthetic-{post_id}"
+            self.posts[post_id] = {
+                "id": post_id,
+                "date": isoformat(date),
+                "date_gmt": isoformat(date - timedelta(hours=9)),
+                "modified": isoformat(date),
+                "modified_gmt": isoformat(date - timedelta(hours=9)),
+                "slug": slug,
+                "status": "publish",
+                "link": f"{self.base_url}/{date:%Y/%m/%d}/{slug}/",
+                "title": {"rendered": title},
+                "content": {"rendered": render_content(content), "raw": content, "protected": False},
+                "excerpt": {"rendered": f"<p>{topic}について解説します。</p>"},
+                "categories": [rng.randint(1, 5)],
+                "tags": rng.sample(range(10, 40), 3),
+                "featured_media": 0,
+            }
+
+    def generate_pages(self):
+        """update_pages.py / final_check.py が参照する固定ページを用意する"""
+        pages = [
+            (2, "profile", "プロフィール"),
+            (3, "privacy-policy", "プライバシーポリシー"),
+            (199, "お問い合わせ", "お問い合わせ"),
+        ]
+        for page_id, slug, title in pages:
+            content = f"<h2>{title}</h2>\n<p>{title}のページです。</p>"
+            self.pages[page_id] = {
+                "id": page_id,
+                "date": isoformat(now_local()),
+                "modified": isoformat(now_local()),
+                "modified_gmt": isoformat(now_local() - timedelta(hours=9)),
+                "slug": quote(slug).lower(),
+                "status": "publish",
+                "link": f"{self.base_url}/{quote(slug).lower()}/",
+                "title": {"rendered": title},
+                "content": {"rendered": content, "raw": content, "protected": False},
+                "featured_media": 0,
+            }
+        self.next_id = max([self.next_id, *self.pages])
+
+
+# =============================================================================
+# REST API（batch/v1 からも呼ぶため HTTP から独立させる）
+# =============================================================================
+
+class APIError(Exception):
+    def __init__(self, status, code, message):
+        super().__init__(message)
+        self.status = status
+        self.code = code
+        self.message = message
+
+    def body(self):
+        return {"code": self.code, "message": self.message, "data": {"status": self.status}}
+
+
+def project(obj, fields):
+    """_fields でトップレベルのフィールドを絞り込む"""
+    if not fields:
+        return obj
+    names = {name.split(".")[0] for name in fields.split(",") if name}
+    return {key: value for key, value in obj.items() if key in names}
+
+
+def present(obj, query, authed):
+    """レスポンス用に context と _fields を反映する"""
+    obj = json.loads(json.dumps(obj))
+    if query.get("context") != "edit":
+        obj.get("content", {}).pop("raw", None)
+    return project(obj, query.get("_fields"))
+
+
+def apply_update(obj, body):
+    """記事・固定ページの更新内容を反映する"""
+    for key in ("content", "title", "excerpt"):
+        if key in body:
+            value = body[key]
+            raw = value.get("raw", "") if isinstance(value, dict) else value
+            obj[key] = {"rendered": render_content(raw), "raw": raw} if key == "content" else {"rendered": raw}
+    for key in ("status", "featured_media", "slug", "categories", "tags"):
+        if key in body:
+            obj[key] = body[key]
+    modified = now_local()
+    obj["modified"] = isoformat(modified)
+    obj["modified_gmt"] = isoformat(modified.astimezone(timezone.utc))
+
+
+def list_collection(items, query, authed):
+    """コレクションの一覧（フィルタ・並び替え・ページネーション）"""
+    if query.get("context") == "edit" and not authed:
+        raise APIError(401, "rest_forbidden_context", "この投稿タイプの投稿を編集する権限がありません。")
+
+    per_page = int(query.get("per_page", 10))
+    page = int(query.get("page", 1))
+    if not 1 <= per_page <= 100:
+        raise APIError(400, "rest_invalid_param", "無効なパラメーター: per_page")
+
+    status = query.get("status", "publish")
+    selected = [obj for obj in items if obj.get("status") == status or status == "any"]
+
+    if query.get("include"):
+        ids = {int(i) for i in query["include"].split(",") if i}
+        selected = [obj for obj in selected if obj["id"] in ids]
+    if query.get("slug"):
+        slugs = {quote(unquote(s)).lower() for s in query["slug"].split(",")}
+        selected = [obj for obj in selected if obj.get("slug") in slugs]
+    if query.get("modified_after"):
+        after = query["modified_after"][:19]
+        selected = [obj for obj in selected if obj.get("modified", "") > after]
+
+    selected.sort(key=lambda obj: (obj.get("date", ""), obj["id"]), reverse=True)
+
+    total = len(selected)
+    total_pages = (total + per_page - 1) // per_page
+    if total and page > total_pages:
+        raise APIError(400, "rest_post_invalid_page_number",
+                       "要求されたページ番号が総ページ数より大きくなっています。")
+
+    chunk = selected[(page - 1) * per_page:page * per_page]
+    headers = {"X-WP-Total": str(total), "X-WP-TotalPages": str(total_pages)}
+    return 200, [present(obj, query, authed) for obj in chunk], headers
+
+
+def handle_api(site, method, route, query, body, authed, upload=None):
+    """REST APIのルーティング
+
+    Returns:
+        (status, 本文のオブジェクト, 追加ヘッダー)
+    """
+    route = "/" + route.strip("/")
+    writes = method in ("POST", "PUT", "PATCH", "DELETE")
+    if writes and not authed:
+        raise APIError(401, "rest_cannot_edit", "この操作を行う権限がありません。")
+
+    match = re.fullmatch(r"/wp/v2/(posts|pages)(?:/(\d+))?", route)
+    if match:
+        collection = site.posts if match.group(1) == "posts" else site.pages
+        if match.group(2) is None:
+            if method != "GET":
+                raise APIError(405, "rest_no_route", "メソッドが許可されていません。")
+            with site.lock:
+                items = list(collection.values())
+            return list_collection(items, query, authed)
+
+        obj_id = int(match.group(2))
+        with site.lock:
+            obj = collection.get(obj_id)
+            if obj is None:
+                raise APIError(404, "rest_post_invalid_id", "無効な投稿 ID。")
+            if writes:
+                apply_update(obj, body or {})
+                query = dict(query, context="edit")
+            return 200, present(obj, query, authed), {}
+
+    match = re.fullmatch(r"/wp/v2/media(?:/(\d+))?", route)
+    if match:
+        if match.group(1) is None:
+            if method != "POST":
+                raise APIError(405, "rest_no_route", "メソッドが許可されていません。")
+            if not upload or not upload.get("data"):
+                raise APIError(400, "rest_upload_no_data", "データが与えられていません。")
+            return 201, create_media(site, upload), {}
+
+        media_id = int(match.group(1))
+        with site.lock:
+            media = site.media.get(media_id)
+            if media is None:
+                raise APIError(404, "rest_post_invalid_id", "無効な投稿 ID。")
+            if method == "DELETE":
+                if query.get("force") not in ("1", "true"):
+                    raise APIError(501, "rest_trash_not_supported", "メディアはゴミ箱に移動できません。force を指定してください。")
+                del site.media[media_id]
+                site.media_files.pop(unquote(media["source_url"].rsplit("/", 1)[-1]), None)
+                return 200, {"deleted": True, "previous": media}, {}
+            if writes:
+                update_media(media, body or {})
+            return 200, project(media, query.get("_fields")), {}
+
+    if route == "/aioseo/v1/post" and method == "POST":
+        post_id = int((body or {}).get("id", 0))
+        with site.lock:
+            if post_id not in site.posts:
+                return 200, {"success": False, "message": "Post not found"}, {}
+            if "description" in body:
+                site.meta[post_id] = body["description"]
+            return 200, {"success": True, "post": {"id": post_id, "description": site.meta.get(post_id, "")}}, {}
+
+    if route == "/batch/v1":
+        if method == "OPTIONS":
+            schema = {"endpoints": [{"methods": ["POST"], "args": {
+                "validation": {"type": "string", "enum": ["require-all-validate", "normal"]},
+                "requests": {"type": "array", "maxItems": BATCH_MAX_ITEMS},
+            }}]}
+            return 200, schema, {}
+        if method == "POST":
+            return handle_batch(site, body or {}, authed)
+
+    raise APIError(404, "rest_no_route", "URL とリクエストメソッドに一致するルートが見つかりません。")
+
+
+def handle_batch(site, body, authed):
+    requests_list = body.get("requests", [])
+    if len(requests_list) > BATCH_MAX_ITEMS:
+        raise APIError(400, "rest_invalid_param", f"requests は最大 {BATCH_MAX_ITEMS} 件です。")
+
+    responses = []
+    for item in requests_list:
+        split = urlsplit(item.get("path", ""))
+        query = {k: v[-1] for k, v in parse_qs(split.query).items()}
+        if re.match(r"/wp/v2/media(/|$)", split.path):
+            # コアは添付ファイルのコントローラーを allow_batch なしで登録している
+            error = APIError(400, "rest_batch_not_allowed", "The requested route does not support batch requests.")
+            responses.append({"body": error.body(), "status": 400, "headers": {}})
+            continue
+        try:
+            status, obj, headers = handle_api(
+                site, item.get("method", "POST").upper(), split.path, query, item.get("body"), authed)
+        except APIError as e:
+            status, obj, headers = e.status, e.body(), {}
+        responses.append({"body": obj, "status": status, "headers": headers})
+    return 207, {"responses": responses}, {}
+
+
+def create_media(site, upload):
+    data = upload["data"]
+    filename = upload.get("filename") or "upload.jpg"
+    with site.lock:
+        media_id = site.new_id()
+        name = f"{media_id}-{filename}"
+        site.media_files[name] = data
+        media = {
+            "id": media_id,
+            "date": isoformat(now_local()),
+            "slug": os.path.splitext(filename)[0],
+            "title": {"rendered": upload.get("title") or os.path.splitext(filename)[0]},
+            "caption": {"rendered": upload.get("caption") or ""},
+            "alt_text": upload.get("alt_text") or "",
+            "mime_type": upload.get("content_type") or "image/jpeg",
+            "media_details": {"filesize": len(data), "sha256": hashlib.sha256(data).hexdigest()},
+            "source_url": f"{site.base_url}/wp-content/uploads/{quote(name)}",
+        }
+        site.media[media_id] = media
+        return media
+
+
+def update_media(media, body):
+    if "alt_text" in body:
+        media["alt_text"] = body["alt_text"]
+    for key in ("title", "caption"):
+        if key in body:
+            value = body[key]
+            media[key] = {"rendered": value.get("raw", "") if isinstance(value, dict) else value}
+
+
+# =============================================================================
+# Unsplash
+# =============================================================================
+
+class Unsplash:
+    """Unsplash API の偽実装（1時間ごとにリセットされるレート制限付き）"""
+
+    def __init__(self, base_url, limit=UNSPLASH_LIMIT, image_size=(1080, 720), image_bytes=150_000):
+        self.base_url = base_url
+        self.limit = limit
+        self.remaining = limit
+        self.window_start = time.monotonic()
+        self.image_size = image_size
+        self.image_bytes = image_bytes
+        self.images = {}
+        self.lock = threading.Lock()
+
+    def consume(self):
+        """レート制限の残量を1つ消費する。超過していればNone"""
+        with self.lock:
+            if time.monotonic() - self.window_start >= 3600:
+                self.window_start = time.monotonic()
+                self.remaining = self.limit
+            if self.remaining <= 0:
+                return None
+            self.remaining -= 1
+            return self.remaining
+
+    def rate_headers(self, remaining):
+        return {"X-Ratelimit-Limit": str(self.limit), "X-Ratelimit-Remaining": str(remaining)}
+
+    def search(self, query, per_page):
+        digest = hashlib.md5(query.encode("utf-8")).hexdigest()[:8]
+        results = []
+        for i in range(min(per_page, 30)):
+            photo_id = f"{digest}{i:02d}"
+            results.append({
+                "id": photo_id,
+                "description": f"{query} photo {i + 1}",
+                "alt_description": f"{query} image",
+                "urls": {"regular": f"{self.base_url}/unsplash/images/{photo_id}.jpg"},
+                "links": {"download_location": f"{self.base_url}/unsplash/photos/{photo_id}/download"},
+                "user": {"name": f"Photographer {digest[:4]}"},
+            })
+        return {"total": 1000, "total_pages": 1000 // max(per_page, 1), "results": results}
+
+    def image(self, photo_id):
+        """写真IDごとに決まった内容のJPEGを返す"""
+        with self.lock:
+            if photo_id in self.images:
+                return self.images[photo_id]
+
+        seed = int(hashlib.md5(photo_id.encode()).hexdigest()[:8], 16)
+        if Image is not None:
+            rng = random.Random(seed)
+            width, height = self.image_size
+            small = Image.new("RGB", (32, 24))
+            small.putdata([(rng.randrange(256), rng.randrange(256), rng.randrange(256))
+                           for _ in range(32 * 24)])
+            buf = io.BytesIO()
+            small.resize((width, height), Image.BICUBIC).save(buf, "JPEG", quality=95)
+            data = buf.getvalue()
+        else:
+            data = pad_jpeg(TINY_JPEG, self.image_bytes, seed)
+
+        with self.lock:
+            self.images[photo_id] = data
+        return data
+
+
+def pad_jpeg(jpeg, size, seed):
+    """COMセグメントを挿入してJPEGを指定サイズ程度にする"""
+    rng = random.Random(seed)
+    segments = []
+    remaining = max(0, size - len(jpeg))
+    while remaining > 4:
+        length = min(remaining - 2, 65535)
+        segments.append(b"\xff\xfe" + length.to_bytes(2, "big") + rng.randbytes(length - 2))
+        remaining -= length + 2
+    return jpeg[:2] + b"".join(segments) + jpeg[2:]
+
+
+# =============================================================================
+# HTTPサーバー
+# =============================================================================
+
+class Stats:
+    """エンドポイント別のリクエスト数・転送量"""
+
+    def __init__(self):
+        self.counts = {}
+        self.lock = threading.Lock()
+
+    def record(self, label, status, size):
+        with self.lock:
+            entry = self.counts.setdefault(label, {"requests": 0, "errors": 0, "bytes": 0})
+            entry["requests"] += 1
+            entry["bytes"] += size
+            if status >= 400:
+                entry["errors"] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return json.loads(json.dumps(self.counts))
+
+    def format(self):
+        lines = ["エンドポイント別リクエスト数:"]
+        for label, entry in sorted(self.snapshot().items()):
+            lines.append(f"  {label:<28} {entry['requests']:>6}件 (エラー {entry['errors']}件, "
+                         f"{entry['bytes'] / 1024:.1f} KB)")
+        return "\n".join(lines)
+
+
+def endpoint_label(method, path):
+    """統計用に、IDなどを除いたエンドポイント名を作る"""
+    label = re.sub(r"/\d+", "/<id>", path)
+    label = re.sub(r"/unsplash/(photos|images)/[^/]+", r"/unsplash/\1/<id>", label)
+    if path.startswith("/wp-content/uploads/"):
+        label = "/wp-content/uploads/<file>"
+    elif not path.startswith(("/wp-json/", "/unsplash/", "/__")) and path not in SITE_FILES:
+        label = "<page>"
+    return f"{method} {label}"
+
+
+SITE_FILES = ("/robots.txt", "/sitemap.xml", "/wp-sitemap.xml", "/sitemap_index.xml")
+
+
+class Handler(BaseHTTPRequestHandler):
+    server_version = "FakeWordPress/1.0"
+    protocol_version = "HTTP/1.1"
+
+    # ThreadingHTTPServer に設定する属性
+    site = None
+    unsplash = None
+    stats = None
+    options = None
+
+    def log_message(self, format, *args):
+        if self.options.verbose:
+            super().log_message(format, *args)
+
+    # ---- 応答 ----
+
+    def send(self, status, body=b"", headers=None, content_type="application/json; charset=UTF-8"):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        elif isinstance(body, str):
+            body = body.encode("utf-8")
+
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+        self.stats.record(endpoint_label(self.command, urlsplit(self.path).path), status, len(body))
+
+    def send_cached(self, body, content_type):
+        """ETag付きで返し、If-None-Match が一致すれば304を返す"""
+        data = body.encode("utf-8") if isinstance(body, str) else body
+        etag = '"' + hashlib.md5(data).hexdigest() + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send(304, b"", {"ETag": etag}, content_type)
+        else:
+            self.send(200, data, {"ETag": etag}, content_type)
+
+    # ---- リクエスト処理 ----
+
+    def do_GET(self):
+        self.dispatch()
+
+    def do_HEAD(self):
+        self.dispatch()
+
+    def do_POST(self):
+        self.dispatch()
+
+    def do_PUT(self):
+        self.dispatch()
+
+    def do_DELETE(self):
+        self.dispatch()
+
+    def do_OPTIONS(self):
+        self.dispatch()
+
+    def read_body(self):
+        if "chunked" in self.headers.get("Transfer-Encoding", "").lower():
+            # チャンク転送（image_transfer のストリーミングアップロード）
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().split(b";")[0].strip() or b"0", 16)
+                if size == 0:
+                    while self.rfile.readline() not in (b"\r\n", b"\n", b""):
+                        pass  # トレーラー
+                    return b"".join(chunks)
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def inject_fault(self):
+        """設定された遅延とエラーを発生させる。エラーを返した場合はTrue"""
+        options = self.options
+        delay = options.latency + random.uniform(0, options.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        if options.error_rate and random.random() < options.error_rate:
+            status = random.choice(options.error_statuses)
+            headers = {"Retry-After": str(options.retry_after)} if status in (429, 503) else {}
+            self.send(status, {"code": "fake_error", "message": "injected error"}, headers)
+            return True
+        return False
+
+    def dispatch(self):
+        split = urlsplit(self.path)
+        path = unquote(split.path)
+        query = {k: v[-1] for k, v in parse_qs(split.query).items()}
+        raw_body = self.read_body()
+
+        if path == "/__stats":
+            self.send(200, self.stats.snapshot())
+            return
+
+        if self.inject_fault():
+            return
+
+        if (self.options.reject_chunked and path.startswith("/wp-json/wp/v2/media")
+                and "chunked" in self.headers.get("Transfer-Encoding", "").lower()):
+            # Content-Length のないリクエストを受け付けないサーバー（一部のプロキシ・PHP-FPM 構成）
+            self.send(411, {"code": "rest_upload_no_data", "message": "Length Required"})
+            return
+
+        if path.startswith("/wp-json/"):
+            self.handle_rest(path[len("/wp-json"):], query, raw_body)
+        elif path.startswith("/unsplash/"):
+            self.handle_unsplash(path[len("/unsplash"):], query)
+        else:
+            self.handle_site(path)
+
+    def handle_rest(self, route, query, raw_body):
+        authed = self.headers.get("Authorization", "").startswith("Basic ")
+        body = None
+        upload = None
+        content_type = self.headers.get("Content-Type", "")
+
+        if content_type.startswith("multipart/form-data"):
+            upload = parse_multipart(content_type, raw_body)
+        elif content_type.startswith("application/json"):
+            body = json.loads(raw_body or b"{}")
+        elif raw_body and route.rstrip("/") == "/wp/v2/media":
+            disposition = self.headers.get("Content-Disposition", "")
+            match = re.search(r'filename="?([^";]+)"?', disposition)
+            upload = {"data": raw_body, "filename": match.group(1) if match else None,
+                      "content_type": content_type}
+
+        try:
+            status, obj, headers = handle_api(
+                self.site, self.command, route, query, body, authed, upload)
+        except APIError as e:
+            status, obj, headers = e.status, e.body(), {}
+        except (ValueError, KeyError) as e:
+            status, obj, headers = 400, {"code": "rest_invalid_param", "message": str(e)}, {}
+        self.send(status, obj, headers)
+
+    def handle_unsplash(self, route, query):
+        if self.command not in ("GET", "HEAD"):
+            self.send(405, {"errors": ["Method not allowed"]})
+            return
+
+        match = re.fullmatch(r"/images/([\w-]+)\.jpg", route)
+        if match:
+            self.send(200, self.unsplash.image(match.group(1)), content_type="image/jpeg")
+            return
+
+        if not self.headers.get("Authorization", "").startswith("Client-ID "):
+            self.send(401, {"errors": ["OAuth error: The access token is invalid"]})
+            return
+
+        remaining = self.unsplash.consume()
+        if remaining is None:
+            self.send(403, "Rate Limit Exceeded", self.unsplash.rate_headers(0), "text/plain")
+            return
+        headers = self.unsplash.rate_headers(remaining)
+
+        if route == "/search/photos":
+            per_page = int(query.get("per_page", 10))
+            self.send(200, self.unsplash.search(query.get("query", ""), per_page), headers)
+            return
+
+        match = re.fullmatch(r"/photos/([\w-]+)/download", route)
+        if match:
+            url = f"{self.unsplash.base_url}/unsplash/images/{match.group(1)}.jpg"
+            self.send(200, {"url": url}, headers)
+            return
+
+        self.send(404, {"errors": ["Couldn't find resource"]}, headers)
+
+    def handle_site(self, path):
+        site = self.site
+        if path == "/robots.txt":
+            body = f"User-agent: *\nDisallow: /wp-admin/\nSitemap: {site.base_url}/wp-sitemap.xml\n"
+            self.send_cached(body, "text/plain; charset=UTF-8")
+            return
+
+        if path in ("/sitemap.xml", "/wp-sitemap.xml", "/sitemap_index.xml"):
+            with site.lock:
+                links = [obj["link"] for obj in [*site.posts.values(), *site.pages.values()]
+                         if obj.get("status") == "publish"]
+            urls = "".join(f"<url><loc>{link}</loc></url>" for link in links)
+            body = ('<?xml version="1.0" encoding="UTF-8"?>'
+                    f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>')
+            self.send_cached(body, "application/xml; charset=UTF-8")
+            return
+
+        if path.startswith("/wp-content/uploads/"):
+            data = site.media_files.get(path[len("/wp-content/uploads/"):])
+            if data is None:
+                self.send(404, "Not Found", content_type="text/plain")
+            else:
+                self.send_cached(data, "image/jpeg")
+            return
+
+        with site.lock:
+            for obj in [*site.posts.values(), *site.pages.values()]:
+                if obj.get("status") == "publish" and unquote(urlsplit(obj["link"]).path) == path:
+                    title = obj["title"]["rendered"]
+                    html = (f"<!DOCTYPE html><html lang=\"ja\"><head><meta charset=\"UTF-8\">"
+                            f"<title>{title}</title>"
+                            f"<meta name=\"description\" content=\"{site.meta.get(obj['id'], '')}\">"
+                            f"</head><body><article><h1>{title}</h1>"
+                            f"{obj['content']['rendered']}</article></body></html>")
+                    break
+            else:
+                html = None
+
+        if html is None:
+            self.send(404, "<h1>Not Found</h1>", content_type="text/html; charset=UTF-8")
+        else:
+            self.send_cached(html, "text/html; charset=UTF-8")
+
+
+def parse_multipart(content_type, raw_body):
+    """multipart/form-data からファイルとフォーム項目を取り出す"""
+    message = BytesParser(policy=policy.default).parsebytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode("latin-1") + raw_body)
+    upload = {}
+    for part in message.iter_parts():
+        name = part.get_param("name", header="content-disposition")
+        filename = part.get_filename()
+        if filename:
+            upload["data"] = part.get_payload(decode=True)
+            upload["filename"] = filename
+            upload["content_type"] = part.get_content_type()
+        elif name:
+            upload[name] = part.get_content().strip()
+    return upload
+
+
+def find_latest_backup():
+    """最新の REST API 形式のバックアップ（backups/posts_YYYYMMDD_*.json）"""
+    files = sorted(glob.glob("backups/posts_2*.json"))
+    return files[-1] if files else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ローカル用 WordPress / Unsplash スタンドインサーバー")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--seed", help="記事を読み込むバックアップJSON（省略時は backups/ の最新）")
+    parser.add_argument("--synthetic", type=int, default=0, help="合成記事の件数（指定時はバックアップを読まない）")
+    parser.add_argument("--paragraphs", type=int, default=12, help="合成記事1件あたりの段落数")
+    parser.add_argument("--blocks", action="store_true", help="合成記事の本文をブロックエディタ形式にする")
+    parser.add_argument("--latency", type=float, default=0.0, help="全リクエストに加える遅延（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="遅延に加えるランダムな揺らぎの最大値（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="エラーを返す確率（0〜1）")
+    parser.add_argument("--error-status", type=int, action="append", dest="error_statuses",
+                        help=f"返すエラーステータス（複数指定可、既定: {ERROR_STATUSES}）")
+    parser.add_argument("--retry-after", type=int, default=1, help="429/503 に付ける Retry-After（秒）")
+    parser.add_argument("--unsplash-limit", type=int, default=UNSPLASH_LIMIT, help="Unsplash の1時間あたりの上限")
+    parser.add_argument("--reject-chunked", action="store_true",
+                        help="chunked 転送のメディアアップロードを 411 で拒否する")
+    parser.add_argument("--verbose", action="store_true", help="リクエストごとにログを出力")
+    options = parser.parse_args()
+    options.error_statuses = options.error_statuses or ERROR_STATUSES
+
+    base_url = f"http://{options.host}:{options.port}"
+    site = SiteData(base_url)
+    if options.synthetic:
+        site.generate_posts(options.synthetic, options.paragraphs, blocks=options.blocks)
+        source = f"合成記事 {options.synthetic}件"
+    else:
+        seed = options.seed or find_latest_backup()
+        if not seed:
+            print("エラー: backups/posts_*.json が見つかりません。--seed か --synthetic を指定してください。")
+            sys.exit(1)
+        site.load_backup(seed)
+        source = seed
+    site.generate_pages()
+
+    Handler.site = site
+    Handler.unsplash = Unsplash(base_url, options.unsplash_limit)
+    Handler.stats = Stats()
+    Handler.options = options
+
+    server = ThreadingHTTPServer((options.host, options.port), Handler)
+    server.daemon_threads = True
+    print(f"🧪 偽WordPressサーバー: {base_url}")
+    print(f"   記事: {len(site.posts)}件（{source}） / 固定ページ: {len(site.pages)}件")
+    print(f"   遅延: {options.latency}s (+{options.jitter}s) / エラー率: {options.error_rate:.0%}")
+    print("   Ctrl+C で停止")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print("\n" + Handler.stats.format())
+
+
+if __name__ == "__main__":
+    main()
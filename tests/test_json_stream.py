@@ -0,0 +1,86 @@
+"""json_stream の分割読み込みのテスト（チャンクの境界をすべての位置で試す）"""
+
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts", "active"))
+
+import json_stream  # noqa: E402
+
+
+SAMPLES = [
+    '[1, 0.5, 2e3, -12.5E-2, 10, true, false, null, "x", "a\\"b", {"a": [1.5, 2]}, []]',
+    '[123456, -0, 1E+2, 3.25e-1]',
+    ' [ 42 ] ',
+    '[]',
+]
+
+OBJECT_SAMPLE = '{"count": 12.5, "items": [7, 8.25, {"id": 1e2}], "next": null}'
+
+
+def split_at(text, offset):
+    return [text[:offset], text[offset:]]
+
+
+class IterArrayTest(unittest.TestCase):
+
+    def test_split_at_every_offset(self):
+        for text in SAMPLES:
+            expected = json.loads(text)
+            for offset in range(len(text) + 1):
+                with self.subTest(text=text, offset=offset):
+                    self.assertEqual(list(json_stream.iter_array(split_at(text, offset))), expected)
+
+    def test_one_character_chunks(self):
+        for text in SAMPLES:
+            with self.subTest(text=text):
+                self.assertEqual(list(json_stream.iter_array(list(text))), json.loads(text))
+
+    def test_key_split_at_every_offset(self):
+        expected = json.loads(OBJECT_SAMPLE)["items"]
+        for offset in range(len(OBJECT_SAMPLE) + 1):
+            with self.subTest(offset=offset):
+                chunks = split_at(OBJECT_SAMPLE, offset)
+                self.assertEqual(list(json_stream.iter_array(chunks, key="items")), expected)
+
+    def test_trailing_data_is_rejected(self):
+        with self.assertRaises(ValueError):
+            list(json_stream.iter_array(["[1, 2]", " x"]))
+
+    def test_invalid_number_is_rejected(self):
+        with self.assertRaises(ValueError):
+            list(json_stream.iter_array(["[1, 0.", "]"]))
+
+
+class FakeResponse:
+    """iter_response 用の requests のレスポンスの代わり"""
+
+    def __init__(self, body, encoding="utf-8"):
+        self.body = body
+        self.encoding = encoding
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.body), chunk_size):
+            yield self.body[start:start + chunk_size]
+
+
+class IterResponseTest(unittest.TestCase):
+
+    def test_multibyte_split_at_every_offset(self):
+        text = '[{"title": "日本語のタイトル"}, "記事", 1.5]'
+        body = text.encode("utf-8")
+        for chunk_size in range(1, len(body) + 1):
+            with self.subTest(chunk_size=chunk_size):
+                items = list(json_stream.iter_response(FakeResponse(body), chunk_size=chunk_size))
+                self.assertEqual(items, json.loads(text))
+
+    def test_truncated_multibyte_at_end_is_rejected(self):
+        body = '["記事"]'.encode("utf-8") + "本".encode("utf-8")[:2]
+        with self.assertRaises(ValueError):
+            list(json_stream.iter_response(FakeResponse(body), chunk_size=4))
+
+
+if __name__ == "__main__":
+    unittest.main()